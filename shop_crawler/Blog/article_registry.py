@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+article_registry.py  ─────────────────────────────────────────────────────────────
+Persistent index of generated blog articles (`articles.db`).
+
+Replaces rescanning `processed_titles.txt` for every title:
+1. Articles are keyed by a normalised title slug (built on `slugify_filename`),
+   so spacing/punctuation edits in the sheet don't regenerate an article.
+2. Status, generated files, word count and content hash are stored per article
+   and loaded once into memory – membership checks are O(1).
+3. The legacy `processed_titles.txt` is imported on first use.
+
+Run:
+    python article_registry.py list [--status done] [--under 1000]
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# ------------------------------ CONFIG --------------------------------------- #
+REGISTRY_DB = "articles.db"
+LEGACY_LOG = "processed_titles.txt"
+OUTPUT_DIR = "generated_articles"
+# ----------------------------------------------------------------------------- #
+
+DONE, FAILED = "done", "failed"
+
+
+def slugify_filename(title):
+    filename = title.lower().replace(" ", "_")
+    filename = re.sub(r'[^\w_]', '', filename)
+    return filename.strip()
+
+
+def title_key(title) -> str:
+    """Registry key: the file slug with runs of "_" collapsed, e.g. "Cukier – fakty" → "cukier_fakty"."""
+    return re.sub(r"_+", "_", slugify_filename(str(title).strip())).strip("_")
+
+
+def word_count(html: str) -> int:
+    return len(html.split())
+
+
+def content_hash(html: str) -> str:
+    return hashlib.sha1(html.encode("utf-8")).hexdigest()
+
+
+class ArticleRegistry:
+    def __init__(self, path: str = REGISTRY_DB, legacy_log: Optional[str] = LEGACY_LOG,
+                 output_dir: str = OUTPUT_DIR):
+        self.output_dir = output_dir
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS articles (
+                slug TEXT PRIMARY KEY,
+                title TEXT,
+                status TEXT,
+                article_file TEXT,
+                keyword_file TEXT,
+                word_count INTEGER,
+                content_hash TEXT,
+                error TEXT,
+                updated_at TEXT
+            )
+            """
+        )
+        self.status: Dict[str, str] = dict(self.conn.execute("SELECT slug, status FROM articles"))
+        if legacy_log and not self.status and os.path.exists(legacy_log):
+            self.import_legacy(legacy_log)
+
+    def close(self):
+        self.conn.close()
+
+    def __len__(self):
+        return len(self.status)
+
+    def __contains__(self, title) -> bool:
+        return self.is_done(title)
+
+    # --- writes -------------------------------------------------------------------
+    def _save(self, title: str, status: str, article_file: str = "", keyword_file: str = "",
+              html: Optional[str] = None, error: str = ""):
+        slug = title_key(title)
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO articles "
+                "(slug, title, status, article_file, keyword_file, word_count, content_hash, error, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (slug, str(title).strip(), status, article_file, keyword_file,
+                 word_count(html) if html is not None else None,
+                 content_hash(html) if html is not None else None,
+                 error, datetime.now().isoformat(timespec="seconds")),
+            )
+            self.status[slug] = status
+
+    def mark_done(self, title: str, article_file: str, html: str, keyword_file: str = ""):
+        self._save(title, DONE, article_file, keyword_file, html)
+
+    def mark_failed(self, title: str, error: str):
+        if not self.is_done(title):  # never downgrade a finished article
+            self._save(title, FAILED, error=error)
+
+    def import_legacy(self, log_path: str) -> int:
+        """Import titles from `processed_titles.txt`, picking up their article files if present."""
+        with open(log_path, "r", encoding="utf-8") as f:
+            titles = [line.strip() for line in f if line.strip()]
+        for title in titles:
+            article_file = os.path.join(self.output_dir, f"{slugify_filename(title)}.html")
+            html = None
+            if os.path.exists(article_file):
+                with open(article_file, "r", encoding="utf-8") as f:
+                    html = f.read()
+            self._save(title, DONE, article_file if html is not None else "", html=html)
+        print(f"📥 Imported {len(titles)} titles from {log_path}")
+        return len(titles)
+
+    # --- lookups ------------------------------------------------------------------
+    def is_done(self, title) -> bool:
+        return self.status.get(title_key(title)) == DONE
+
+    def get(self, title) -> Optional[dict]:
+        cur = self.conn.execute("SELECT * FROM articles WHERE slug = ?", (title_key(title),))
+        row = cur.fetchone()
+        return dict(zip([c[0] for c in cur.description], row)) if row else None
+
+    def query(self, status: Optional[str] = None, under_words: Optional[int] = None) -> List[dict]:
+        """e.g. `query(status="done", under_words=1000)` – articles worth extending."""
+        sql, params = "SELECT * FROM articles WHERE 1 = 1", []
+        if status:
+            sql += " AND status = ?"
+            params.append(status)
+        if under_words is not None:
+            sql += " AND word_count < ?"
+            params.append(under_words)
+        cur = self.conn.execute(sql + " ORDER BY slug", params)
+        columns = [c[0] for c in cur.description]
+        return [dict(zip(columns, row)) for row in cur]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the generated article registry.")
+    parser.add_argument("action", choices=["list"])
+    parser.add_argument("--status", choices=[DONE, FAILED])
+    parser.add_argument("--under", type=int, help="Only articles with fewer words than this")
+    parser.add_argument("--db", default=REGISTRY_DB)
+    args = parser.parse_args()
+
+    registry = ArticleRegistry(args.db)
+    rows = registry.query(args.status, args.under)
+    for row in rows:
+        print(f"{row['status']:7s} {row['word_count'] or 0:6d}  {row['title']}")
+    print(f"📦 {len(rows)} of {len(registry)} articles")
+    registry.close()
@@ -1,10 +1,15 @@
 import os
 import re
-import gspread
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import pandas as pd
 from openai import OpenAI
 from dotenv import load_dotenv
-from oauth2client.service_account import ServiceAccountCredentials
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from sheets_sync import SheetSync, GspreadBackend
+from rate_limiter import RateLimiter
+from article_registry import ArticleRegistry, slugify_filename, title_key
 
 # === CONFIGURATION ===
 load_dotenv()
@@ -15,25 +20,27 @@ GOOGLE_KEY_FILE = os.getenv("GOOGLE_KEY_PATH")
 WORKSHEET_NAME = "Input"
 OUTPUT_DIR = "generated_articles"
 KEYWORDS_DIR = "generated_keywords"
-PROCESSED_LOG = "processed_titles.txt"
+PROCESSED_LOG = "processed_titles.txt"   # legacy log, imported into the registry once
+REGISTRY_DB = "articles.db"
+ARTICLE_WORKERS = int(os.getenv("BLOG_ARTICLE_WORKERS", "6"))    # articles generated at once
+SECTION_WORKERS = int(os.getenv("BLOG_SECTION_WORKERS", "8"))    # sections of one article at once
+OPENAI_PER_MINUTE = int(os.getenv("OPENAI_PER_MINUTE", "60"))    # shared by every worker
+
+limiter = RateLimiter(OPENAI_PER_MINUTE, period=60)
 
 # === SETUP ===
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 os.makedirs(KEYWORDS_DIR, exist_ok=True)
 
-def slugify_filename(title):
-    filename = title.lower().replace(" ", "_")
-    filename = re.sub(r'[^\w_]', '', filename)
-    return filename.strip()
-
 def load_titles_from_google_sheet(json_keyfile_path, spreadsheet_id, worksheet_name='Input'):
-    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-    creds = ServiceAccountCredentials.from_json_keyfile_name(json_keyfile_path, scope)
-    client = gspread.authorize(creds)
-    sheet = client.open_by_key(spreadsheet_id).worksheet(worksheet_name)
-    data = sheet.get_all_records()
+    sync = SheetSync(GspreadBackend(json_keyfile_path))
+    data = sync.records(spreadsheet_id, worksheet_name)
+    sync.close()
     df = pd.DataFrame(data)
-    return df['Title'].dropna().tolist()
+    if 'Title' not in df.columns:
+        return []
+    titles = df['Title'].dropna().astype(str).str.strip()
+    return titles[titles != ""].tolist()
 
 # === PROMPTS ===
 def keyword_prompt(title):
@@ -59,6 +66,7 @@ Use <h2> for the section title, and include a <p> tag with keywords listed below
 Only output valid HTML content."""
 
 def ask_openai(prompt, temperature=0.7, max_tokens=1000):
+    limiter.acquire()
     response = client.chat.completions.create(
         model="gpt-4",
         messages=[{"role": "user", "content": prompt}],
@@ -77,72 +85,87 @@ def parse_outline(raw_outline):
             parsed.append((title.strip(), summary.strip()))
     return parsed
 
-def generate_article_by_sections(title, keywords, min_words=1000, max_attempts=3):
+def generate_article_by_sections(title, keywords, min_words=1000, max_attempts=3, tag=""):
     for attempt in range(max_attempts):
-        print(f"🧱 Generating outline (attempt {attempt+1})...")
+        print(f"{tag}🧱 Generating outline (attempt {attempt+1})...")
         raw_outline = ask_openai(outline_prompt(title), max_tokens=1000)
         outline = parse_outline(raw_outline)
 
-        article_sections = []
-        for idx, (sec_title, sec_summary) in enumerate(outline, 1):
-            print(f"📝 Generating section {idx}: {sec_title}")
-            section_html = ask_openai(section_prompt(sec_title, sec_summary, keywords), max_tokens=1200)
-            article_sections.append(section_html)
+        # Sections only depend on the outline, so they are requested together
+        def write_section(item):
+            idx, (sec_title, sec_summary) = item
+            print(f"{tag}📝 Generating section {idx}: {sec_title}")
+            return ask_openai(section_prompt(sec_title, sec_summary, keywords), max_tokens=1200)
+
+        with ThreadPoolExecutor(max_workers=max(1, min(SECTION_WORKERS, len(outline)))) as pool:
+            article_sections = list(pool.map(write_section, enumerate(outline, 1)))
 
         full_article = "\n\n".join(article_sections)
         word_count = len(full_article.split())
 
         if word_count >= min_words:
-            print(f"✅ Full article OK: {word_count} words")
+            print(f"{tag}✅ Full article OK: {word_count} words")
             return full_article
         else:
-            print(f"⚠️ Article too short: {word_count} words — retrying...")
+            print(f"{tag}⚠️ Article too short: {word_count} words — retrying...")
 
     raise ValueError(f"Generated article too short after {max_attempts} attempts.")
 
-# === LOGGING ===
-def is_processed(title):
-    if not os.path.exists(PROCESSED_LOG):
-        return False
-    with open(PROCESSED_LOG, 'r', encoding='utf-8') as f:
-        return title.strip() in f.read()
-
-def mark_as_processed(title):
-    with open(PROCESSED_LOG, 'a', encoding='utf-8') as f:
-        f.write(title.strip() + "\n")
+# === FILES ===
+def write_atomic(path, text):
+    """Write to a temp file and rename, so a crash never leaves half an article."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+# === PIPELINE ===
+def process_title(registry, i, total, title):
+    tag = f"[{i+1}/{total}] "
+    print(f"\n{tag}Processing: {title}")
+
+    # Step 1: Generate keywords
+    keyword_response = ask_openai(keyword_prompt(title))
+    keyword_file = os.path.join(KEYWORDS_DIR, f"keywords_{i+1:02d}.txt")
+    write_atomic(keyword_file, keyword_response)
+
+    # Step 2: Generate section-based article
+    article_html = generate_article_by_sections(title, keyword_response, tag=tag)
+
+    # Step 3: Save article, then record it as done
+    safe_title = slugify_filename(title)
+    article_file = os.path.join(OUTPUT_DIR, f"{safe_title}.html")
+    write_atomic(article_file, article_html)
+
+    registry.mark_done(title, article_file, article_html, keyword_file)
+    print(f"{tag}✅ Article saved: {article_file}")
+    return article_file
 
 # === MAIN ===
 def main():
     titles = load_titles_from_google_sheet(GOOGLE_KEY_FILE, SPREADSHEET_ID, WORKSHEET_NAME)
+    registry = ArticleRegistry(REGISTRY_DB, legacy_log=PROCESSED_LOG, output_dir=OUTPUT_DIR)
 
+    todo, queued = [], set()
     for i, title in enumerate(titles):
-        if is_processed(title):
+        if registry.is_done(title) or title_key(title) in queued:
             print(f"⏭️ Skipping already processed: {title}")
             continue
-
-        print(f"\n[{i+1}/{len(titles)}] Processing: {title}")
-
-        try:
-            # Step 1: Generate keywords
-            keyword_response = ask_openai(keyword_prompt(title))
-            keyword_file = os.path.join(KEYWORDS_DIR, f"keywords_{i+1:02d}.txt")
-            with open(keyword_file, "w", encoding="utf-8") as f:
-                f.write(keyword_response)
-
-            # Step 2: Generate section-based article
-            article_html = generate_article_by_sections(title, keyword_response)
-
-            # Step 3: Save article
-            safe_title = slugify_filename(title)
-            article_file = os.path.join(OUTPUT_DIR, f"{safe_title}.html")
-            with open(article_file, "w", encoding="utf-8") as f:
-                f.write(article_html)
-
-            mark_as_processed(title)
-            print(f"✅ Article saved: {article_file}")
-
-        except Exception as e:
-            print(f"❌ Error processing '{title}': {str(e)}")
+        queued.add(title_key(title))
+        todo.append((i, title))
+
+    with ThreadPoolExecutor(max_workers=max(1, ARTICLE_WORKERS)) as pool:
+        futures = {pool.submit(process_title, registry, i, len(titles), title): title for i, title in todo}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"❌ Error processing '{futures[future]}': {str(e)}")
+                registry.mark_failed(futures[future], str(e))
+
+    registry.close()
 
     print("\n🎉 All titles processed!")
 
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+catalogue_diff.py  ───────────────────────────────────────────────────────────────
+What changed between two product snapshots – two scraper runs, or a scraped
+shop against our export.
+
+1. Both CSVs are streamed once. Each product is reduced to its key (`ID` or
+   GTIN) and one small fingerprint per field group (price, nutrition, images,
+   description hash, …) and written to one of N partition files by key hash.
+2. Partitions are compared pairwise, so only 1/N of the old snapshot is ever
+   in memory – files larger than RAM diff fine.
+3. The result is a compact JSONL change set, one line per added / removed /
+   changed product with the changed groups (small values like price inline,
+   long texts only as hashes). `woo_publisher.py --changes` and
+   `changed_ids()` use it to reprocess only what changed.
+Field groups whose columns only one snapshot has (e.g. nutrition when diffing a
+scrape against the export) are not compared – they would show up as changed
+on every product.
+
+Run:
+    python catalogue_diff.py products_guiltfree_old.csv products_guiltfree.csv
+    python catalogue_diff.py export_for_reference_enhanced.csv products_guiltfree.csv --key gtin --out changes.jsonl
+"""
+
+import argparse
+import csv
+import hashlib
+import html
+import json
+import os
+import re
+import shutil
+import tempfile
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from nutrition_renderer import TABLE_HEADING, parse_nutrition_text
+
+# ------------------------------ CONFIG --------------------------------------- #
+CHANGES_JSONL = "catalogue_changes.jsonl"
+PARTITIONS = 16
+CSV_ENCODING = "utf-8-sig"
+
+GTIN_COLUMNS = ["GTIN, UPC, EAN, or ISBN", "GTIN"]
+# field group → candidate columns (first non‑empty wins), and whether the value goes into the change set
+FIELD_GROUPS: Dict[str, Tuple[List[str], bool]] = {
+    "name":        (["Name", "Title"], True),
+    "price":       (["Regular price", "Price"], True),
+    "sale_price":  (["Sale price"], True),
+    "stock":       (["In stock?", "Stock"], True),
+    "brand":       (["Brands", "Brand", "Attribute 3 value(s)"], True),
+    "categories":  (["Categories"], True),
+    "nutrition":   (["NutritionHTML", "Nutrition Facts"], True),
+    "images":      (["Images", "images"], False),
+    "description": (["Description", "Long Description"], False),
+    "short":       (["Short description", "Short Description"], False),
+}
+# columns `_nutrition()` falls back to when no nutrition column is filled
+NUTRITION_FALLBACK = ["Enhanced Long Description", "Description"]
+# ----------------------------------------------------------------------------- #
+
+
+def _cell(row: dict, key: str) -> str:
+    return (row.get(key) or "").strip()
+
+
+def _first(row: dict, columns: List[str]) -> str:
+    for col in columns:
+        if _cell(row, col):
+            return _cell(row, col)
+    return ""
+
+
+def _digest(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def normalise_gtin(value: str) -> str:
+    value = re.sub(r"\.0$", "", value.strip())  # pandas round-trips GTINs as floats
+    return re.sub(r"\D", "", value).lstrip("0")
+
+
+def normalise_price(value: str) -> str:
+    match = re.search(r"\d+(?:[.,]\d+)?", value.replace("\xa0", "").replace(" ", ""))
+    return f"{float(match.group(0).replace(',', '.')):.2f}" if match else ""
+
+
+def _plain_text(value: str) -> str:
+    text = html.unescape(re.sub(r"<[^>]+>", " ", value))
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def _nutrition(row: dict, raw: str) -> str:
+    """Per‑100 g values as a stable string; the export keeps them in the description table."""
+    if not raw:
+        for col in NUTRITION_FALLBACK:
+            text = _cell(row, col)
+            at = text.find(TABLE_HEADING)
+            if at != -1:
+                raw = text[at:text.find("</table>", at) + len("</table>")]
+                break
+    values = parse_nutrition_text(raw)
+    return "; ".join(f"{k}: {v}" for k, v in sorted(values.items()))
+
+
+def _images(value: str) -> str:
+    """Image file names in order – scraped and uploaded copies live on different hosts."""
+    names = [re.sub(r"-\d+x\d+(?=\.\w+$)", "", url.strip().split("?")[0].rsplit("/", 1)[-1].lower())
+             for url in value.split(",") if url.strip()]
+    return ",".join(names)
+
+
+def fingerprint(row: dict, ignore: Iterable[str] = ()) -> Dict[str, str]:
+    """Normalised value (or hash, for long texts) of every field group."""
+    out = {}
+    for group, (columns, inline) in FIELD_GROUPS.items():
+        if group in ignore:
+            continue
+        raw = _first(row, columns)
+        if group in ("price", "sale_price"):
+            value = normalise_price(raw)
+        elif group == "nutrition":
+            value = _nutrition(row, raw)
+        elif group == "images":
+            value = _images(raw)
+        elif group in ("description", "short"):
+            value = _plain_text(raw)
+        else:
+            value = re.sub(r"\s+", " ", raw)
+        out[group] = value if inline or not value else _digest(value)
+    return out
+
+
+def row_keys(row: dict) -> Dict[str, str]:
+    """Every key a row can be matched by: {'id': 'id:16604', 'gtin': 'gtin:5900…'}."""
+    keys = {}
+    product_id = _cell(row, "ID")
+    if re.fullmatch(r"\d+(\.0)?", product_id):
+        keys["id"] = f"id:{int(float(product_id))}"
+    gtin = normalise_gtin(_first(row, GTIN_COLUMNS))
+    if gtin:
+        keys["gtin"] = f"gtin:{gtin}"
+    return keys
+
+
+def row_key(row: dict, mode: str) -> Optional[str]:
+    keys = row_keys(row)
+    if mode == "auto":
+        return keys.get("id") or keys.get("gtin")
+    return keys.get(mode)
+
+
+def _header(csv_path: str) -> Set[str]:
+    with open(csv_path, "r", encoding=CSV_ENCODING, newline="") as f:
+        return set(next(csv.reader(f), []))
+
+
+def pick_key_mode(old_csv: str, new_csv: str) -> str:
+    """`id` when both snapshots carry export IDs, otherwise `gtin`."""
+    return "id" if all("ID" in _header(p) for p in (old_csv, new_csv)) else "gtin"
+
+
+def missing_groups(old_csv: str, new_csv: str) -> List[str]:
+    """Field groups none of whose source columns exist in one of the two headers."""
+    headers = [_header(p) for p in (old_csv, new_csv)]
+    missing = []
+    for group, (columns, _) in FIELD_GROUPS.items():
+        sources = set(columns) | (set(NUTRITION_FALLBACK) if group == "nutrition" else set())
+        if any(not sources & h for h in headers):
+            missing.append(group)
+    return missing
+
+
+def iter_rows(csv_path: str) -> Iterator[dict]:
+    csv.field_size_limit(2**31 - 1)  # long HTML cells
+    with open(csv_path, "r", encoding=CSV_ENCODING, newline="") as f:
+        yield from csv.DictReader(f)
+
+
+# === PARTITIONING ===
+def partition(csv_path: str, mode: str, out_dir: str, partitions: int = PARTITIONS,
+              ignore: Iterable[str] = ()) -> Counter:
+    """Write `{key, id, fp}` lines into `out_dir/<n>.jsonl` by key hash; returns counts."""
+    stats = Counter()
+    files = [open(os.path.join(out_dir, f"{n}.jsonl"), "w", encoding="utf-8") for n in range(partitions)]
+    try:
+        for row in iter_rows(csv_path):
+            key = row_key(row, mode)
+            if key is None:
+                stats["unkeyed"] += 1
+                continue
+            stats["rows"] += 1
+            record = {"key": key, "id": row_keys(row).get("id"), "fp": fingerprint(row, ignore)}
+            n = int(_digest(key), 16) % partitions
+            files[n].write(json.dumps(record, ensure_ascii=False) + "\n")
+    finally:
+        for f in files:
+            f.close()
+    return stats
+
+
+def _load_partition(path: str) -> Dict[str, dict]:
+    records = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            rec = json.loads(line)
+            records.setdefault(rec["key"], rec)  # duplicate keys: the first row wins in both snapshots
+    return records
+
+
+def diff_records(old: Optional[dict], new: Optional[dict]) -> Optional[dict]:
+    if old is None:
+        return {"op": "added", "key": new["key"], "id": new["id"], "fields": sorted(new["fp"])}
+    if new is None:
+        return {"op": "removed", "key": old["key"], "id": old["id"]}
+    changes = {g: [old["fp"].get(g, ""), v] for g, v in new["fp"].items() if old["fp"].get(g, "") != v}
+    if not changes:
+        return None
+    return {
+        "op": "changed", "key": new["key"], "id": new["id"] or old["id"],
+        "fields": sorted(changes),
+        "changes": {g: pair for g, pair in changes.items() if FIELD_GROUPS[g][1]},
+    }
+
+
+def diff(old_csv: str, new_csv: str, out_path: str = CHANGES_JSONL, mode: str = "auto",
+         partitions: int = PARTITIONS, ignore: Iterable[str] = ()) -> Counter:
+    """Stream both snapshots through hash partitions and write the change set; returns op counts.
+
+    Groups missing from either header are added to `ignore` and counted as `skipped:<group>`.
+    """
+    if mode == "auto":
+        mode = pick_key_mode(old_csv, new_csv)
+    skipped = [g for g in missing_groups(old_csv, new_csv) if g not in ignore]
+    ignore = set(ignore) | set(skipped)
+    work = tempfile.mkdtemp(prefix="catalogue_diff_")
+    counts = Counter()
+    try:
+        old_dir, new_dir = os.path.join(work, "old"), os.path.join(work, "new")
+        os.makedirs(old_dir)
+        os.makedirs(new_dir)
+        old_stats = partition(old_csv, mode, old_dir, partitions, ignore)
+        new_stats = partition(new_csv, mode, new_dir, partitions, ignore)
+        tmp = out_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as out:
+            out.write(json.dumps({"meta": {
+                "old": old_csv, "new": new_csv, "key": mode, "skipped_groups": skipped,
+                "created": datetime.now().isoformat(timespec="seconds"),
+            }}) + "\n")
+            for n in range(partitions):
+                old = _load_partition(os.path.join(old_dir, f"{n}.jsonl"))
+                seen = set()
+                with open(os.path.join(new_dir, f"{n}.jsonl"), "r", encoding="utf-8") as f:
+                    for line in f:
+                        new = json.loads(line)
+                        if new["key"] in seen:
+                            continue
+                        seen.add(new["key"])
+                        change = diff_records(old.get(new["key"]), new)
+                        if change:
+                            counts[change["op"]] += 1
+                            counts.update(f"field:{g}" for g in change["fields"] if change["op"] == "changed")
+                            out.write(json.dumps(change, ensure_ascii=False) + "\n")
+                        else:
+                            counts["unchanged"] += 1
+                for key in old.keys() - seen:
+                    counts["removed"] += 1
+                    out.write(json.dumps(diff_records(old[key], None), ensure_ascii=False) + "\n")
+        os.replace(tmp, out_path)
+        counts["unkeyed"] = old_stats["unkeyed"] + new_stats["unkeyed"]
+        counts.update(f"skipped:{g}" for g in skipped)
+        return counts
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+# === CONSUMERS ===
+def load_changes(path: str = CHANGES_JSONL, ops: Iterable[str] = ("added", "changed"),
+                 fields: Optional[Iterable[str]] = None) -> List[dict]:
+    """Change records with one of `ops` (and, for `changed`, touching one of `fields`)."""
+    ops, fields = set(ops), set(fields or [])
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            rec = json.loads(line)
+            if rec.get("op") not in ops:
+                continue
+            if fields and rec["op"] == "changed" and not fields & set(rec["fields"]):
+                continue
+            records.append(rec)
+    return records
+
+
+def changed_keys(path: str = CHANGES_JSONL, **filters) -> Set[str]:
+    """Keys (`id:…` / `gtin:…`) to reprocess; match rows with `row_keys(row).values()`."""
+    keys = set()
+    for rec in load_changes(path, **filters):
+        keys.update(k for k in (rec["key"], rec.get("id")) if k)
+    return keys
+
+
+def changed_ids(path: str = CHANGES_JSONL, **filters) -> Set[int]:
+    """Export product IDs to reprocess (for `read_export(ids=…)`)."""
+    return {int(rec["id"][3:]) for rec in load_changes(path, **filters) if rec.get("id")}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Diff two product snapshots into a JSONL change set.")
+    parser.add_argument("old_csv")
+    parser.add_argument("new_csv")
+    parser.add_argument("--out", default=CHANGES_JSONL)
+    parser.add_argument("--key", choices=["auto", "id", "gtin"], default="auto",
+                        help="Match products by export ID or GTIN (auto: ID when both files have it)")
+    parser.add_argument("--partitions", type=int, default=PARTITIONS, help="More partitions → less memory")
+    parser.add_argument("--ignore", nargs="*", default=[], choices=sorted(FIELD_GROUPS),
+                        help="Field groups not to compare")
+    args = parser.parse_args()
+
+    counts = diff(args.old_csv, args.new_csv, args.out, mode=args.key,
+                  partitions=max(1, args.partitions), ignore=args.ignore)
+    print(f"➕ {counts['added']} added   ➖ {counts['removed']} removed   "
+          f"✏️ {counts['changed']} changed   ⏭️ {counts['unchanged']} unchanged")
+    for group in FIELD_GROUPS:
+        if counts[f"field:{group}"]:
+            print(f"   {group:12s} {counts[f'field:{group}']:6d}")
+    skipped = [g for g in FIELD_GROUPS if counts[f"skipped:{g}"]]
+    if skipped:
+        print(f"⏭️ Not compared (columns missing in one file): {', '.join(skipped)}")
+    if counts["unkeyed"]:
+        print(f"⚠️ {counts['unkeyed']} rows without a usable key were skipped")
+    print(f"✅ Change set written to {args.out}")
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+catalogue_store.py  ──────────────────────────────────────────────────────────────
+Keyed SQLite store for the product catalogue and its enrichments.
+
+Instead of merging whole CSVs in memory for every enrichment step, the export is
+loaded once into `catalogue.db` (one row per product `ID`, one column per export
+column) and each enrichment is upserted as columns:
+1. `import_export()` loads/refreshes the export – only rows whose values changed
+   are written, and an unchanged file is skipped entirely. Products missing from
+   a new export are marked removed (`_removed_at`) rather than deleted, so their
+   enrichments come back if they reappear; short rows and bad IDs are skipped
+   and counted in `last_import`.
+2. `upsert_columns()` adds enrichment columns (e.g. `NutritionHTML`, `Source`)
+   keyed by product ID; `upsert_brands()` does the same for the brand map.
+3. `export_csv()` streams a single SELECT back out to a WooCommerce‑ready CSV
+   (removed products are left out).
+
+Run:
+    python catalogue_store.py import export_for_reference_enhanced.csv
+    python catalogue_store.py export export_enhanced_with_nutrition.csv
+"""
+
+import argparse
+import csv
+import math
+import os
+import sqlite3
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+# ------------------------------ CONFIG --------------------------------------- #
+STORE_DB = "catalogue.db"
+PRODUCT_KEY = "ID"
+BRAND_KEY = "Brand"
+CSV_ENCODING = "utf-8-sig"
+BATCH_SIZE = 1000
+# ----------------------------------------------------------------------------- #
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _clean(value):
+    """Normalise pandas/CSV values to what SQLite should store (NaN/'' → NULL)."""
+    if value is None:
+        return None
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if value.__class__.__name__ in ("NAType", "NaTType"):
+        return None
+    if isinstance(value, str) and value == "":
+        return None
+    return value
+
+
+def _product_id(value) -> Optional[int]:
+    """`123`, `"123"` or `"123.0"` → 123; empty or non‑numeric IDs → None."""
+    if _clean(value) is None:
+        return None
+    try:
+        return int(float(value))
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def _batched(rows: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class CatalogueStore:
+    """Products keyed by `ID` and brands keyed by `Brand`, both with dynamic columns."""
+
+    def __init__(self, path: str = STORE_DB):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS products "
+            f"({_quote(PRODUCT_KEY)} INTEGER PRIMARY KEY, _updated_at TEXT, _removed_at TEXT)"
+        )
+        self._ensure_columns("products", ["_removed_at"])  # stores created before removal tracking
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS brands "
+            f"({_quote(BRAND_KEY)} TEXT PRIMARY KEY COLLATE NOCASE, _updated_at TEXT)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS sources (path TEXT PRIMARY KEY, mtime REAL, size INTEGER)"
+        )
+        self.conn.commit()
+        self.last_import = {"changed": 0, "removed": 0, "skipped_rows": 0, "bad_ids": 0}
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- schema helpers --------------------------------------------------------
+    def columns(self, table: str = "products") -> List[str]:
+        """Data columns of `table` in export order (internal `_` columns excluded)."""
+        info = self.conn.execute(f"PRAGMA table_info({table})").fetchall()
+        return [row[1] for row in info if not row[1].startswith("_")]
+
+    def _ensure_columns(self, table: str, columns: Sequence[str]):
+        existing = {row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+        for col in columns:
+            if col not in existing:
+                self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {_quote(col)} TEXT")
+
+    def _upsert(self, table: str, key: str, columns: Sequence[str], rows: Iterable[Sequence],
+                overwrite: bool = True) -> int:
+        """Insert or update `rows` (key first, then `columns`); return how many rows changed."""
+        columns = [c for c in columns if c != key]
+        self._ensure_columns(table, columns)
+        names = [key] + list(columns) + ["_updated_at"]
+        placeholders = ", ".join("?" for _ in names)
+        if overwrite and columns:
+            assignments = ", ".join(f"{_quote(c)} = excluded.{_quote(c)}" for c in columns)
+            changed = " OR ".join(f"{_quote(c)} IS NOT excluded.{_quote(c)}" for c in columns)
+            conflict = f"DO UPDATE SET {assignments}, _updated_at = excluded._updated_at WHERE {changed}"
+        else:
+            conflict = "DO NOTHING"
+        sql = (
+            f"INSERT INTO {table} ({', '.join(_quote(n) for n in names)}) VALUES ({placeholders}) "
+            f"ON CONFLICT({_quote(key)}) {conflict}"
+        )
+        now = datetime.now().isoformat(timespec="seconds")
+        before = self.conn.total_changes
+        with self.conn:
+            for batch in _batched(rows, BATCH_SIZE):
+                self.conn.executemany(sql, [[_clean(v) for v in row] + [now] for row in batch])
+        return self.conn.total_changes - before
+
+    # --- products -----------------------------------------------------------------
+    def import_export(self, csv_path: str, force: bool = False) -> int:
+        """Load a WooCommerce export into the store; skipped if the file is unchanged.
+
+        Returns the number of rows changed; removed/skipped counts are in `last_import`.
+        """
+        self.last_import = {"changed": 0, "removed": 0, "skipped_rows": 0, "bad_ids": 0}
+        stat = os.stat(csv_path)
+        seen = self.conn.execute("SELECT mtime, size FROM sources WHERE path = ?", (csv_path,)).fetchone()
+        if not force and seen == (stat.st_mtime, stat.st_size):
+            return 0
+
+        with open(csv_path, "r", encoding=CSV_ENCODING, newline="") as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            key_idx = header.index(PRODUCT_KEY)
+            columns = [c for c in header if c != PRODUCT_KEY]
+            order = [key_idx] + [i for i, c in enumerate(header) if c != PRODUCT_KEY]
+            ids = set()
+
+            def rows():
+                for row in reader:
+                    if not any(cell.strip() for cell in row):
+                        continue
+                    if len(row) < len(header):
+                        self.last_import["skipped_rows"] += 1
+                        continue
+                    row[key_idx] = _product_id(row[key_idx])
+                    if row[key_idx] is None:
+                        self.last_import["bad_ids"] += 1
+                        continue
+                    ids.add(row[key_idx])
+                    yield [row[i] for i in order]
+
+            changed = self._upsert("products", PRODUCT_KEY, columns, rows())
+
+        key = _quote(PRODUCT_KEY)
+        now = datetime.now().isoformat(timespec="seconds")
+        with self.conn:
+            if ids:  # an export without a single usable row is not a reason to drop the catalogue
+                self.conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS _seen ({key} INTEGER PRIMARY KEY)")
+                self.conn.execute("DELETE FROM _seen")
+                self.conn.executemany("INSERT INTO _seen VALUES (?)", ((i,) for i in ids))
+                self.conn.execute(f"UPDATE products SET _removed_at = NULL "
+                                  f"WHERE _removed_at IS NOT NULL AND {key} IN (SELECT {key} FROM _seen)")
+                self.last_import["removed"] = self.conn.execute(
+                    f"UPDATE products SET _removed_at = ? "
+                    f"WHERE _removed_at IS NULL AND {key} NOT IN (SELECT {key} FROM _seen)", (now,)
+                ).rowcount
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sources (path, mtime, size) VALUES (?, ?, ?)",
+                (csv_path, stat.st_mtime, stat.st_size),
+            )
+        self.last_import["changed"] = changed
+        return changed
+
+    def upsert_columns(self, df, key: str = PRODUCT_KEY, columns: Optional[Sequence[str]] = None) -> int:
+        """Upsert enrichment columns from a DataFrame keyed by product ID.
+
+        Like a left join onto the catalogue: IDs that are not in the store are ignored.
+        """
+        columns = [c for c in (columns or df.columns) if c != key]
+        known = {k for (k,) in self.conn.execute(f"SELECT {_quote(PRODUCT_KEY)} FROM products")}
+        keys = [_product_id(k) for k in df[key]]
+        rows = (
+            [k] + list(values)
+            for k, values in zip(keys, df[columns].itertuples(index=False, name=None))
+            if k in known
+        )
+        return self._upsert("products", PRODUCT_KEY, columns, rows)
+
+    def iter_products(self, columns: Optional[Sequence[str]] = None,
+                      include_removed: bool = False) -> Iterator[tuple]:
+        columns = list(columns or self.columns("products"))
+        where = "" if include_removed else "WHERE _removed_at IS NULL "
+        cursor = self.conn.execute(
+            f"SELECT {', '.join(_quote(c) for c in columns)} FROM products {where}ORDER BY {_quote(PRODUCT_KEY)}"
+        )
+        yield from cursor
+
+    def export_csv(self, csv_path: str, columns: Optional[Sequence[str]] = None) -> int:
+        """Stream the products table to a CSV; returns the number of rows written."""
+        columns = list(columns or self.columns("products"))
+        count = 0
+        with open(csv_path, "w", encoding=CSV_ENCODING, newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for row in self.iter_products(columns):
+                writer.writerow(["" if v is None else v for v in row])
+                count += 1
+        return count
+
+    # --- brands -------------------------------------------------------------------
+    def upsert_brands(self, df, key: str = BRAND_KEY, overwrite: bool = False) -> int:
+        """Add brand rows; by default the first value seen for a brand is kept."""
+        columns = [c for c in df.columns if c != key]
+        rows = (
+            [str(k).strip()] + list(values)
+            for k, values in zip(df[key], df[columns].itertuples(index=False, name=None))
+            if _clean(k) is not None
+        )
+        return self._upsert("brands", BRAND_KEY, columns, rows, overwrite=overwrite)
+
+    def export_brands_csv(self, csv_path: str) -> int:
+        columns = self.columns("brands")
+        count = 0
+        with open(csv_path, "w", encoding=CSV_ENCODING, newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            cursor = self.conn.execute(
+                f"SELECT {', '.join(_quote(c) for c in columns)} FROM brands ORDER BY {_quote(BRAND_KEY)}"
+            )
+            for row in cursor:
+                writer.writerow(["" if v is None else v for v in row])
+                count += 1
+        return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import/export the catalogue store.")
+    parser.add_argument("action", choices=["import", "export"])
+    parser.add_argument("csv", help="CSV file to import from / export to")
+    parser.add_argument("--db", default=STORE_DB, help="SQLite store file")
+    parser.add_argument("--force", action="store_true", help="Re-import even if the file is unchanged")
+    args = parser.parse_args()
+
+    with CatalogueStore(args.db) as store:
+        if args.action == "import":
+            changed = store.import_export(args.csv, force=args.force)
+            report = store.last_import
+            print(f"✅ Imported {args.csv} — {changed} rows changed, {report['removed']} products removed")
+            if report["skipped_rows"] or report["bad_ids"]:
+                print(f"⚠️ Skipped {report['skipped_rows']} short rows and {report['bad_ids']} rows with a bad ID")
+        else:
+            count = store.export_csv(args.csv)
+            print(f"✅ Exported {count} products to {args.csv}")
@@ -1,5 +1,6 @@
 import pandas as pd
 import re
+from export_reader import iter_export_chunks
 
 INPUT_FILE = "export_for_reference_enhanced.csv"
 OUTPUT_FILE = "products_missing_nutrition.csv"
@@ -23,18 +24,18 @@ def is_table_empty_or_fake(html):
 
     return len(meaningful_cells) == 0
 
-# Load CSV
-df = pd.read_csv(INPUT_FILE)
+# Stream the export in chunks; flagged rows keep every column (the file doubles as a sample export)
 missing_rows = []
 
-for idx, row in df.iterrows():
-    desc = str(row.get("Enhanced Long Description", ""))
-    if is_table_empty_or_fake(desc):
-        missing_rows.append(row)
+for chunk in iter_export_chunks(INPUT_FILE):
+    descs = chunk["Enhanced Long Description"].fillna("").astype(str)
+    mask = descs.map(is_table_empty_or_fake).astype(bool)
+    missing_rows.append(chunk.loc[mask])
 
 # Save output
-if missing_rows:
-    pd.DataFrame(missing_rows).to_csv(OUTPUT_FILE, index=False, encoding="utf-8-sig")
-    print(f"✅ Saved {len(missing_rows)} products without valid nutrition tables to {OUTPUT_FILE}")
+missing = pd.concat(missing_rows, ignore_index=True) if missing_rows else pd.DataFrame()
+if not missing.empty:
+    missing.to_csv(OUTPUT_FILE, index=False, encoding="utf-8-sig")
+    print(f"✅ Saved {len(missing)} products without valid nutrition tables to {OUTPUT_FILE}")
 else:
     print("✅ All products have valid nutrition tables.")
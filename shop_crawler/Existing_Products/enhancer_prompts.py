@@ -0,0 +1,187 @@
+"""
+enhancer_prompts.py  ─────────────────────────────────────────────────────────────
+Prompts and per‑product context shared by both enhancers and `regenerate_fields.py`.
+
+Keeping them in one place means a single field can be regenerated later with
+exactly the prompt and context the full enhancement used. Fields are
+addressed by their export column; one section of the long description is
+`"Enhanced Long Description#<n>"` (1‑based).
+
+Fields that could not be generated are appended to `field_failures.jsonl` so
+they can be regenerated without re‑running the whole product.
+"""
+
+import json
+import re
+from datetime import datetime
+from typing import Dict, List
+
+# ------------------------------ CONFIG --------------------------------------- #
+SYSTEM_PROMPT = "You are a helpful assistant for rewriting e-commerce product descriptions in Polish."
+SITE_NAME = "NoGuiltMeal"
+TITLE_MAX = 60
+META_MAX = 160
+MIN_SECTION_WORDS = 220
+FAILURES_LOG = "field_failures.jsonl"
+
+KEYWORD_FIELD = "Meta: rank_math_focus_keyword"
+TITLE_FIELD = "Meta: seo_title"
+META_FIELD = "Meta: seo_description"
+SHORT_FIELD = "Enhanced Short Description"
+LONG_FIELD = "Enhanced Long Description"
+OUTPUT_FIELDS = [SHORT_FIELD, LONG_FIELD, KEYWORD_FIELD, TITLE_FIELD, META_FIELD]
+
+SECTION_HEADINGS = ["Wprowadzenie", "Korzyści i zastosowanie", "Wartości odżywcze"]
+NO_NUTRITION = "Brak danych o wartościach odżywczych."
+# ----------------------------------------------------------------------------- #
+
+
+def section_field(n: int) -> str:
+    return f"{LONG_FIELD}#{n}"
+
+
+# === CONTEXT ===
+def extract_nutrition_from_context(text):
+    match = re.search(r'(Wartości odżywcze[\s\S]+?)(?:<h2>|</h2>|$)', text, re.IGNORECASE)
+    if match:
+        content = match.group(1).strip()
+        if len(content) < 30 or not any(x in content.lower() for x in ["kcal", "białko", "tłuszcz", "węglowodany"]):
+            return None
+        return content
+    return None
+
+
+def wrap_standalone_lines(text):
+    lines = text.splitlines()
+    wrapped = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if not line.startswith("<") and not line.endswith(">"):
+            wrapped.append(f"<p>{line}</p>")
+        else:
+            wrapped.append(line)
+    return "\n".join(wrapped)
+
+
+def _cell(row, key) -> str:
+    value = row.get(key, "")
+    return "" if value is None or value != value else str(value).strip()  # NaN → ""
+
+
+def product_context(row) -> Dict[str, str]:
+    """What every prompt needs about one export/input row."""
+    context = _cell(row, "Description")
+    original_short = _cell(row, "Short Description") or _cell(row, "Short description")
+    return {
+        "name": _cell(row, "Name"),
+        "context": context,
+        "nutrition": extract_nutrition_from_context(context),
+        "original_short": original_short or "Brak opisu.",
+        "brand": _cell(row, "Attribute 1 value(s)"),
+    }
+
+
+# === PROMPTS ===
+def keyword_prompt(name):
+    return f"""
+You are an SEO assistant. Suggest the best focus keyword (in Polish) for the product:
+"{name}"
+Return only the keyword (no quotes or markdown).
+"""
+
+
+def seo_title(focus_keyword, name):
+    """`<keyword> - <name> | NoGuiltMeal`, shortened to TITLE_MAX when possible."""
+    title = f"{focus_keyword} - {name} | {SITE_NAME}"
+    if len(title) > TITLE_MAX:
+        title = f"{focus_keyword} - {name}"
+    if len(title) > TITLE_MAX and len(focus_keyword) + 3 < TITLE_MAX:
+        title = title[:TITLE_MAX].rsplit(" ", 1)[0].rstrip(" -|")
+    return title
+
+
+def meta_prompt(name, original_short, focus_keyword):
+    return f"""
+Generate a short meta description in Polish (max 160 characters) for the product below.
+Make sure to include the exact phrase: {focus_keyword}
+
+Product title: {name}
+Short description: {original_short}
+"""
+
+
+def fit_meta(text):
+    text = text.strip()
+    if len(text) > META_MAX:
+        text = text[:META_MAX - 3].rstrip() + "..."
+    return text
+
+
+def short_prompt(focus_keyword, original_short):
+    return f"""
+Write a short product description in Polish in at least 500 characters using HTML.
+Include the exact focus keyword: {focus_keyword} at the beginning.
+Original short description for context: {original_short}
+Avoid using markdown.
+"""
+
+
+def section_prompts(name, focus_keyword, nutrition) -> List[str]:
+    """Prompts for the three written sections of the long description."""
+    return [
+        f"""
+Write Section 1 of a long product description in Polish using HTML.
+
+<h2>{SECTION_HEADINGS[0]}</h2>
+
+Write at least 250 words for product: {name}.
+
+Start with a paragraph that includes the exact focus keyword: "{focus_keyword}" in the first sentence. Use <p> tags for each paragraph. Do not use markdown.
+""",
+        f"""
+Write Section 2 of the product description in Polish using HTML.
+
+<h2>{SECTION_HEADINGS[1]}</h2>
+
+Write at least 250 words about the benefits and use cases of the product: {name}.
+
+Use proper <p> tags. Avoid markdown.
+""",
+        f"""
+Write Section 3 of the product description in Polish using HTML.
+
+<h2>{SECTION_HEADINGS[2]}</h2>
+
+Write a minimum 250-word summary of the product’s nutritional benefits based on the following data:
+"{nutrition or NO_NUTRITION}"
+
+Use <p> tags for each paragraph. Do not create a table here.
+Do not use markdown.
+""",
+    ]
+
+
+def brand_prompt(brand):
+    """Introduction for the `O marce …` block; heading and producer link are added by the renderer."""
+    return f"""
+Write 3–4 sentences in Polish introducing the brand {brand.title()}.
+
+Use <p> tags. Do not add a heading or a link.
+Do not use markdown.
+"""
+
+
+# === FAILURE LOG ===
+def log_field_failure(row, field, message, path=FAILURES_LOG):
+    """Remember a field that came back empty/too short so it can be regenerated alone."""
+    record = {
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "ID": _cell(row, "ID"),
+        "Name": _cell(row, "Name"),
+        "field": field,
+        "message": message,
+    }
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+export_reader.py  ────────────────────────────────────────────────────────────────
+Shared, memory‑friendly reader for the wide WooCommerce export CSV.
+
+`export_for_reference_enhanced.csv` carries 150+ columns (`Meta: _woodmart_*`,
+`rank_math_*`, …) and multi‑KB HTML cells, while each tool only needs a handful
+of them. This module:
+1. Reads only the requested columns (`usecols`) with compact dtypes – low
+   cardinality columns become `category`, text becomes Arrow‑backed strings
+   when pyarrow is installed.
+2. Iterates the export in chunks for tools that need every row but not all
+   of them at once.
+3. Converts the export once into a Feather (Arrow IPC) cache sorted by `ID`;
+   later reads memory‑map only the requested columns from that cache.
+
+Run:
+    python export_reader.py export_for_reference_enhanced.csv   # build the cache
+"""
+
+import argparse
+import csv
+import os
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.feather as feather
+except ImportError:  # cache + Arrow strings are optional
+    pa = None
+
+# ------------------------------ CONFIG --------------------------------------- #
+EXPORT_CSV = "export_for_reference_enhanced.csv"
+CACHE_SUFFIX = ".feather"
+CSV_ENCODING = "utf-8-sig"
+CHUNK_SIZE = 2000
+
+STRING_DTYPE = "string[pyarrow]" if pa is not None else "string"
+
+# Few distinct values across the whole catalogue → categorical
+CATEGORY_COLUMNS = {
+    "Type", "Published", "Is featured?", "Visibility in catalogue", "Tax status",
+    "Tax class", "In stock?", "Backorders allowed?", "Sold individually?",
+    "Allow customer reviews?", "Shipping class", "Categories", "Brands",
+    "Attribute 1 name", "Attribute 1 value(s)", "Attribute 2 name",
+    "Attribute 2 value(s)", "Attribute 3 name", "Attribute 3 value(s)",
+    "Meta: _wc_gla_mc_status", "Meta: _wc_gla_visibility", "Meta: _wc_gla_sync_status",
+}
+NUMERIC_COLUMNS = {
+    "ID": "Int64",
+    "Stock": "Float64",
+    "Meta: rank_math_seo_score": "Float64",
+}
+# ----------------------------------------------------------------------------- #
+
+
+def cache_path_for(csv_path: str) -> str:
+    return os.path.splitext(csv_path)[0] + CACHE_SUFFIX
+
+
+def read_header(csv_path: str) -> List[str]:
+    """Return the column names of a CSV without parsing any rows."""
+    with open(csv_path, "r", encoding=CSV_ENCODING, newline="") as f:
+        return next(csv.reader(f), [])
+
+
+def export_dtypes(columns: Iterable[str]) -> dict:
+    """Compact dtype for each export column (categorical, nullable numeric or string)."""
+    dtypes = {}
+    for col in columns:
+        if col in NUMERIC_COLUMNS:
+            dtypes[col] = NUMERIC_COLUMNS[col]
+        elif col in CATEGORY_COLUMNS:
+            dtypes[col] = "category"
+        else:
+            dtypes[col] = STRING_DTYPE
+    return dtypes
+
+
+def _apply_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    for col, dtype in export_dtypes(df.columns).items():
+        if col in NUMERIC_COLUMNS:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(dtype)
+        else:
+            df[col] = df[col].astype(dtype)
+    return df
+
+
+def _csv_kwargs(csv_path: str, columns: Optional[List[str]]) -> dict:
+    wanted = set(columns) if columns else None
+    header = read_header(csv_path)
+    present = [c for c in header if wanted is None or c in wanted]
+    return {
+        "usecols": present,
+        # Parse as plain strings first; numeric/categorical conversion happens after,
+        # so a stray "1.0" in an integer column never breaks a chunk.
+        "dtype": {c: "string" for c in present},
+        "encoding": CSV_ENCODING,
+        "keep_default_na": False,
+        "na_values": [""],
+    }
+
+
+def _cache_is_fresh(csv_path: str, cache_path: str) -> bool:
+    return (
+        pa is not None
+        and os.path.exists(cache_path)
+        and (not os.path.exists(csv_path) or os.path.getmtime(cache_path) >= os.path.getmtime(csv_path))
+    )
+
+
+def read_export(csv_path: str = EXPORT_CSV, columns: Optional[List[str]] = None,
+                ids: Optional[Iterable[int]] = None, use_cache: bool = True) -> pd.DataFrame:
+    """Load only `columns` of the export (all if None), optionally restricted to `ids`.
+
+    Reads from the Feather cache when it is newer than the CSV, otherwise from the
+    CSV itself.
+    """
+    cache_path = cache_path_for(csv_path)
+    if use_cache and _cache_is_fresh(csv_path, cache_path):
+        available = pa.ipc.open_file(pa.memory_map(cache_path)).schema.names
+        cols = [c for c in available if columns is None or c in set(columns)]
+        table = feather.read_table(cache_path, columns=cols, memory_map=True)
+        if ids is not None:
+            table = table.filter(pc.is_in(table["ID"], value_set=pa.array(list(ids), pa.int64())))
+        return _apply_dtypes(table.to_pandas())
+
+    df = pd.read_csv(csv_path, **_csv_kwargs(csv_path, columns))
+    df = _apply_dtypes(df)
+    if ids is not None:
+        df = df[df["ID"].isin(list(ids))].reset_index(drop=True)
+    return df
+
+
+def iter_export_chunks(csv_path: str = EXPORT_CSV, columns: Optional[List[str]] = None,
+                       chunksize: int = CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """Yield the export `chunksize` rows at a time with compact dtypes."""
+    reader = pd.read_csv(csv_path, chunksize=chunksize, **_csv_kwargs(csv_path, columns))
+    for chunk in reader:
+        yield _apply_dtypes(chunk)
+
+
+def append_to_export(df: pd.DataFrame, csv_path: str) -> None:
+    """Append rows to an export CSV, aligned to its existing header (creates it if missing)."""
+    if os.path.exists(csv_path) and os.path.getsize(csv_path) > 0:
+        header = read_header(csv_path)
+        extra = [c for c in df.columns if c not in header]
+        if extra:
+            raise ValueError(f"Columns not present in {csv_path}: {extra}")
+        df.reindex(columns=header).to_csv(csv_path, mode="a", header=False, index=False, encoding="utf-8")
+    else:
+        df.to_csv(csv_path, index=False, encoding=CSV_ENCODING)
+
+
+def update_export(csv_path: str, updates: Dict[int, Dict[str, str]]) -> int:
+    """Overwrite single cells by product ID, streaming the CSV (other cells are copied verbatim).
+
+    `updates` maps ID → {column: new value}; returns the number of rows changed.
+    """
+    csv.field_size_limit(2**31 - 1)  # long HTML cells
+    header = read_header(csv_path)
+    missing = {c for fields in updates.values() for c in fields} - set(header)
+    if missing:
+        raise ValueError(f"Columns not present in {csv_path}: {sorted(missing)}")
+    id_pos = header.index("ID")
+    positions = {c: header.index(c) for c in header}
+    changed = 0
+    tmp = f"{csv_path}.tmp"
+    with open(csv_path, "r", encoding=CSV_ENCODING, newline="") as src, \
+            open(tmp, "w", encoding=CSV_ENCODING, newline="") as dst:
+        reader, writer = csv.reader(src), csv.writer(dst)
+        writer.writerow(next(reader))
+        for row in reader:
+            fields = updates.get(int(row[id_pos])) if len(row) > id_pos and row[id_pos].strip().isdigit() else None
+            if fields:
+                row += [""] * (len(header) - len(row))  # short row: pad before writing past its end
+                for col, value in fields.items():
+                    row[positions[col]] = value
+                changed += 1
+            writer.writerow(row)
+    os.replace(tmp, csv_path)
+    return changed
+
+
+def build_export_cache(csv_path: str = EXPORT_CSV, cache_path: Optional[str] = None,
+                       chunksize: int = CHUNK_SIZE) -> str:
+    """Convert the export CSV into a Feather cache sorted by `ID` and return its path."""
+    if pa is None:
+        raise RuntimeError("pyarrow is required to build the export cache (pip install pyarrow)")
+    cache_path = cache_path or cache_path_for(csv_path)
+
+    tables = []
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize, **_csv_kwargs(csv_path, None)):
+        if "ID" in chunk.columns:
+            chunk["ID"] = pd.to_numeric(chunk["ID"], errors="coerce").astype("Int64")
+        tables.append(pa.Table.from_pandas(chunk, preserve_index=False))
+    table = pa.concat_tables(tables, promote_options="default")
+    if "ID" in table.schema.names:
+        table = table.sort_by("ID")
+
+    tmp_path = cache_path + ".tmp"
+    feather.write_feather(table, tmp_path, compression="uncompressed")  # uncompressed → mmap‑able
+    os.replace(tmp_path, cache_path)
+    return cache_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the columnar cache for a WooCommerce export.")
+    parser.add_argument("csv_in", nargs="?", default=EXPORT_CSV, help="Export CSV file")
+    parser.add_argument("--out", default=None, help="Cache file (default: <csv>.feather)")
+    args = parser.parse_args()
+
+    path = build_export_cache(args.csv_in, args.out)
+    print(f"✅ Export cache written to {path}")
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+label_ocr.py  ─────────────────────────────────────────────────────────────────────
+Read nutrition facts off label photos with a local Tesseract – no web search, no LLM.
+
+1. Candidate images per product: `Nutrition Label URL` (scraper CSVs) first, then
+   the gallery (`Images` / `images`) from the back, where label shots usually are.
+   At most `MAX_IMAGES` per product, tried in rounds so a product stops as soon
+   as one image gives a usable table.
+2. Images are downloaded into the shared image store (`image_pipeline.py`), so a
+   label used by several flavours is fetched and read once.
+3. OCR runs in a process pool (Pillow clean‑up + `pytesseract`); the text is
+   cached in `label_ocr.db` by the image's sha256 and re‑parsed on every run, so
+   parser fixes reach labels that were read before.
+4. The text goes through `parse_nutrition_text()`; results with fewer than
+   `MIN_NUTRIENTS` values or implausible numbers are rejected.
+5. Accepted tables are rendered with `render_nutrition_table()`, written to a CSV
+   shaped like `products_with_nutrition_filled.csv` and, with `--db`, upserted
+   into the catalogue store as `NutritionHTML` / `Source`.
+
+Needs the `tesseract` binary with the `pol` language pack (`apt install
+tesseract-ocr tesseract-ocr-pol`) plus `pip install pytesseract pillow`.
+
+Run:
+    python label_ocr.py products_missing_nutrition.csv
+    python label_ocr.py products_guiltfree.csv --out guiltfree_label_nutrition.csv
+    python label_ocr.py products_missing_nutrition.csv --db catalogue.db
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+import sqlite3
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from image_pipeline import DOWNLOAD_WORKERS, ImageStore, download, make_session, split_urls  # noqa: E402
+from nutrition_renderer import parse_nutrition_text, render_nutrition_table  # noqa: E402
+
+# ------------------------------ CONFIG --------------------------------------- #
+OCR_CACHE_DB = "label_ocr.db"
+OUTPUT_CSV = "products_with_label_nutrition.csv"
+LABEL_COLUMNS = ["Nutrition Label URL"]
+GALLERY_COLUMNS = ["Images", "images"]
+KEY_COLUMNS = ["ID", "GTIN", "Title", "Name"]  # first one present identifies a product
+NAME_COLUMNS = ["Name", "Title"]
+MAX_IMAGES = 4
+MIN_NUTRIENTS = 5
+OCR_LANG = "pol+eng"
+OCR_CONFIG = "--oem 1 --psm 6"   # LSTM engine, one uniform block of text (a table)
+MIN_WIDTH = 1600                 # labels are upscaled to this before OCR
+OCR_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+ENGINE = "tesseract"
+# ----------------------------------------------------------------------------- #
+
+_NUMBER = r"<?\s*\d+(?:[.,]\d+)?"
+_QUANTITY = re.compile(rf"({_NUMBER})\s*(mg|g)?\b", re.IGNORECASE)
+_KJ = re.compile(rf"({_NUMBER})\s*kj", re.IGNORECASE)
+_KCAL = re.compile(rf"({_NUMBER})\s*kcal", re.IGNORECASE)
+
+
+# === OCR (process pool) ===
+def ocr_image(sha: str, path: str) -> Tuple[str, str]:
+    """(sha, text) – greyscale, upscale and autocontrast the photo, then Tesseract it."""
+    import pytesseract
+    from PIL import Image, ImageOps
+
+    with Image.open(path) as img:
+        img = ImageOps.exif_transpose(img).convert("L")
+        if img.width < MIN_WIDTH:
+            img = img.resize((MIN_WIDTH, round(img.height * MIN_WIDTH / img.width)), Image.LANCZOS)
+        img = ImageOps.autocontrast(img, cutoff=1)
+        return sha, pytesseract.image_to_string(img, lang=OCR_LANG, config=OCR_CONFIG)
+
+
+def _init_worker():
+    os.environ["OMP_THREAD_LIMIT"] = "1"  # one Tesseract thread per process, the pool does the rest
+
+
+# === TEXT → VALUES ===
+def clean_ocr_text(text: str) -> str:
+    """Undo the usual OCR slips on label tables before parsing."""
+    text = text.replace("|", " ").replace("—", "-")
+    text = re.sub(r"(?<=\d)\s*[oO](?=[\d,.]|\s*g\b)", "0", text)        # 1O,5 g → 10,5 g
+    text = re.sub(r"(?<=\d)\s+(?=[.,]\d)|(?<=\d[.,])\s+(?=\d)", "", text)  # 12 ,5 → 12,5
+    return text
+
+
+def normalise_value(key: str, value: str) -> str:
+    """First column only (labels print 100 g first, then a portion): "12,5 g 3,1 g" → "12,5 g"."""
+    if key == "energy":
+        kj, kcal = _KJ.search(value), _KCAL.search(value)
+        parts = [f"{m.group(1).strip()} {unit}" for m, unit in ((kj, "kJ"), (kcal, "kcal")) if m]
+        return " / ".join(parts) or value
+    match = _QUANTITY.search(value)
+    if not match:
+        return value
+    return f"{match.group(1).strip()} {match.group(2) or 'g'}"
+
+
+def _grams(value: str) -> Optional[float]:
+    match = re.search(r"\d+(?:[.,]\d+)?", value or "")
+    if not match:
+        return None
+    number = float(match.group(0).replace(",", "."))
+    return number / 1000 if re.search(r"\dmg|\d\s+mg", value) else number
+
+
+def plausible(values: Dict[str, str]) -> bool:
+    """Per 100 g no macro exceeds 100 g and the "of which" rows fit inside their parents."""
+    grams = {k: _grams(v) for k, v in values.items() if k != "energy"}
+    if any(g is not None and g > 100 for g in grams.values()):
+        return False
+    for part, whole in (("sat_fat", "fat"), ("sugars", "carbs")):
+        if grams.get(part) is not None and grams.get(whole) is not None and grams[part] > grams[whole] + 0.05:
+            return False
+    return "energy" in values and len(values) >= MIN_NUTRIENTS
+
+
+def parse_label(text: str) -> Dict[str, str]:
+    values = parse_nutrition_text(clean_ocr_text(text))
+    return {k: normalise_value(k, v) for k, v in values.items()}
+
+
+# === CACHE ===
+class OcrCache:
+    """sha256 of the image → OCR text (and the values parsed when it was stored)."""
+
+    def __init__(self, path: str = OCR_CACHE_DB):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS ocr (sha TEXT PRIMARY KEY, engine TEXT, text TEXT, nutrients TEXT, created_at TEXT)"
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get(self, shas: List[str]) -> Dict[str, Dict[str, str]]:
+        """Values for already read images, parsed from the cached text (empty dict = nothing usable)."""
+        found = {}
+        for i in range(0, len(shas), 500):
+            chunk = shas[i:i + 500]
+            rows = self.conn.execute(
+                f"SELECT sha, text FROM ocr WHERE engine = ? AND sha IN ({','.join('?' for _ in chunk)})",
+                [ENGINE] + chunk)
+            for sha, text in rows:
+                values = parse_label(text or "")
+                found[sha] = values if plausible(values) else {}
+        return found
+
+    def put(self, sha: str, text: str, nutrients: Dict[str, str]):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO ocr (sha, engine, text, nutrients, created_at) VALUES (?, ?, ?, ?, ?)",
+                (sha, ENGINE, text, json.dumps(nutrients, ensure_ascii=False),
+                 datetime.now().isoformat(timespec="seconds")))
+
+
+# === PRODUCTS ===
+def read_products(csv_path: str) -> Tuple[str, List[dict]]:
+    """(key column, [{key, name, candidates}]) from an export or scraper CSV."""
+    csv.field_size_limit(2**31 - 1)
+    with open(csv_path, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.DictReader(f)
+        header = reader.fieldnames or []
+        key_col = next((c for c in KEY_COLUMNS if c in header), None)
+        if key_col is None:
+            raise ValueError(f"{csv_path} has none of the key columns {KEY_COLUMNS}")
+        name_col = next((c for c in NAME_COLUMNS if c in header), key_col)
+        products = []
+        for row in reader:
+            labels = [u for c in LABEL_COLUMNS for u in split_urls(row.get(c))]
+            gallery = [u for c in GALLERY_COLUMNS for u in split_urls(row.get(c))][::-1]
+            candidates = list(dict.fromkeys(labels + gallery))[:MAX_IMAGES]
+            if row.get(key_col) and candidates:
+                products.append({"key": row[key_col], "name": row.get(name_col, ""), "candidates": candidates})
+    return key_col, products
+
+
+def run(csv_path: str, images: ImageStore, cache: OcrCache, workers: int = OCR_WORKERS) -> Tuple[str, List[dict]]:
+    key_col, products = read_products(csv_path)
+    print(f"🔎 {len(products)} products with label/gallery images")
+    session = make_session()
+    found: Dict[str, Tuple[Dict[str, str], str]] = {}
+
+    with ProcessPoolExecutor(max_workers=max(1, workers), initializer=_init_worker) as pool:
+        for round_no in range(MAX_IMAGES):
+            todo = {p["key"]: p["candidates"][round_no] for p in products
+                    if p["key"] not in found and len(p["candidates"]) > round_no}
+            if not todo:
+                break
+            urls = list(dict.fromkeys(todo.values()))
+            known = images.known_urls(urls)
+            missing = [u for u in urls if u not in known]
+            with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as fetchers:
+                list(fetchers.map(lambda u: download(session, images, u), missing))
+            local = images.local_paths(urls)
+
+            results = cache.get(list({sha for sha, _ in local.values()}))
+            fresh = {sha: path for sha, path in local.values() if sha not in results}
+            for future in as_completed([pool.submit(ocr_image, sha, path) for sha, path in fresh.items()]):
+                try:
+                    sha, text = future.result()
+                except Exception as e:
+                    print(f"⚠️ OCR failed: {type(e).__name__}: {e}")
+                    continue
+                values = parse_label(text)
+                results[sha] = values if plausible(values) else {}
+                cache.put(sha, text, results[sha])
+
+            hits = 0
+            for key, url in todo.items():
+                values = results.get(local.get(url, ("", ""))[0])
+                if values:
+                    found[key] = (values, url)
+                    hits += 1
+            print(f"   round {round_no + 1}: {len(urls)} images, {len(fresh)} read, {hits} tables found")
+
+    output = []
+    for p in products:
+        values, source = found.get(p["key"], ({}, ""))
+        output.append({
+            key_col: p["key"],
+            "Name": p["name"],
+            "NutritionHTML": render_nutrition_table(values) if values else "",
+            "Source": f"OCR: {source}" if source else "",
+            "NutritionFound": int(bool(values)),
+        })
+    return key_col, output
+
+
+if __name__ == "__main__":
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Fill nutrition tables from label photos with local OCR.")
+    parser.add_argument("csv", help="Export/scraper CSV, e.g. products_missing_nutrition.csv")
+    parser.add_argument("--out", default=OUTPUT_CSV, help="Result CSV (ID, Name, NutritionHTML, Source, NutritionFound)")
+    parser.add_argument("--db", help="Also upsert found tables into this catalogue store")
+    parser.add_argument("--cache", default=OCR_CACHE_DB)
+    parser.add_argument("--workers", type=int, default=OCR_WORKERS)
+    args = parser.parse_args()
+
+    with ImageStore() as images, OcrCache(args.cache) as cache:
+        key_col, rows = run(args.csv, images, cache, args.workers)
+    df = pd.DataFrame(rows)
+    df.to_csv(args.out, index=False, encoding="utf-8")
+    print(f"✅ {int(df['NutritionFound'].sum()) if len(df) else 0}/{len(df)} products have a table → {args.out}")
+
+    if args.db:
+        from catalogue_store import CatalogueStore
+
+        if key_col != "ID":
+            print("⚠️ --db needs an export CSV with an ID column – store not updated")
+        else:
+            with CatalogueStore(args.db) as store:
+                changed = store.upsert_columns(df[df["NutritionFound"] == 1], columns=["NutritionHTML", "Source"])
+            print(f"🥗 Catalogue store: {changed} products updated")
@@ -0,0 +1,151 @@
+"""
+llm_backends.py  ─────────────────────────────────────────────────────────────────
+Chat completion calls shared by the product enhancers and `regenerate_fields.py`.
+
+`enhance_with_gpt` (OpenAI) and `enhance_with_grok` (xAI) take a system and a
+user prompt and return cleaned HTML, or "" on failure. Both back off on rate
+limits. `delay` is the pause after a successful call; the enhancers keep their
+30 s default, callers that rate‑limit themselves pass 0.
+
+Every call feeds `llm_latency_seconds{backend}` (request time only, without
+the pauses), `llm_calls_total{backend,outcome}` and `llm_retries_total{backend}`;
+each whole call, retries and pauses included, is a span (`<function>_seconds`).
+"""
+
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from instrumentation import inc, log, observe, traced
+
+# ------------------------------ CONFIG --------------------------------------- #
+GPT_MODEL = "gpt-4"
+GROK_MODEL = "grok-3-latest"
+GROK_URL = "https://api.x.ai/v1/chat/completions"
+CALL_DELAY = 30        # seconds slept after each successful GPT call
+MAX_ATTEMPTS = 5
+# ----------------------------------------------------------------------------- #
+
+_client = None
+
+
+def clean_html(text: str) -> str:
+    text = re.sub(r"^```html\s*|```$", "", text.strip(), flags=re.IGNORECASE)
+    text = re.sub(r"\*\*(.*?)\*\*", r"<strong>\1</strong>", text)
+    text = re.sub(r"\*(.*?)\*", r"<em>\1</em>", text)
+    text = re.sub(r"^#{1,3}\s*(.*?)$", r"<h2>\1</h2>", text, flags=re.MULTILINE)
+    text = re.sub(r"<p[^>]*>(&nbsp;|\s)*</p>", "", text, flags=re.IGNORECASE)
+    text = re.sub(r"(<br\s*/?>\s*)+", "<br>", text, flags=re.IGNORECASE)
+    text = re.sub(r"^(<br\s*/?>)+", "", text, flags=re.IGNORECASE)
+    text = re.sub(r"^\d+\.\s+", "", text, flags=re.MULTILINE)
+    return text.strip()
+
+
+def _openai_client():
+    global _client
+    if _client is None:
+        from openai import OpenAI
+
+        _client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _client
+
+
+# === GPT CALL ===
+@traced("enhance_with_gpt")
+def enhance_with_gpt(system_prompt, user_prompt, delay=CALL_DELAY):
+    retry_delay = 30
+    for attempt in range(MAX_ATTEMPTS):
+        started = time.perf_counter()
+        try:
+            response = _openai_client().chat.completions.create(
+                model=GPT_MODEL,
+                messages=[{"role": "system", "content": system_prompt},
+                          {"role": "user", "content": user_prompt}],
+                temperature=0.7,
+                max_tokens=2000
+            )
+            observe("llm_latency_seconds", time.perf_counter() - started, backend="gpt")
+            inc("llm_calls_total", backend="gpt", outcome="ok")
+            if delay:
+                time.sleep(delay + random.uniform(1, 5))
+            return clean_html(response.choices[0].message.content)
+        except Exception as e:
+            observe("llm_latency_seconds", time.perf_counter() - started, backend="gpt")
+            if "rate limit" in str(e).lower():
+                wait = retry_delay + random.randint(0, 10)
+                print(f"⏳ Rate limit hit. Waiting {wait}s... (Attempt {attempt+1}/{MAX_ATTEMPTS})")
+                inc("llm_retries_total", backend="gpt")
+                log("llm_rate_limited", level="warning", backend="gpt", attempt=attempt + 1, wait=wait)
+                time.sleep(wait)
+                retry_delay *= 2
+            else:
+                print(f"❌ GPT error: {e}")
+                inc("llm_calls_total", backend="gpt", outcome="error")
+                log("llm_error", level="error", backend="gpt", error=str(e))
+                return ""
+    print("❌ Max retries reached. Skipping.")
+    inc("llm_calls_total", backend="gpt", outcome="gave_up")
+    return ""
+
+
+# === GROK CALL ===
+@traced("enhance_with_grok")
+def enhance_with_grok(system_prompt, user_prompt, delay=0):
+    import requests
+
+    headers = {
+        "Authorization": f"Bearer {os.getenv('GROK_API_KEY')}",  # xAI key
+        "Content-Type": "application/json"
+    }
+    payload = {
+        "model": GROK_MODEL,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        "temperature": 0.7,
+        "stream": False
+    }
+
+    retry_delay = 30
+    for attempt in range(MAX_ATTEMPTS):
+        started = time.perf_counter()
+        try:
+            response = requests.post(GROK_URL, headers=headers, json=payload, timeout=60)
+            observe("llm_latency_seconds", time.perf_counter() - started, backend="grok")
+            if response.status_code == 200:
+                inc("llm_calls_total", backend="grok", outcome="ok")
+                if delay:
+                    time.sleep(delay)
+                return clean_html(response.json()["choices"][0]["message"]["content"])
+            elif response.status_code == 429:
+                wait = retry_delay + random.randint(0, 10)
+                print(f"⏳ Rate limited. Waiting {wait}s (Attempt {attempt+1}/{MAX_ATTEMPTS})...")
+                inc("llm_retries_total", backend="grok")
+                log("llm_rate_limited", level="warning", backend="grok", attempt=attempt + 1, wait=wait)
+                time.sleep(wait)
+                retry_delay *= 2
+            elif response.status_code == 401:
+                print(f"❌ Invalid Grok API key.")
+                print(response.json())
+                inc("llm_calls_total", backend="grok", outcome="error")
+                return ""
+            else:
+                print(f"❌ GROK error {response.status_code}: {response.text}")
+                inc("llm_calls_total", backend="grok", outcome="error")
+                log("llm_error", level="error", backend="grok", status=response.status_code)
+                return ""
+        except Exception as e:
+            print(f"❌ Request error: {e}")
+            inc("llm_calls_total", backend="grok", outcome="error")
+            log("llm_error", level="error", backend="grok", error=str(e))
+            return ""
+    print("❌ Max retries reached. Skipping.")
+    inc("llm_calls_total", backend="grok", outcome="gave_up")
+    return ""
+
+
+BACKENDS = {"gpt": enhance_with_gpt, "grok": enhance_with_grok}
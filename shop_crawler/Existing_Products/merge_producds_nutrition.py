@@ -1,20 +1,23 @@
 import pandas as pd
+from catalogue_store import CatalogueStore
 
-# === Load both CSV files ===
+# === Input / output files ===
 reference_csv = "export_for_reference_enhanced.csv"
 nutrition_csv = "products_with_nutrition_filled.csv"
+output_csv = "export_enhanced_with_nutrition.csv"
 
-df_reference = pd.read_csv(reference_csv, encoding="utf-8")
-df_nutrition = pd.read_csv(nutrition_csv, encoding="utf-8")
+with CatalogueStore() as store:
+    # === Refresh the catalogue (no-op if the export has not changed) ===
+    changed = store.import_export(reference_csv)
+    print(f"📦 Catalogue refreshed from {reference_csv}: {changed} rows changed, "
+          f"{store.last_import['removed']} products removed")
 
-# === Merge on 'ID' column ===
-df_merged = df_reference.merge(
-    df_nutrition[["ID", "NutritionHTML", "Source"]],
-    on="ID",
-    how="left"
-)
+    # === Upsert nutrition columns by 'ID' ===
+    df_nutrition = pd.read_csv(nutrition_csv, encoding="utf-8", usecols=["ID", "NutritionHTML", "Source"])
+    changed = store.upsert_columns(df_nutrition)
+    print(f"🥗 Nutrition upserted: {changed} products changed")
 
-# === Save to new file ===
-df_merged.to_csv("export_enhanced_with_nutrition.csv", index=False, encoding="utf-8")
+    # === Stream the merged catalogue out ===
+    count = store.export_csv(output_csv)
 
-print("✅ Merged successfully: export_enhanced_with_nutrition.csv created.")
+print(f"✅ Merged successfully: {output_csv} created ({count} products).")
@@ -1,17 +1,16 @@
 import pandas as pd
+from catalogue_store import CatalogueStore
 
 # 1) Load the two files
 mapped       = pd.read_csv("mapped_brands.csv",      encoding="ISO-8859-1")
 missing_map  = pd.read_csv("mapped_brands_missing.csv", encoding="utf-8-sig")
 
-# 2) Concatenate and drop any duplicate Brand entries, keeping the first occurrence
-merged = pd.concat([mapped, missing_map], ignore_index=True)
-merged = merged.drop_duplicates(subset="Brand", keep="first")
+# 2) Upsert both into the brand table; the first URL seen for a Brand is kept
+with CatalogueStore() as store:
+    added = store.upsert_brands(mapped) + store.upsert_brands(missing_map)
+    print(f"🏷️ {added} new brands added to the catalogue store")
 
-# 3) (Optional) sort by Brand name
-merged = merged.sort_values("Brand").reset_index(drop=True)
+    # 3) Write back to disk, sorted by Brand name
+    count = store.export_brands_csv("mapped_brands_merged.csv")
 
-# 4) Write back to disk (you can overwrite mapped_brands.csv or write a new file)
-merged.to_csv("mapped_brands_merged.csv", index=False, encoding="utf-8-sig")
-
-print("✅ Merged file written to mapped_brands_merged.csv")
+print(f"✅ Merged file written to mapped_brands_merged.csv ({count} brands)")
@@ -4,37 +4,12 @@ import pandas as pd
 import asyncio
 from dotenv import load_dotenv
 from agents import Agent, Runner, WebSearchTool
+from nutrition_renderer import render_nutrition_table
 
 # ─── Configuration ───────────────────────────────────────────────────────────────
 
 load_dotenv()  # expects OPENAI_API_KEY in your environment
 
-HTML_TEMPLATE = """
-<div style='overflow-x:auto;'>
-  <h2>Tabela wartości odżywczych</h2>
-  <div style="overflow-x:auto;">
-    <table style='width: 100%; border-collapse: collapse; margin: 20px 0; font-family: Arial, sans-serif;'>
-      <thead>
-        <tr style='background-color: #f2f2f2; text-align: left;'>
-          <th style='padding: 12px; border: 1px solid #ddd;'>Składnik</th>
-          <th style='padding: 12px; border: 1px solid #ddd;'>Wartość</th>
-        </tr>
-      </thead>
-      <tbody>
-        <tr><td style='padding: 12px; border: 1px solid #ddd;'>Wartość odżywcza</td><td style='padding: 12px; border: 1px solid #ddd;'>100 g</td></tr>
-        <tr><td style='padding: 12px; border: 1px solid #ddd;'>Wartość energetyczna</td><td style='padding: 12px; border: 1px solid #ddd;'>{energy}</td></tr>
-        <tr><td style='padding: 12px; border: 1px solid #ddd;'>Tłuszcz</td><td style='padding: 12px; border: 1px solid #ddd;'>{fat}</td></tr>
-        <tr><td style='padding: 12px; border: 1px solid #ddd;'>w tym kwasy tłuszczowe nasycone</td><td style='padding: 12px; border: 1px solid #ddd;'>{saturated_fat}</td></tr>
-        <tr><td style='padding: 12px; border: 1px solid #ddd;'>Węglowodany</td><td style='padding: 12px; border: 1px solid #ddd;'>{carbs}</td></tr>
-        <tr><td style='padding: 12px; border: 1px solid #ddd;'>w tym cukry</td><td style='padding: 12px; border: 1px solid #ddd;'>{sugars}</td></tr>
-        <tr><td style='padding: 12px; border: 1px solid #ddd;'>Białko</td><td style='padding: 12px; border: 1px solid #ddd;'>{protein}</td></tr>
-        <tr><td style='padding: 12px; border: 1px solid #ddd;'>Sól</td><td style='padding: 12px; border: 1px solid #ddd;'>{salt}</td></tr>
-      </tbody>
-    </table>
-  </div>
-</div>
-"""
-
 # ─── Build the Agent ─────────────────────────────────────────────────────────────
 
 agent = Agent(
@@ -74,9 +49,12 @@ async def main():
             # Try parsing JSON
             try:
                 nutrition = json.loads(json_part)
-                html = HTML_TEMPLATE.format(**nutrition)
-                flag = 1
             except json.JSONDecodeError:
+                nutrition = None
+            if isinstance(nutrition, dict):  # a bare list/number/string is valid JSON too
+                html = render_nutrition_table(nutrition)
+                flag = 1
+            else:
                 html, source, flag = "", "", 0
 
         output.append({
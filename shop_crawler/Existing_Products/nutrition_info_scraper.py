@@ -10,7 +10,7 @@ It works by:
    strefasupli.pl, sklepsport‑max.pl, oshee.eu, musclep… etc.).
 4. Downloading the first matching product page (via requests).
 5. Parsing the nutrition table or list with BeautifulSoup & regex.
-6. Mapping the extracted nutrient values into your strict HTML template.
+6. Rendering the extracted nutrient values with `nutrition_renderer`.
 7. Writing a new CSV with the populated `NutritionHTML` column.
 
 ─────────────────────────────────────────────────────────────────────────────────
@@ -23,7 +23,9 @@ Run:
 Tip: add the flag --headless if you enable Playwright for JS‑rendered sites.
 """
 
+import os
 import re
+import sys
 import time
 import argparse
 from pathlib import Path
@@ -34,6 +36,10 @@ from bs4 import BeautifulSoup
 from duckduckgo_search import DDGS
 from tqdm import tqdm
 from unidecode import unidecode
+from nutrition_renderer import render_nutrition_table
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from instrumentation import traced
 
 # ------------------------------ CONFIG --------------------------------------- #
 ALLOWED_DOMAINS = [
@@ -49,30 +55,6 @@ ALLOWED_DOMAINS = [
     "kfd.pl",
 ]
 
-HTML_TEMPLATE = """
-<div style='overflow-x:auto;'>
-<h2>Tabela wartości odżywczych</h2>
-<div style="overflow-x:auto;"><table style='width: 100%; border-collapse: collapse; margin: 20px 0; font-family: Arial, sans-serif;'>
-<thead>
-<tr style='background-color: #f2f2f2; text-align: left;'>
-<th style='padding: 12px; border: 1px solid #ddd;'>Składnik</th>
-<th style='padding: 12px; border: 1px solid #ddd;'>Wartość</th>
-</tr>
-</thead>
-<tbody>
-<tr><td style='padding: 12px; border: 1px solid #ddd;'>Wartość odżywcza</td><td style='padding: 12px; border: 1px solid #ddd;'>100 g</td></tr>
-<tr><td style='padding: 12px; border: 1px solid #ddd;'>Wartość energetyczna</td><td style='padding: 12px; border: 1px solid #ddd;'>{energy}</td></tr>
-<tr><td style='padding: 12px; border: 1px solid #ddd;'>Tłuszcz</td><td style='padding: 12px; border: 1px solid #ddd;'>{fat}</td></tr>
-<tr><td style='padding: 12px; border: 1px solid #ddd;'>w tym kwasy tłuszczowe nasycone</td><td style='padding: 12px; border: 1px solid #ddd;'>{sat_fat}</td></tr>
-<tr><td style='padding: 12px; border: 1px solid #ddd;'>Węglowodany</td><td style='padding: 12px; border: 1px solid #ddd;'>{carbs}</td></tr>
-<tr><td style='padding: 12px; border: 1px solid #ddd;'>w tym cukry</td><td style='padding: 12px; border: 1px solid #ddd;'>{sugars}</td></tr>
-<tr><td style='padding: 12px; border: 1px solid #ddd;'>Białko</td><td style='padding: 12px; border: 1px solid #ddd;'>{protein}</td></tr>
-<tr><td style='padding: 12px; border: 1px solid #ddd;'>Sól</td><td style='padding: 12px; border: 1px solid #ddd;'>{salt}</td></tr>
-</tbody>
-</table></div>
-</div>
-"""
-
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
     "AppleWebKit/537.36 (KHTML, like Gecko) "
@@ -115,6 +97,7 @@ def clean_text(cell: str) -> str:
     return re.sub(r"\s+", " ", cell).strip()
 
 
+@traced("extract_nutrition")
 def extract_nutrition(soup: BeautifulSoup) -> Dict[str, str]:
     # Try to find <table> with energy etc.
     data = {}
@@ -148,19 +131,10 @@ def extract_nutrition(soup: BeautifulSoup) -> Dict[str, str]:
 
 
 def format_html(nutrition: Dict[str, str]) -> str:
-    default = {
-        "energy": "—",
-        "fat": "—",
-        "sat_fat": "—",
-        "carbs": "—",
-        "sugars": "—",
-        "protein": "—",
-        "salt": "—",
-    }
-    merged = {**default, **nutrition}
-    return HTML_TEMPLATE.format(**merged)
+    return render_nutrition_table(nutrition)
 
 
+@traced("process_product")
 def process_product(name: str, brand: str) -> str:
     query = f"{brand} {name} wartości odżywcze"
     url = search_product_page(query)
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+nutrition_renderer.py  ───────────────────────────────────────────────────────────
+Deterministic HTML for the nutrition table, the brand block and the fixed parts
+of the long description – no LLM round‑trip needed.
+
+1. `parse_nutrition_text()` turns whatever we have (export description text,
+   scraper "label: value (100g)" strings, an existing HTML table) into a dict
+   with the keys energy, fat, sat_fat, carbs, sugars, fibre, protein, salt. With
+   `extras=True` any other labelled row (polyols, vitamins, minerals …) is kept
+   under its own label.
+2. `render_nutrition_table()` / `render_brand_block()` render from that dict:
+   the seven standard rows always, fibre when known, extra rows after them.
+   Row templates are compiled once from `TABLE_STYLES`, so rendering is plain
+   string joins.
+3. Run as a script to re‑render every table in an export after a style change
+   (a table that would come out with fewer rows than it has is left alone):
+
+    python nutrition_renderer.py export_for_reference_enhanced.csv out.csv
+"""
+
+import argparse
+import html
+import re
+import time
+from typing import Dict, Iterable, List, Optional
+
+# ------------------------------ CONFIG --------------------------------------- #
+TABLE_HEADING = "Tabela wartości odżywczych"
+MISSING_VALUE = "—"
+
+TABLE_STYLES = {
+    "wrapper": "overflow-x:auto;",
+    "table": "width: 100%; border-collapse: collapse; margin: 20px 0; font-family: Arial, sans-serif;",
+    "head_row": "background-color: #f2f2f2; text-align: left;",
+    "cell": "padding: 12px; border: 1px solid #ddd;",
+}
+
+# (key, label shown in the table)
+NUTRIENT_ROWS = [
+    ("energy", "Wartość energetyczna"),
+    ("fat", "Tłuszcz"),
+    ("sat_fat", "w tym kwasy tłuszczowe nasycone"),
+    ("carbs", "Węglowodany"),
+    ("sugars", "w tym cukry"),
+    ("fibre", "Błonnik"),
+    ("protein", "Białko"),
+    ("salt", "Sól"),
+]
+OPTIONAL_ROWS = {"fibre"}  # shown only when known – not every label lists it
+
+# Alternative keys used by older scripts / agent JSON replies
+KEY_ALIASES = {
+    "saturated_fat": "sat_fat",
+    "saturates": "sat_fat",
+    "carbohydrates": "carbs",
+    "sugar": "sugars",
+    "fiber": "fibre",
+    "błonnik": "fibre",
+}
+
+# Label patterns, most specific first (saturates before fat, sugars before carbs)
+LABEL_PATTERNS = [
+    ("sat_fat", re.compile(r"nasycon|saturat", re.IGNORECASE)),
+    ("sugars", re.compile(r"cukr|sugar", re.IGNORECASE)),
+    ("fibre", re.compile(r"b[łl]onnik|fibre|fiber", re.IGNORECASE)),
+    ("energy", re.compile(r"warto\w* energet|energ|kalori|calori", re.IGNORECASE)),
+    ("fat", re.compile(r"t[łl]uszcz|^fat|\bfat\b", re.IGNORECASE)),
+    ("carbs", re.compile(r"w[ęe]glowod|carbohydrat", re.IGNORECASE)),
+    ("protein", re.compile(r"bia[łl]k|protein", re.IGNORECASE)),
+    ("salt", re.compile(r"^s[óo]l\b|\bs[óo]l\b|salt", re.IGNORECASE)),
+]
+# Lines that mention a nutrient but are not the row we want (e.g. "węglowodany netto");
+# with `extras=True` they are kept as rows of their own
+SKIP_PATTERN = re.compile(r"netto|net carb|poliol|polyol", re.IGNORECASE)
+# Table header rows – never nutrients, not even extra ones
+HEADER_PATTERN = re.compile(r"^(warto\w* od[żz]ywcz|sk[łl]adnik|nutrition|per\b|porcj|portion)", re.IGNORECASE)
+_WRAPPER_OPEN = re.compile(r"<div[^>]*>\s*", re.IGNORECASE)
+# ----------------------------------------------------------------------------- #
+
+
+def _compile(styles: Dict[str, str]) -> Dict[str, str]:
+    """Build the static parts of the table once; only cell values are filled in later."""
+    cell = styles["cell"]
+    return {
+        "head": (
+            f"<div style='{styles['wrapper']}'>\n"
+            f"<h2>{TABLE_HEADING}</h2>\n"
+            f"<table style='{styles['table']}'>\n"
+            "<thead>\n"
+            f"<tr style='{styles['head_row']}'>"
+            f"<th style='{cell}'>Składnik</th><th style='{cell}'>Wartość</th></tr>\n"
+            "</thead>\n<tbody>\n"
+            f"<tr><td style='{cell}'>Wartość odżywcza</td><td style='{cell}'>100 g</td></tr>\n"
+        ),
+        "rows": [
+            (key, f"<tr><td style='{cell}'>{label}</td><td style='{cell}'>{{}}</td></tr>\n")
+            for key, label in NUTRIENT_ROWS
+        ],
+        "extra": f"<tr><td style='{cell}'>{{}}</td><td style='{cell}'>{{}}</td></tr>\n",
+        "tail": "</tbody>\n</table>\n</div>",
+    }
+
+
+_TEMPLATE = _compile(TABLE_STYLES)
+
+
+def set_styles(**styles: str) -> None:
+    """Override parts of `TABLE_STYLES` and recompile the row templates."""
+    global _TEMPLATE
+    TABLE_STYLES.update(styles)
+    _TEMPLATE = _compile(TABLE_STYLES)
+
+
+_STANDARD_KEYS = {key for key, _ in NUTRIENT_ROWS}
+
+
+def normalise_keys(values: Dict[str, str]) -> Dict[str, str]:
+    """Standard keys lowercased and de‑aliased; any other key is an extra row label, kept as is."""
+    out = {}
+    for key, value in values.items():
+        key = str(key).strip()
+        lowered = KEY_ALIASES.get(key.lower(), key.lower())
+        if lowered in _STANDARD_KEYS:
+            key = lowered
+        if key and value is not None and str(value).strip():
+            out.setdefault(key, str(value).strip())
+    return out
+
+
+def render_nutrition_table(values: Dict[str, str]) -> str:
+    """HTML table for one product; missing standard nutrients are shown as `MISSING_VALUE`."""
+    values = normalise_keys(values)
+    parts = [_TEMPLATE["head"]]
+    for key, row in _TEMPLATE["rows"]:
+        if key in OPTIONAL_ROWS and key not in values:
+            continue
+        parts.append(row.format(html.escape(values.get(key, MISSING_VALUE))))
+    for label, value in values.items():
+        if label not in _STANDARD_KEYS:
+            parts.append(_TEMPLATE["extra"].format(html.escape(label), html.escape(value)))
+    parts.append(_TEMPLATE["tail"])
+    return "".join(parts)
+
+
+def render_nutrition_tables(values: Iterable[Dict[str, str]]) -> List[str]:
+    """Batch version of `render_nutrition_table`."""
+    return [render_nutrition_table(v) for v in values]
+
+
+def render_brand_block(brand: str, brand_url: Optional[str], product_name: str = "",
+                       brand_text: str = "") -> str:
+    """`O marce …` section with the producer link; empty if the brand has no URL.
+
+    `brand_text` is the LLM‑written introduction (HTML); only the heading and the
+    link are templated. Without it a one‑line intro naming the product is used.
+    """
+    brand = str(brand or "").strip()
+    if not brand or not isinstance(brand_url, str) or not brand_url.strip():
+        return ""
+    name = html.escape(brand.title())
+    url = html.escape(str(brand_url).strip(), quote=True)
+    brand_text = str(brand_text or "").strip()
+    if brand_text:
+        intro = (brand_text if brand_text.startswith("<") else f"<p>{brand_text}</p>") + "\n"
+    elif product_name:
+        intro = f"<p>{html.escape(product_name)} to produkt marki {name}.</p>\n"
+    else:
+        intro = ""
+    return (
+        f"<h2>O marce {name}</h2>\n"
+        f"{intro}"
+        f"<p>Więcej informacji znajdziesz na stronie producenta: "
+        f"<a href='{url}' target='_blank'><strong><u>{url}</u></strong></a></p>"
+    )
+
+
+def render_long_description(sections: Iterable[str], nutrition: Dict[str, str],
+                            brand: str = "", brand_url: Optional[str] = None,
+                            product_name: str = "", brand_text: str = "") -> str:
+    """LLM‑written sections followed by the rendered table and brand block."""
+    parts = [s for s in sections if s]
+    if normalise_keys(nutrition):
+        parts.append(render_nutrition_table(nutrition))
+    brand_block = render_brand_block(brand, brand_url, product_name, brand_text)
+    if brand_block:
+        parts.append(brand_block)
+    return "\n".join(parts)
+
+
+# === PARSING ===
+def _strip_tags(text: str) -> str:
+    text = re.sub(r"(?i)(</t[dh]>)\s+(?=<t[dh][\s>])", r"\1", text)  # keep a table row on one line
+    text = re.sub(r"(?i)<br\s*/?>|</p>|</tr>|</li>|</div>|</h\d>", "\n", text)
+    text = re.sub(r"(?i)</t[dh]>", " | ", text)
+    text = re.sub(r"<[^>]+>", "", text)
+    return html.unescape(text)
+
+
+def _per_100g(value: str) -> str:
+    """Pick the per‑100 g figure out of "12 g (portion), 40 g (100g)" style values."""
+    if "100" in value and "(" in value:
+        for part in value.split(","):
+            if re.search(r"\(\s*100\s*g\s*\)", part):
+                return re.sub(r"\(\s*100\s*g\s*\)", "", part).strip()
+    return re.sub(r"\((portion|porcja)\)", "", value).strip()
+
+
+def _match_label(label: str) -> Optional[str]:
+    if SKIP_PATTERN.search(label):
+        return None
+    for key, pattern in LABEL_PATTERNS:
+        if pattern.search(label):
+            return key
+    return None
+
+
+def parse_nutrition_text(text: str, extras: bool = False) -> Dict[str, str]:
+    """Extract per‑100 g values from free text or HTML.
+
+    Unknown labelled lines are ignored, or kept under their label with `extras`
+    (meant for existing tables, where every row is a nutrient).
+    """
+    values: Dict[str, str] = {}
+    if not text:
+        return values
+    lines = re.split(r"[\n;]+", _strip_tags(str(text)))
+    for line in lines:
+        line = line.strip(" |\t")
+        match = re.match(r"(.+?)\s*(?:\||:|\s[-–]\s|\s(?=\d))\s*(.*\d.*)$", line)
+        if not match:
+            continue
+        label, value = match.group(1), match.group(2).strip(" |")
+        key = _match_label(label)
+        if key is None and extras and not HEADER_PATTERN.search(label.strip()):
+            key = re.sub(r"\s+", " ", label).strip()
+        if key and key not in values:
+            values[key] = _per_100g(value)
+    return values
+
+
+def replace_nutrition_table(html_text: str, table_html: str) -> str:
+    """Swap the existing nutrition table block (heading + table + wrappers) for `table_html`.
+
+    Appends the table when the description does not have one yet.
+    """
+    heading = re.search(r"<h2[^>]*>\s*" + re.escape(TABLE_HEADING) + r"\s*</h2>", html_text, re.IGNORECASE)
+    if not heading:
+        return html_text.rstrip() + "\n" + table_html if table_html else html_text
+    table_end = re.compile(r"</table>", re.IGNORECASE).search(html_text, heading.end())
+    if not table_end:
+        return html_text
+
+    # Walk back over wrapper <div>s opened right before the heading…
+    start, opened, lowered = heading.start(), 0, html_text.lower()
+    while True:
+        prev = lowered.rfind("<div", 0, start)
+        if prev < 0 or not _WRAPPER_OPEN.fullmatch(html_text, prev, start):
+            break
+        start, opened = prev, opened + 1
+    # …plus any opened between the heading and the table, then close the same number.
+    opened += len(re.findall(r"<div[^>]*>", html_text[heading.end():table_end.start()], re.IGNORECASE))
+    end = table_end.end()
+    for _ in range(opened):
+        close = re.match(r"\s*</div>", html_text[end:], re.IGNORECASE)
+        if not close:
+            break
+        end += close.end()
+    return html_text[:start] + table_html + html_text[end:]
+
+
+def _row_count(table_html: str) -> int:
+    return len(re.findall(r"<tr[\s>]", table_html, re.IGNORECASE))
+
+
+def rerender_description(html_text: str) -> str:
+    """Re‑render the nutrition table inside a long description with the current styles.
+
+    The description is returned unchanged when the new table would have fewer
+    rows than the old one – a row the parser could not place is never dropped.
+    """
+    heading = re.search(re.escape(TABLE_HEADING) + r"(.*?)</table>", html_text, re.IGNORECASE | re.DOTALL)
+    if not heading:
+        return html_text
+    values = parse_nutrition_text(heading.group(1), extras=True)
+    if not values:
+        return html_text
+    table = render_nutrition_table(values)
+    if _row_count(table) < _row_count(heading.group(1)):
+        return html_text
+    return replace_nutrition_table(html_text, table)
+
+
+if __name__ == "__main__":
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Re-render nutrition tables with the current styles.")
+    parser.add_argument("csv_in", help="Export CSV")
+    parser.add_argument("csv_out", help="Output CSV")
+    parser.add_argument("--column", default="Enhanced Long Description", help="HTML column to update")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv_in, encoding="utf-8-sig", keep_default_na=False, dtype=str)
+    started = time.perf_counter()
+    before = df[args.column].copy()
+    df[args.column] = [rerender_description(h) for h in df[args.column]]
+    elapsed = time.perf_counter() - started
+    has_table = before.str.contains(TABLE_HEADING, regex=False)
+    kept = int((has_table & (df[args.column] == before)).sum())
+    df.to_csv(args.csv_out, index=False, encoding="utf-8-sig")
+    print(f"✅ Re-rendered {int(has_table.sum()) - kept} tables in {elapsed:.2f}s → {args.csv_out}")
+    if kept:
+        print(f"⚠️ {kept} tables left as they were (unchanged, or re-rendering would have lost rows)")
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+order_analytics.py  ──────────────────────────────────────────────────────────────
+Order‑history analysis for procurement planning (tasks.txt: "product
+procurement planning – product order history analysis").
+
+1. Orders come from a WooCommerce order export CSV (one row per line item, the
+   usual export plugin column names are recognised) or straight from the REST
+   API (`--rest`, also works against `woo_mock_server.py`).
+2. Line items become a columnar sales fact table (order, day, product, SKU,
+   quantity, revenue), cached as Feather next to the CSV.
+3. Per product, on a products × days NumPy matrix:
+   - velocity over the last 28 / 90 days, corrected for stock‑out days
+   - stock‑out days: zero‑sale runs too long to be chance at that velocity
+   - seasonality: month‑of‑year index of daily demand
+   - reorder point = demand over lead time + safety stock, days of cover and
+     a suggested order quantity
+4. Joined with `In stock?` / `Stock` / prices from the export and the cheapest
+   competitor offer from `price_watch.py`.
+
+Run:
+    python order_analytics.py orders_export.csv --out procurement.csv
+    python order_analytics.py --rest --since 2023-01-01 --lead-time 10
+"""
+
+import argparse
+import os
+import sys
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from export_reader import EXPORT_CSV, read_export, read_header
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# ------------------------------ CONFIG --------------------------------------- #
+SALE_STATUSES = {"completed", "processing", "on-hold"}
+VELOCITY_WINDOWS = (28, 90)
+LEAD_TIME_DAYS = 7
+REVIEW_PERIOD_DAYS = 7          # weekly planning run
+SERVICE_Z = 1.65                # ~95 % service level
+STOCKOUT_CONFIDENCE = 0.05      # a zero run this unlikely at the product's velocity counts as out of stock
+MIN_STOCKOUT_RUN = 3
+FACTS_SUFFIX = ".facts.feather"
+
+# canonical column → names used by the common order export plugins
+ORDER_COLUMNS: Dict[str, List[str]] = {
+    "order_id": ["Order ID", "Order Number", "order_id", "Order #"],
+    "date": ["Order Date", "Date", "order_date", "Date Created"],
+    "status": ["Order Status", "Status", "status"],
+    "product_id": ["Variation ID", "Product ID", "product_id", "Item Product ID"],
+    "parent_id": ["Product ID", "Parent ID"],
+    "sku": ["SKU", "Item SKU", "sku"],
+    "name": ["Item Name", "Product Name", "Product", "name"],
+    "qty": ["Quantity", "Item Quantity", "Qty", "quantity"],
+    "revenue": ["Item Total", "Line Total", "Item Cost", "Order Line Total", "total"],
+}
+# ----------------------------------------------------------------------------- #
+
+FACT_COLUMNS = ["order_id", "date", "product_id", "sku", "name", "qty", "revenue"]
+
+
+# === INGESTION ===
+def _pick(columns: List[str], candidates: List[str], taken=()) -> Optional[str]:
+    lowered = {c.strip().lower(): c for c in columns}
+    for name in candidates:
+        col = lowered.get(name.lower())
+        if col and col not in taken:
+            return col
+    return None
+
+
+def facts_from_frame(raw: pd.DataFrame) -> pd.DataFrame:
+    """Normalise one frame of order line items to the fact table schema (sold statuses only)."""
+    mapping = {}
+    for canonical, candidates in ORDER_COLUMNS.items():
+        col = _pick(list(raw.columns), candidates, taken=mapping.values())
+        if col:
+            mapping[canonical] = col
+    missing = {"order_id", "date", "qty"} - mapping.keys()
+    if missing or not ({"product_id", "sku"} & mapping.keys()):
+        raise ValueError(f"Order export is missing columns for: {', '.join(sorted(missing) or ['product_id/sku'])}")
+
+    df = pd.DataFrame({k: raw[v] for k, v in mapping.items()})
+    if "status" in df:
+        status = df["status"].astype("string").str.lower().str.replace("wc-", "", regex=False).str.strip()
+        df = df[status.isin(SALE_STATUSES)]
+    product_id = pd.to_numeric(df.get("product_id"), errors="coerce") if "product_id" in df else None
+    if product_id is not None and "parent_id" in df:
+        # variation ID 0 → the simple product's own ID
+        product_id = product_id.where(product_id > 0, pd.to_numeric(df["parent_id"], errors="coerce"))
+    revenue = df["revenue"] if "revenue" in df else pd.Series(0.0, index=df.index)
+    facts = pd.DataFrame({
+        "order_id": pd.to_numeric(df["order_id"], errors="coerce").astype("Int64"),
+        "date": pd.to_datetime(df["date"], errors="coerce").dt.normalize(),
+        "product_id": (product_id if product_id is not None else pd.Series(pd.NA, index=df.index)).astype("Int64"),
+        "sku": df["sku"].astype("string").str.strip() if "sku" in df else pd.Series(pd.NA, index=df.index,
+                                                                                     dtype="string"),
+        "name": df["name"].astype("string") if "name" in df else pd.Series(pd.NA, index=df.index, dtype="string"),
+        "qty": pd.to_numeric(df["qty"], errors="coerce").fillna(0).astype("int32"),
+        "revenue": pd.to_numeric(revenue.astype("string").str.replace(",", ".", regex=False)
+                                 .str.replace(r"[^\d.\-]", "", regex=True), errors="coerce").fillna(0.0),
+    })
+    return facts[facts["date"].notna() & (facts["qty"] > 0)]
+
+
+def load_order_csv(path: str, chunksize: int = 200_000, use_cache: bool = True) -> pd.DataFrame:
+    """Fact table from an order export CSV, cached as Feather until the CSV changes."""
+    cache = path + FACTS_SUFFIX
+    if use_cache and os.path.exists(cache) and os.path.getmtime(cache) >= os.path.getmtime(path):
+        return pd.read_feather(cache)
+    parts = [facts_from_frame(chunk) for chunk in
+             pd.read_csv(path, encoding="utf-8-sig", dtype=str, chunksize=chunksize, keep_default_na=False)]
+    facts = finalise(pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=FACT_COLUMNS))
+    if use_cache:
+        try:
+            facts.to_feather(cache)
+        except ImportError:  # pyarrow not installed – no cache
+            pass
+    return facts
+
+
+def load_orders_rest(client, since: Optional[str] = None) -> pd.DataFrame:
+    """Fact table from `GET orders` (a `woo_publisher.WooClient`), one row per line item."""
+    params = {"status": ",".join(sorted(SALE_STATUSES))}
+    if since:
+        params["after"] = f"{since}T00:00:00"
+    rows = []
+    for order in client.get_all("orders", params):
+        for item in order.get("line_items", []):
+            rows.append({
+                "Order ID": order["id"], "Order Date": order.get("date_created"), "Order Status": order.get("status"),
+                "Variation ID": item.get("variation_id") or 0, "Product ID": item.get("product_id"),
+                "SKU": item.get("sku"), "Item Name": item.get("name"),
+                "Quantity": item.get("quantity"), "Item Total": item.get("total"),
+            })
+    raw = pd.DataFrame(rows, columns=["Order ID", "Order Date", "Order Status", "Variation ID", "Product ID",
+                                      "SKU", "Item Name", "Quantity", "Item Total"])
+    return finalise(facts_from_frame(raw))
+
+
+def finalise(facts: pd.DataFrame) -> pd.DataFrame:
+    facts = facts.reset_index(drop=True)
+    facts["sku"] = facts["sku"].astype("string").replace("", pd.NA).astype("category")
+    facts["name"] = facts["name"].astype("string")
+    return facts.sort_values("date", kind="stable").reset_index(drop=True)
+
+
+# === METRICS ===
+def daily_matrix(facts: pd.DataFrame, end: Optional[pd.Timestamp] = None):
+    """(product keys, days, units[products × days]) – every calendar day, zeros included."""
+    key = facts["product_id"].astype("string").fillna("sku:" + facts["sku"].astype("string"))
+    end = pd.Timestamp(end or facts["date"].max()).normalize()
+    days = pd.date_range(facts["date"].min(), end, freq="D")
+    keys, key_idx = np.unique(key.to_numpy(dtype=str), return_inverse=True)
+    day_idx = ((facts["date"] - days[0]).dt.days).to_numpy()
+    inside = day_idx <= len(days) - 1
+    units = np.zeros((len(keys), len(days)), dtype=np.float64)
+    np.add.at(units, (key_idx[inside], day_idx[inside]), facts["qty"].to_numpy()[inside])
+    return keys, days, units
+
+
+def _zero_runs(units: np.ndarray):
+    """(row, start, length) of every run of zero days, vectorised over the whole matrix."""
+    zero = units == 0
+    padded = np.zeros((zero.shape[0], zero.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = zero
+    edges = np.diff(padded, axis=1)
+    starts_r, starts_c = np.nonzero(edges == 1)
+    ends_r, ends_c = np.nonzero(edges == -1)
+    return starts_r, starts_c, ends_c - starts_c  # both nonzero() results are row‑major, so they pair up
+
+
+def stockout_mask(units: np.ndarray, velocity: np.ndarray) -> np.ndarray:
+    """Days that look like stock‑outs: zero runs longer than `velocity` makes plausible (Poisson)."""
+    with np.errstate(divide="ignore"):
+        # P(no sale in k days) = exp(-v·k) < confidence  ⇔  k > -ln(confidence) / v
+        threshold = np.where(velocity > 0, -np.log(STOCKOUT_CONFIDENCE) / velocity, np.inf)
+    threshold = np.maximum(threshold, MIN_STOCKOUT_RUN)
+    rows, starts, lengths = _zero_runs(units)
+    long_run = lengths > threshold[rows]
+    # mark the long runs with +1/−1 edges on a flat array; the running sum is the mask
+    width = units.shape[1] + 1
+    edges = np.zeros(units.shape[0] * width + 1, dtype=np.int32)
+    flat_start = rows[long_run] * width + starts[long_run]
+    np.add.at(edges, flat_start, 1)
+    np.add.at(edges, flat_start + lengths[long_run], -1)
+    mask = (np.cumsum(edges[:-1]).reshape(units.shape[0], width)[:, :-1] > 0)
+    # zeros before a product's first sale mean "not listed yet", not out of stock
+    first_sale = np.argmax(units > 0, axis=1)
+    cols = np.arange(units.shape[1])
+    mask &= cols[None, :] >= first_sale[:, None]
+    return mask
+
+
+def seasonality(units: np.ndarray, days: pd.DatetimeIndex) -> np.ndarray:
+    """products × 12 month‑of‑year index (1.0 = average day); 1.0 where history is too short."""
+    months = days.month.to_numpy() - 1
+    per_month = np.zeros((units.shape[0], 12))
+    counts = np.bincount(months, minlength=12).astype(float)
+    for m in range(12):
+        if counts[m]:
+            per_month[:, m] = units[:, months == m].sum(axis=1) / counts[m]
+    overall = units.mean(axis=1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        index = np.where(overall > 0, per_month / overall, 1.0)
+    if len(days) < 365:  # one partial year says nothing about seasons
+        index[:] = 1.0
+    return np.where(counts[None, :] > 0, index, 1.0)
+
+
+def analyse(facts: pd.DataFrame, end: Optional[str] = None, lead_time: int = LEAD_TIME_DAYS,
+            review_period: int = REVIEW_PERIOD_DAYS, z: float = SERVICE_Z) -> pd.DataFrame:
+    """One row per product with velocity, stock‑outs, seasonality and reorder point."""
+    keys, days, units = daily_matrix(facts, pd.Timestamp(end) if end else None)
+    short, long_ = VELOCITY_WINDOWS
+    recent = units[:, -long_:]
+    raw_velocity = recent.mean(axis=1)
+    out_days = stockout_mask(units, units[:, -365:].mean(axis=1))
+    recent_out = out_days[:, -long_:]
+    in_stock_days = np.maximum(recent.shape[1] - recent_out.sum(axis=1), 1)
+    velocity = recent.sum(axis=1) / in_stock_days                              # demand while available
+    velocity_short = units[:, -short:].sum(axis=1) / np.maximum(short - out_days[:, -short:].sum(axis=1), 1)
+    sigma = np.sqrt(np.ma.masked_array(recent, recent_out).var(axis=1).filled(0.0))
+
+    season = seasonality(units, days)
+    next_month = (days[-1] + pd.Timedelta(days=15)).month - 1
+    season_next = season[:, next_month]
+    demand_rate = velocity * season_next
+    safety = z * sigma * np.sqrt(lead_time)
+    reorder_point = demand_rate * lead_time + safety
+
+    meta = (facts.assign(key=facts["product_id"].astype("string").fillna("sku:" + facts["sku"].astype("string")))
+            .groupby("key", observed=True)
+            .agg(sku=("sku", "last"), name=("name", "last"), last_sale=("date", "max"),
+                 units_total=("qty", "sum"), revenue_total=("revenue", "sum")))
+    result = pd.DataFrame({
+        "key": keys,
+        f"velocity_{short}d": velocity_short.round(3),
+        f"velocity_{long_}d": velocity.round(3),
+        f"raw_velocity_{long_}d": raw_velocity.round(3),
+        "trend": np.divide(velocity_short, velocity, out=np.full_like(velocity, np.nan), where=velocity > 0).round(2),
+        "demand_sigma": sigma.round(3),
+        f"stockout_days_{long_}d": recent_out.sum(axis=1),
+        "season_index_next_month": season_next.round(2),
+        "peak_month": season.argmax(axis=1) + 1,
+        "reorder_point": np.ceil(reorder_point).astype(int),
+        "lead_time_demand": (demand_rate * lead_time).round(1),
+        "safety_stock": np.ceil(safety).astype(int),
+    }).merge(meta, left_on="key", right_index=True, how="left")
+    result["product_id"] = pd.to_numeric(result["key"].where(~result["key"].str.startswith("sku:")),
+                                         errors="coerce").astype("Int64")
+    result.attrs["review_period"] = review_period
+    result.attrs["demand_rate"] = dict(zip(keys, demand_rate))
+    return result
+
+
+# === JOINS ===
+def join_export(result: pd.DataFrame, csv_path: str = EXPORT_CSV) -> pd.DataFrame:
+    """Add stock and our prices from the export; order quantity needs `Stock`.
+
+    Products missing from the export (`in_export` False) keep NaN stock and are
+    never flagged `reorder_now`.
+    """
+    header = read_header(csv_path)
+    wanted = ["ID", "SKU", "Name", "In stock?", "Stock", "Regular price", "Sale price", "GTIN, UPC, EAN, or ISBN"]
+    export = read_export(csv_path, columns=[c for c in wanted if c in header])
+    export = export.rename(columns={"ID": "product_id", "Name": "export_name", "GTIN, UPC, EAN, or ISBN": "gtin"})
+    export["product_id"] = export["product_id"].astype("Int64")
+    merged = result.merge(export.drop(columns=["SKU"], errors="ignore"), on="product_id", how="left",
+                          indicator=True)
+    in_export = (merged.pop("_merge") == "both").to_numpy()
+
+    # products that are not (or no longer) in the export keep NaN stock and get no recommendation
+    stock = (pd.to_numeric(merged["Stock"], errors="coerce").astype(float) if "Stock" in merged
+             else pd.Series(np.nan, index=merged.index))
+    in_stock = merged["In stock?"] if "In stock?" in merged else pd.Series(pd.NA, index=merged.index)
+    out_now = (in_stock.astype("string") == "0").fillna(False).astype(bool) & in_export
+    stock = stock.where(~out_now, 0.0)
+    rate = merged["key"].map(result.attrs["demand_rate"]).astype(float)
+    review = result.attrs["review_period"]
+    merged["in_export"] = in_export
+    merged["days_of_cover"] = (stock / rate.where(rate > 0)).round(1)
+    merged["order_qty"] = np.ceil((merged["reorder_point"] + rate * review - stock).clip(lower=0))
+    merged["reorder_now"] = ((stock <= merged["reorder_point"]).fillna(False).astype(bool) | out_now) & in_export
+    merged["out_of_stock_now"] = out_now
+    merged["name"] = merged["name"].fillna(merged.get("export_name"))
+    return merged.drop(columns=["export_name"], errors="ignore")
+
+
+def join_competitor_prices(result: pd.DataFrame, max_age_days: float = 7) -> pd.DataFrame:
+    """Cheapest competitor offer per product from `price_watch.py` (by GTIN, else export ID)."""
+    from price_watch import PRICE_DB, PriceStore, normalise_gtin, parse_price
+
+    if not os.path.exists(PRICE_DB):
+        return result
+    with PriceStore(PRICE_DB) as prices:
+        offers = pd.DataFrame(prices.cheapest(max_age_days))
+    if offers.empty:
+        return result
+    offers = offers.set_index("product_key")[["price", "shop"]]
+    gtin_key = ("gtin:" + result["gtin"].astype("string").map(normalise_gtin, na_action="ignore")) \
+        if "gtin" in result else pd.Series(pd.NA, index=result.index)
+    id_key = "id:" + result["product_id"].astype("string")
+    key = gtin_key.where(gtin_key.isin(offers.index), id_key)
+    result["competitor_price"] = key.map(offers["price"])
+    result["competitor_shop"] = key.map(offers["shop"])
+    # export prices may use a decimal comma ("10,89"), which pd.to_numeric turns into NaN
+    price = lambda col: result[col].map(parse_price, na_action="ignore").astype("float64") \
+        if col in result else pd.Series(np.nan, index=result.index)
+    ours = price("Sale price").fillna(price("Regular price"))
+    result["price_gap_pct"] = (100 * (ours - result["competitor_price"]) / result["competitor_price"]).round(1)
+    return result
+
+
+def plan(facts: pd.DataFrame, export_csv: Optional[str] = EXPORT_CSV, with_prices: bool = True,
+         **kwargs) -> pd.DataFrame:
+    result = analyse(facts, **kwargs)
+    if export_csv and os.path.exists(export_csv):
+        result = join_export(result, export_csv)
+    if with_prices:
+        result = join_competitor_prices(result)
+    sort = ["reorder_now", f"velocity_{VELOCITY_WINDOWS[1]}d"] if "reorder_now" in result else \
+        [f"velocity_{VELOCITY_WINDOWS[1]}d"]
+    return result.sort_values(sort, ascending=False).reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Order history analysis for procurement planning.")
+    parser.add_argument("orders", nargs="?", help="WooCommerce order export CSV (one row per line item)")
+    parser.add_argument("--rest", action="store_true", help="Read orders from the REST API (WC_URL, …)")
+    parser.add_argument("--since", help="REST: only orders after this date (YYYY-MM-DD)")
+    parser.add_argument("--export", default=EXPORT_CSV, help="Product export with In stock? / Stock")
+    parser.add_argument("--end", default=None, help="Analyse as of this date (default: last order day)")
+    parser.add_argument("--lead-time", type=int, default=LEAD_TIME_DAYS)
+    parser.add_argument("--review", type=int, default=REVIEW_PERIOD_DAYS, help="Days until the next planning run")
+    parser.add_argument("--no-prices", action="store_true", help="Skip the competitor price join")
+    parser.add_argument("--out", help="Write the full plan to this CSV")
+    args = parser.parse_args()
+
+    if args.rest:
+        from dotenv import load_dotenv
+        from woo_publisher import WooClient
+
+        load_dotenv()
+        sales = load_orders_rest(WooClient(), args.since)
+    elif args.orders:
+        sales = load_order_csv(args.orders)
+    else:
+        parser.error("give an order export CSV or --rest")
+    if sales.empty:
+        raise SystemExit("❌ No sold line items found")
+
+    print(f"🧾 {sales['order_id'].nunique()} orders, {len(sales)} line items, "
+          f"{sales['date'].min():%Y-%m-%d} → {sales['date'].max():%Y-%m-%d}")
+    table = plan(sales, args.export, with_prices=not args.no_prices, end=args.end,
+                 lead_time=args.lead_time, review_period=args.review)
+    if "reorder_now" in table:
+        due = table[table["reorder_now"]]
+        print(f"📦 {len(due)} of {len(table)} products at or below their reorder point:")
+        for _, row in due.head(30).iterrows():
+            print(f"   {str(row['name'])[:50]:50s} stock {row.get('Stock', '')!s:>5}  "
+                  f"ROP {row['reorder_point']:>4}  order {int(row['order_qty']) if pd.notna(row['order_qty']) else '?':>4}")
+    else:
+        print(table.head(30).to_string())
+    if args.out:
+        table.to_csv(args.out, index=False, encoding="utf-8-sig")
+        print(f"✅ Saved {args.out}")
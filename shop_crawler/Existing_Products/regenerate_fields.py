@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+regenerate_fields.py  ────────────────────────────────────────────────────────────
+Field‑level regeneration for already enhanced products.
+
+Instead of re‑running all seven prompts for a product, only the invalid fields
+are rebuilt – with the same prompts and context as the enhancers
+(`enhancer_prompts.py`) – and written back into the export in place:
+- `Meta: rank_math_focus_keyword`, `Meta: seo_description`,
+  `Enhanced Short Description`: one call each.
+- `Meta: seo_title`: no call, rebuilt from the keyword and name.
+- `Enhanced Long Description#<n>`: one call; the new section replaces the old
+  one under the same <h2>, the nutrition table and brand block stay untouched.
+  `Enhanced Long Description` alone means all three sections.
+
+Invalid fields come from any mix of:
+    --scores      products under --min-score in `seo_score.py`
+    --failures    fields the enhancers logged to `field_failures.jsonl`
+    --validate    local rules (empty fields, lengths, missing/short sections)
+    --fields-csv  an audit CSV with `ID` and `fields` (";"‑separated) columns
+
+Run:
+    python regenerate_fields.py --validate --failures --dry-run
+    python regenerate_fields.py --scores --min-score 60 --backend grok
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Set
+
+from dotenv import load_dotenv
+
+from enhancer_prompts import (
+    FAILURES_LOG, KEYWORD_FIELD, LONG_FIELD, META_FIELD, MIN_SECTION_WORDS, SECTION_HEADINGS, SHORT_FIELD,
+    SYSTEM_PROMPT, TITLE_FIELD, TITLE_MAX, META_MAX, brand_prompt, fit_meta, keyword_prompt, log_field_failure,
+    meta_prompt, product_context, section_field, section_prompts, seo_title, short_prompt, wrap_standalone_lines,
+)
+from export_reader import EXPORT_CSV, read_export, read_header, update_export
+from llm_backends import BACKENDS
+from nutrition_renderer import TABLE_HEADING, parse_nutrition_text, render_long_description
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from instrumentation import inc, observe, span
+from rate_limiter import RateLimiter
+
+# ------------------------------ CONFIG --------------------------------------- #
+CONTEXT_COLUMNS = ["ID", "Name", "Description", "Short description", "Attribute 1 value(s)"]
+WORKERS = 4
+CALLS_PER_MINUTE = 30
+SAVE_EVERY = 20               # products per write‑back to the export
+# ----------------------------------------------------------------------------- #
+
+SECTIONS = range(1, len(SECTION_HEADINGS) + 1)
+ALL_FIELDS = [KEYWORD_FIELD, TITLE_FIELD, META_FIELD, SHORT_FIELD] + [section_field(n) for n in SECTIONS]
+FieldMap = Dict[int, Set[str]]
+
+
+# === WHICH FIELDS ===
+def expand_fields(fields: Set[str]) -> Set[str]:
+    """`Enhanced Long Description` → its three sections; a new keyword implies a new title."""
+    out = set()
+    for field in fields:
+        if field == LONG_FIELD:
+            out.update(section_field(n) for n in SECTIONS)
+        elif field in ALL_FIELDS:
+            out.add(field)
+    if KEYWORD_FIELD in out:
+        out.add(TITLE_FIELD)
+    return out
+
+
+def merge(*maps: FieldMap) -> FieldMap:
+    merged: FieldMap = {}
+    for m in maps:
+        for pid, fields in m.items():
+            merged.setdefault(int(pid), set()).update(fields)
+    return {pid: expand_fields(f) for pid, f in merged.items() if expand_fields(f)}
+
+
+def from_scores(csv_path: str, min_score: int) -> FieldMap:
+    from seo_score import failing_fields_by_id, score_export
+
+    return {pid: set(f) for pid, f in failing_fields_by_id(score_export(csv_path), min_score).items()}
+
+
+def from_failures(path: str = FAILURES_LOG) -> FieldMap:
+    found: FieldMap = {}
+    if not os.path.exists(path):
+        return found
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+                found.setdefault(int(rec["ID"]), set()).add(rec["field"])
+            except (ValueError, KeyError, TypeError):
+                continue
+    return found
+
+
+def from_fields_csv(path: str) -> FieldMap:
+    found: FieldMap = {}
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        for row in csv.DictReader(f):
+            fields = [x.strip() for x in (row.get("fields") or row.get("failing_fields") or "").split(";")]
+            if row.get("ID", "").strip().isdigit():
+                found.setdefault(int(row["ID"]), set()).update(x for x in fields if x)
+    return found
+
+
+def _words(html_text: str) -> int:
+    return len(re.sub(r"<[^>]+>", " ", html_text or "").split())
+
+
+def validate(df) -> FieldMap:
+    """Local rules: empty fields, RankMath length limits, missing or short sections."""
+    found: FieldMap = {}
+    for row in df.to_dict("records"):
+        bad = set()
+        value = lambda col: "" if row.get(col) is None or row.get(col) != row.get(col) else str(row.get(col)).strip()
+        if not value(KEYWORD_FIELD):
+            bad.add(KEYWORD_FIELD)
+        if not value(TITLE_FIELD) or len(value(TITLE_FIELD)) > TITLE_MAX:
+            bad.add(TITLE_FIELD)
+        if not value(META_FIELD) or len(value(META_FIELD)) > META_MAX:
+            bad.add(META_FIELD)
+        if not value(SHORT_FIELD):
+            bad.add(SHORT_FIELD)
+        sections, _ = split_sections(value(LONG_FIELD))
+        for n in SECTIONS:
+            if _words(sections.get(n, "")) < MIN_SECTION_WORDS:
+                bad.add(section_field(n))
+        if bad:
+            found[int(row["ID"])] = bad
+    return found
+
+
+# === SPLICING ===
+def _heading_number(chunk: str) -> Optional[int]:
+    match = re.match(r"(?is)\s*<h2[^>]*>(.*?)</h2>", chunk)
+    if not match:
+        return None
+    text = re.sub(r"<[^>]+>", "", match.group(1)).strip().casefold()
+    for n, heading in zip(SECTIONS, SECTION_HEADINGS):
+        if text == heading.casefold():
+            return n
+    return None
+
+
+def _tail_start(html_text: str) -> int:
+    """Where the rendered nutrition table / brand block begin (end of the written part)."""
+    starts = []
+    table = html_text.find(f"<h2>{TABLE_HEADING}</h2>")
+    if table != -1:
+        wrapper = html_text.rfind("<div", 0, table)
+        starts.append(wrapper if wrapper != -1 and not html_text[wrapper:table].count("</") else table)
+    brand = html_text.find("<h2>O marce ")
+    if brand != -1:
+        starts.append(brand)
+    return min(starts) if starts else len(html_text)
+
+
+def split_sections(html_text: str):
+    """({section number: html}, ordered chunks) of the written part; unknown chunks keep number None."""
+    written = html_text[:_tail_start(html_text)]
+    chunks = [c for c in re.split(r"(?i)(?=<h2[\s>])", written) if c.strip()]
+    numbered = [(_heading_number(c), c) for c in chunks]
+    return {n: c for n, c in numbered if n is not None}, numbered
+
+
+def splice_sections(html_text: str, new_sections: Dict[int, str]) -> str:
+    """Replace (or insert, in order) written sections; the rendered tail is kept as is."""
+    tail = html_text[_tail_start(html_text):]
+    _, chunks = split_sections(html_text)
+    out: List[str] = []
+    pending = dict(new_sections)
+    for n, chunk in chunks:
+        if n is not None:
+            for m in sorted(k for k in pending if k < n):  # missing earlier sections go first
+                out.append(pending.pop(m))
+            if n in pending:
+                out.append(pending.pop(n))
+                continue
+        out.append(chunk.strip())
+    out.extend(pending[m] for m in sorted(pending))
+    written = "\n".join(c.strip() for c in out if c.strip())
+    return f"{written}\n{tail.strip()}".strip() if tail.strip() else written
+
+
+# === REGENERATION ===
+def regenerate_product(row: dict, fields: Set[str], generate: Callable[[str, str], str],
+                       brand_url_for: Callable[[str], str]) -> Dict[str, str]:
+    """New values for `fields` of one product (only fields that were produced)."""
+    ctx = product_context(row)
+    name = ctx["name"]
+    current = lambda col: "" if row.get(col) is None or row.get(col) != row.get(col) else str(row.get(col))
+    updates: Dict[str, str] = {}
+
+    focus_keyword = current(KEYWORD_FIELD).strip()
+    if KEYWORD_FIELD in fields or not focus_keyword:
+        new_keyword = generate(SYSTEM_PROMPT, keyword_prompt(name)).strip()
+        if new_keyword:
+            focus_keyword = updates[KEYWORD_FIELD] = new_keyword
+            fields = fields | {TITLE_FIELD}
+        else:
+            log_field_failure(row, KEYWORD_FIELD, "empty response (regeneration)")
+
+    if TITLE_FIELD in fields and focus_keyword:
+        updates[TITLE_FIELD] = seo_title(focus_keyword, name)
+
+    if META_FIELD in fields:
+        meta = fit_meta(generate(SYSTEM_PROMPT, meta_prompt(name, ctx["original_short"], focus_keyword)))
+        if meta:
+            updates[META_FIELD] = meta
+        else:
+            log_field_failure(row, META_FIELD, "empty response (regeneration)")
+
+    if SHORT_FIELD in fields:
+        short = generate(SYSTEM_PROMPT, short_prompt(focus_keyword, ctx["original_short"]))
+        if short:
+            updates[SHORT_FIELD] = short
+        else:
+            log_field_failure(row, SHORT_FIELD, "empty response (regeneration)")
+
+    wanted = [n for n in SECTIONS if section_field(n) in fields]
+    if wanted:
+        prompts = section_prompts(name, focus_keyword, ctx["nutrition"])
+        new_sections = {}
+        for n in wanted:
+            section = generate(SYSTEM_PROMPT, prompts[n - 1])
+            if section:
+                section = wrap_standalone_lines(section)
+                if _heading_number(section) != n:  # keep the heading the splice relies on
+                    body = re.sub(r"(?is)^\s*<h2[^>]*>.*?</h2>", "", section).strip()
+                    section = f"<h2>{SECTION_HEADINGS[n - 1]}</h2>\n{body}"
+                new_sections[n] = section
+            else:
+                log_field_failure(row, section_field(n), "empty response (regeneration)")
+        if new_sections:
+            long_html = current(LONG_FIELD)
+            if long_html.strip():
+                updates[LONG_FIELD] = splice_sections(long_html, new_sections)
+            else:  # nothing to splice into – render the full description
+                nutrition = parse_nutrition_text(ctx["nutrition"]) if ctx["nutrition"] else {}
+                written = "\n".join(new_sections[n] for n in sorted(new_sections))
+                brand_url = brand_url_for(ctx["brand"])
+                brand_text = wrap_standalone_lines(generate(SYSTEM_PROMPT, brand_prompt(ctx["brand"]))) \
+                    if brand_url else ""
+                updates[LONG_FIELD] = render_long_description(
+                    [written], nutrition, ctx["brand"], brand_url, name, brand_text
+                )
+    return updates
+
+
+def prune_failures(fixed: Dict[int, Set[str]], path: str = FAILURES_LOG):
+    """Drop log entries for fields that were regenerated successfully."""
+    if not os.path.exists(path):
+        return
+    keep = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+                done = fixed.get(int(rec["ID"]), set())
+                if rec["field"] in done or (rec["field"].startswith(LONG_FIELD) and LONG_FIELD in done):
+                    continue
+            except (ValueError, KeyError, TypeError):
+                pass
+            keep.append(line)
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(keep)
+
+
+def run(csv_path: str, todo: FieldMap, backend: str = "gpt", workers: int = WORKERS,
+        per_minute: int = CALLS_PER_MINUTE) -> Dict[int, Dict[str, str]]:
+    from brand_registry import BrandRegistry
+
+    limiter = RateLimiter(per_minute, period=60)
+    call = BACKENDS[backend]
+
+    def generate(system_prompt, user_prompt):
+        started = time.perf_counter()
+        limiter.acquire()
+        observe("rate_limit_wait_seconds", time.perf_counter() - started, limiter="llm")
+        return call(system_prompt, user_prompt, delay=0)
+
+    brands = BrandRegistry()
+    columns = [c for c in CONTEXT_COLUMNS + [KEYWORD_FIELD, LONG_FIELD] if c in read_header(csv_path)]
+    rows = {int(r["ID"]): r for r in read_export(csv_path, columns=columns, ids=todo).to_dict("records")}
+
+    pending: Dict[int, Dict[str, str]] = {}
+    done: Dict[int, Dict[str, str]] = {}
+    fixed: Dict[int, Set[str]] = {}
+    lock = threading.Lock()
+
+    def flush():
+        if pending:
+            update_export(csv_path, pending)
+            print(f"💾 Saved {len(pending)} products to {csv_path}")
+            pending.clear()
+
+    def regenerate(pid, fields):
+        with span("regenerate_product", id=pid, backend=backend, fields=sorted(fields)) as s:
+            updates = regenerate_product(rows[pid], fields, generate, lambda b: brands.url_for(b, fuzzy=False))
+            s.set(regenerated=sorted(updates))
+            return updates
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(regenerate, pid, fields): pid for pid, fields in todo.items() if pid in rows}
+        for future in as_completed(futures):
+            pid = futures[future]
+            try:
+                updates = future.result()
+            except Exception as e:
+                print(f"❌ {pid}: {e}")
+                inc("products_regenerated_total", outcome="error")
+                continue
+            inc("products_regenerated_total", outcome="updated" if updates else "unchanged")
+            with lock:
+                if updates:
+                    pending[pid] = done[pid] = updates
+                    fixed[pid] = set(updates) | {f for f in todo[pid] if LONG_FIELD in updates and f.startswith(LONG_FIELD)}
+                print(f"✅ {pid} {rows[pid].get('Name', '')}: {', '.join(sorted(updates)) or 'nothing regenerated'}")
+                if len(pending) >= SAVE_EVERY:
+                    flush()
+    flush()
+    prune_failures(fixed)
+    return done
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Regenerate only the invalid fields of enhanced products.")
+    parser.add_argument("--csv", default=EXPORT_CSV)
+    parser.add_argument("--scores", action="store_true", help="Fields failing the offline SEO score")
+    parser.add_argument("--min-score", type=int, default=60)
+    parser.add_argument("--failures", action="store_true", help=f"Fields logged in {FAILURES_LOG}")
+    parser.add_argument("--validate", action="store_true", help="Fields failing local validation rules")
+    parser.add_argument("--fields-csv", help="CSV with ID and ';'-separated fields columns")
+    parser.add_argument("--ids", type=int, nargs="*", help="Restrict to these product IDs")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="gpt")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--per-minute", type=int, default=CALLS_PER_MINUTE)
+    parser.add_argument("--dry-run", action="store_true", help="Only list what would be regenerated")
+    args = parser.parse_args()
+
+    load_dotenv()
+    sources = []
+    if args.scores:
+        sources.append(from_scores(args.csv, args.min_score))
+    if args.failures:
+        sources.append(from_failures())
+    if args.validate:
+        header = read_header(args.csv)
+        columns = [c for c in ["ID", KEYWORD_FIELD, TITLE_FIELD, META_FIELD, SHORT_FIELD, LONG_FIELD] if c in header]
+        sources.append(validate(read_export(args.csv, columns=columns)))
+    if args.fields_csv:
+        sources.append(from_fields_csv(args.fields_csv))
+    if not sources:
+        parser.error("choose at least one of --scores, --failures, --validate, --fields-csv")
+
+    todo = merge(*sources)
+    if args.ids:
+        todo = {pid: f for pid, f in todo.items() if pid in set(args.ids)}
+    calls = sum(len(f - {TITLE_FIELD}) for f in todo.values())
+    print(f"🛠️ {len(todo)} products, ~{calls} calls")
+    if args.dry_run:
+        for pid, fields in sorted(todo.items()):
+            print(f"  {pid}: {', '.join(sorted(fields))}")
+    elif todo:
+        run(args.csv, todo, backend=args.backend, workers=args.workers, per_minute=args.per_minute)
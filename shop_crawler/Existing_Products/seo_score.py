@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+seo_score.py  ────────────────────────────────────────────────────────────────────
+Offline estimate of RankMath's SEO score for every product in the export.
+
+Approximates the RankMath checks on `Enhanced Long Description`, `Meta: seo_title`,
+`Meta: seo_description` and `Meta: rank_math_focus_keyword`:
+    keyword set · keyword in title / at its start · keyword in meta description
+    keyword in first paragraph · keyword in subheadings · keyword density
+    content length · title / meta length · short paragraphs · internal and
+    external links
+Each check has a RankMath‑like weight; the score is the weighted share of passed
+checks (0–100). Text features are computed column‑wise with pandas string
+methods, so the whole export scores in well under a second.
+
+Every failed check maps to the field that has to be regenerated; the
+`failing_fields` column feeds `regenerate_fields.py`. Checks regeneration cannot
+fix (links – no prompt writes them – and subheadings, which are always the fixed
+SECTION_HEADINGS) map to no field: they count in the score but queue nothing.
+
+Run:
+    python seo_score.py                                  # summary of the export
+    python seo_score.py --min-score 60 --out seo_scores.csv
+"""
+
+import argparse
+import re
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from export_reader import EXPORT_CSV, read_export, read_header
+
+# ------------------------------ CONFIG --------------------------------------- #
+CONTENT_COL = "Enhanced Long Description"
+TITLE_COL = "Meta: seo_title"
+META_COL = "Meta: seo_description"
+KEYWORD_COL = "Meta: rank_math_focus_keyword"
+SHORT_COL = "Enhanced Short Description"
+SITE_HOST = "noguiltmeal.pl"
+MIN_SCORE = 60                     # target from tasks.txt
+
+MIN_WORDS = 600
+TITLE_MAX = 60
+META_RANGE = (120, 160)
+DENSITY_RANGE = (0.5, 2.5)         # % of words
+FIRST_PART = 0.10                  # "keyword at the beginning of the content"
+MAX_PARAGRAPH_WORDS = 120
+
+# check → (weight, field to regenerate when it fails; None = not fixable by regeneration)
+CHECKS: Dict[str, Tuple[int, Optional[str]]] = {
+    "keyword_set":             (10, KEYWORD_COL),
+    "keyword_in_title":        (10, TITLE_COL),
+    "keyword_title_start":     (4,  TITLE_COL),
+    "title_length":            (4,  TITLE_COL),
+    "keyword_in_meta":         (8,  META_COL),
+    "meta_length":             (4,  META_COL),
+    "keyword_in_first_part":   (8,  CONTENT_COL),
+    "keyword_in_content":      (8,  CONTENT_COL),
+    "content_length":          (12, CONTENT_COL),
+    "keyword_in_subheadings":  (6,  None),
+    "keyword_density":         (8,  CONTENT_COL),
+    "short_paragraphs":        (4,  CONTENT_COL),
+    "internal_links":          (6,  None),
+    "external_links":          (8,  None),
+}
+# ----------------------------------------------------------------------------- #
+
+SCORE_COLUMNS = ["seo_score", "failed_checks", "failing_fields"]
+_TAGS = r"<[^>]+>"
+_WORD = r"[^\W_]+"
+
+
+def _text(series: pd.Series) -> pd.Series:
+    return series.astype("string").fillna("")
+
+
+def _plain(html: pd.Series) -> pd.Series:
+    """Lowercased visible text with tags and entities collapsed to spaces."""
+    return (html.str.replace(_TAGS, " ", regex=True)
+                .str.replace(r"&nbsp;|&[a-z]+;|&#\d+;", " ", regex=True)
+                .str.replace(r"\s+", " ", regex=True)
+                .str.strip()
+                .str.lower())
+
+
+def _normalise_keyword(keywords: pd.Series) -> pd.Series:
+    """First keyword of RankMath's comma list, lowercased, as plain words."""
+    first = keywords.str.split(",").str[0].fillna("").str.lower()
+    return first.str.findall(_WORD).str.join(" ").fillna("")
+
+
+def _contains(haystack: pd.Series, needle: pd.Series) -> pd.Series:
+    """Row‑wise whole‑word phrase containment (both sides normalised to single spaces)."""
+    padded = " " + haystack.str.findall(_WORD).str.join(" ").fillna("") + " "
+    return pd.Series([bool(n) and f" {n} " in h for h, n in zip(padded, needle)], index=haystack.index)
+
+
+def _phrase_counts(words: pd.Series, needle: pd.Series) -> pd.Series:
+    return pd.Series([f" {w} ".count(f" {n} ") if n else 0 for w, n in zip(words, needle)], index=words.index)
+
+
+def score_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """One row per product: `seo_score`, `failed_checks` and `failing_fields` (lists)."""
+    content = _text(df.get(CONTENT_COL, pd.Series("", index=df.index)))
+    title = _text(df.get(TITLE_COL, pd.Series("", index=df.index))).str.strip()
+    meta = _text(df.get(META_COL, pd.Series("", index=df.index))).str.strip()
+    keyword = _normalise_keyword(_text(df.get(KEYWORD_COL, pd.Series("", index=df.index))))
+
+    plain = _plain(content)
+    words = plain.str.findall(_WORD).str.join(" ").fillna("")
+    word_count = words.str.count(" ").add(1).where(words.str.len() > 0, 0)
+    kw_words = keyword.str.count(" ").add(1).where(keyword.str.len() > 0, 0)
+
+    head_len = (word_count * FIRST_PART).clip(lower=50).astype(int)
+    first_part = pd.Series([" ".join(w.split(" ")[:n]) for w, n in zip(words, head_len)], index=df.index)
+    subheadings = content.str.findall(r"(?is)<h[2-4][^>]*>(.*?)</h[2-4]>").str.join(" ").fillna("")
+
+    kw_count = _phrase_counts(words, keyword)
+    density = (100 * kw_count * kw_words / word_count.where(word_count > 0)).fillna(0)
+
+    paragraphs = content.str.findall(r"(?is)<p[^>]*>(.*?)</p>")
+    longest_paragraph = paragraphs.apply(
+        lambda ps: max((len(re.sub(_TAGS, " ", p).split()) for p in ps), default=0)
+    )
+    hrefs = content.str.findall(r'(?i)href\s*=\s*["\']([^"\']+)["\']')
+    external = hrefs.apply(lambda hs: sum(1 for h in hs if h.startswith("http") and SITE_HOST not in h))
+    internal = hrefs.apply(lambda hs: sum(1 for h in hs if not h.startswith(("http", "#", "mailto:")) or SITE_HOST in h))
+
+    lowered_title = title.str.lower()
+    checks = pd.DataFrame({
+        "keyword_set": keyword.str.len() > 0,
+        "keyword_in_title": _contains(lowered_title, keyword),
+        "keyword_title_start": pd.Series(
+            [bool(k) and " ".join(re.findall(_WORD, t)).startswith(k) for t, k in zip(lowered_title, keyword)],
+            index=df.index),
+        "title_length": title.str.len().between(1, TITLE_MAX),
+        "keyword_in_meta": _contains(meta.str.lower(), keyword),
+        "meta_length": meta.str.len().between(*META_RANGE),
+        "keyword_in_first_part": _contains(first_part, keyword),
+        "keyword_in_content": kw_count > 0,
+        "content_length": word_count >= MIN_WORDS,
+        "keyword_in_subheadings": _contains(subheadings.str.lower(), keyword),
+        "keyword_density": density.between(*DENSITY_RANGE),
+        "short_paragraphs": (longest_paragraph <= MAX_PARAGRAPH_WORDS) & (paragraphs.str.len() > 0),
+        "internal_links": internal > 0,
+        "external_links": external > 0,
+    }, index=df.index).fillna(False).astype(bool)
+
+    weights = pd.Series({name: w for name, (w, _) in CHECKS.items()})
+    score = (checks[weights.index].astype(int) @ weights) * 100 / weights.sum()
+
+    failed = checks.columns.to_numpy()
+    failed_checks = [list(failed[~row]) for row in checks.to_numpy()]
+    failing_fields = [sorted({CHECKS[c][1] for c in fc} - {None}) for fc in failed_checks]
+
+    out = pd.DataFrame(index=df.index)
+    out["seo_score"] = score.round().astype(int)
+    out["failed_checks"] = failed_checks
+    out["failing_fields"] = failing_fields
+    out["words"] = word_count
+    out["keyword_density"] = density.round(2)
+    return out
+
+
+def score_export(csv_path: str = EXPORT_CSV) -> pd.DataFrame:
+    header = read_header(csv_path)
+    columns = [c for c in ("ID", "Name", CONTENT_COL, TITLE_COL, META_COL, KEYWORD_COL) if c in header]
+    df = read_export(csv_path, columns=columns)
+    return pd.concat([df[[c for c in ("ID", "Name") if c in df.columns]], score_frame(df)], axis=1)
+
+
+def failing_fields_by_id(scores: pd.DataFrame, min_score: int = MIN_SCORE) -> Dict[int, List[str]]:
+    """{product ID: [fields to regenerate]} for products under `min_score`."""
+    low = scores[scores["seo_score"] < min_score]
+    return {int(i): fields for i, fields in zip(low["ID"], low["failing_fields"]) if fields}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Estimate RankMath SEO scores for the export.")
+    parser.add_argument("csv", nargs="?", default=EXPORT_CSV)
+    parser.add_argument("--min-score", type=int, default=MIN_SCORE)
+    parser.add_argument("--out", help="Write per-product scores and failing fields to this CSV")
+    args = parser.parse_args()
+
+    scores = score_export(args.csv)
+    below = scores[scores["seo_score"] < args.min_score]
+    print(f"📊 {len(scores)} products, mean score {scores['seo_score'].mean():.1f}, "
+          f"{len(below)} below {args.min_score}")
+    counts = pd.Series([c for fc in below["failed_checks"] for c in fc]).value_counts()
+    for check, n in counts.items():
+        print(f"   ❌ {check:24s} {n:5d}  → {CHECKS[check][1] or 'manual'}")
+    if args.out:
+        out = scores.copy()
+        out["failed_checks"] = out["failed_checks"].str.join(";")
+        out["failing_fields"] = out["failing_fields"].str.join(";")
+        out.to_csv(args.out, index=False, encoding="utf-8-sig")
+        print(f"✅ Saved {args.out}")
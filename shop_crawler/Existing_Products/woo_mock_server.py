@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+woo_mock_server.py  ──────────────────────────────────────────────────────────────
+In‑memory stand‑in for the WooCommerce REST API, for trying `woo_publisher.py`
+without touching the shop.
+
+Implements what the publisher uses under /wp-json/wc/v3:
+    GET  products?sku=a,b|include=1,2&per_page&page   GET products/categories, products/tags
+    GET  orders?status=a,b&after=<iso date>  (orders loaded with `--orders-json`)
+    POST products/batch                     (max 100 items, per‑item errors like WooCommerce)
+Duplicate SKUs on create and unknown IDs on update fail per item, batches over
+100 items get 413. Images given as `src` become new media (counted in
+`media`, like WooCommerce sideloading them), `{"id": …}` reuses one. `--adopt-ids` accepts updates for IDs it has never seen, so
+an existing export can be published as is. `--fail-rate` answers a share of
+batch requests with 503 (after applying them, like a proxy timing out) to
+exercise retries, and `--latency` slows every request down.
+
+Run:
+    python woo_mock_server.py --port 8099 --adopt-ids --categories "Przekąski,Bez cukru"
+    WC_URL=http://127.0.0.1:8099 python woo_publisher.py export_for_reference_enhanced.csv
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+# ------------------------------ CONFIG --------------------------------------- #
+PORT = 8099
+API_PATH = "/wp-json/wc/v3/"
+MAX_BATCH = 100
+# ----------------------------------------------------------------------------- #
+
+
+class MockWoo:
+    """Products, categories and tags kept in dicts; all access under one lock."""
+
+    def __init__(self, categories: Optional[List[str]] = None, tags: Optional[List[str]] = None,
+                 fail_rate: float = 0.0, latency: float = 0.0, adopt_ids: bool = False,
+                 orders: Optional[List[dict]] = None):
+        self.products: Dict[int, dict] = {}
+        self.orders = sorted(orders or [], key=lambda o: o.get("date_created", ""))
+        self.terms = {
+            "categories": [{"id": 100 + i, "name": n} for i, n in enumerate(categories or [])],
+            "tags": [{"id": 500 + i, "name": n} for i, n in enumerate(tags or [])],
+        }
+        self.fail_rate = fail_rate
+        self.latency = latency
+        self.adopt_ids = adopt_ids  # unknown IDs on update are treated as existing products
+        self.requests = 0
+        self.batches = 0
+        self.media = 0  # attachments created from `src` images
+        self._next_id = 1
+        self._media_src: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def _sku_taken(self, sku, own_id=None) -> bool:
+        return bool(sku) and any(p.get("sku") == sku and i != own_id for i, p in self.products.items())
+
+    def _error(self, code, message):
+        return {"id": 0, "error": {"code": code, "message": message, "data": {"status": 400}}}
+
+    def _attach(self, images: List[dict]) -> List[dict]:
+        attached = []
+        for img in images:
+            if img.get("id"):
+                attached.append({"id": img["id"], "src": self._media_src.get(img["id"], "")})
+                continue
+            self.media += 1
+            media_id = 9000 + self.media
+            self._media_src[media_id] = img.get("src", "")
+            attached.append({"id": media_id, "src": img.get("src", "")})
+        return attached
+
+    def batch(self, body: dict) -> dict:
+        result = {"create": [], "update": []}
+        with self._lock:
+            self.batches += 1
+            for item in body.get("create", []):
+                if self._sku_taken(item.get("sku")):
+                    result["create"].append(self._error("product_invalid_sku", "Invalid or duplicated SKU."))
+                    continue
+                product = {"id": self._next_id, "meta_data": [], **item}
+                if "images" in item:
+                    product["images"] = self._attach(item["images"])
+                self.products[self._next_id] = product
+                self._next_id += 1
+                result["create"].append(product)
+            for item in body.get("update", []):
+                pid = int(item.get("id", 0))
+                if pid not in self.products:
+                    if not (self.adopt_ids and pid > 0):
+                        result["update"].append(self._error("woocommerce_rest_product_invalid_id", "Invalid ID."))
+                        continue
+                    self.products[pid] = {"id": pid, "meta_data": []}
+                    self._next_id = max(self._next_id, pid + 1)
+                if self._sku_taken(item.get("sku"), pid):
+                    result["update"].append(self._error("product_invalid_sku", "Invalid or duplicated SKU."))
+                    continue
+                product = self.products[pid]
+                meta = {m["key"]: m for m in product.get("meta_data", [])}
+                meta.update({m["key"]: m for m in item.get("meta_data", [])})  # merged by key, like WooCommerce
+                product.update({k: v for k, v in item.items() if k != "meta_data"})
+                if "images" in item:
+                    product["images"] = self._attach(item["images"])
+                product["meta_data"] = list(meta.values())
+                result["update"].append(product)
+        return result
+
+    def find(self, skus: List[str], ids: Optional[List[int]] = None) -> List[dict]:
+        with self._lock:
+            return [p for p in self.products.values()
+                    if (not skus or p.get("sku") in skus) and (not ids or p["id"] in ids)]
+
+    def find_orders(self, statuses: List[str], after: str = "") -> List[dict]:
+        return [o for o in self.orders
+                if (not statuses or o.get("status") in statuses) and o.get("date_created", "") > after]
+
+    def serve(self, port: int = PORT, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """Start serving in a background thread; `server.shutdown()` stops it."""
+        server = ThreadingHTTPServer((host, port), _handler_for(self))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def _handler_for(woo: MockWoo):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, payload):
+            data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _route(self):
+            woo.requests += 1
+            if woo.latency:
+                time.sleep(woo.latency)
+            url = urlparse(self.path)
+            if not url.path.startswith(API_PATH):
+                return None, {}
+            return url.path[len(API_PATH):].strip("/"), {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        def do_GET(self):
+            route, query = self._route()
+            page, per_page = int(query.get("page", 1)), int(query.get("per_page", 10))
+            if route == "products":
+                skus = [s for s in query.get("sku", "").split(",") if s]
+                ids = [int(i) for i in query.get("include", "").split(",") if i]
+                items = woo.find(skus, ids)
+            elif route == "orders":
+                items = woo.find_orders([s for s in query.get("status", "").split(",") if s], query.get("after", ""))
+            elif route in ("products/categories", "products/tags"):
+                items = woo.terms[route.split("/")[1]]
+            else:
+                return self._send(404, {"code": "rest_no_route", "message": "No route was found."})
+            self._send(200, items[(page - 1) * per_page:page * per_page])
+
+        def do_POST(self):
+            route, _ = self._route()
+            if route != "products/batch":
+                return self._send(404, {"code": "rest_no_route", "message": "No route was found."})
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if sum(len(body.get(k, [])) for k in ("create", "update", "delete")) > MAX_BATCH:
+                return self._send(413, {"code": "woocommerce_rest_request_entity_too_large",
+                                        "message": f"Unable to accept more than {MAX_BATCH} items for this request."})
+            result = woo.batch(body)
+            if random.random() < woo.fail_rate:
+                return self._send(503, {"code": "service_unavailable", "message": "Upstream timed out."})
+            self._send(200, result)
+
+    return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run an in-memory WooCommerce REST mock.")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--categories", default="", help="Comma-separated category names to pre-create")
+    parser.add_argument("--tags", default="", help="Comma-separated tag names to pre-create")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of batch requests answered with 503")
+    parser.add_argument("--adopt-ids", action="store_true", help="Treat unknown product IDs as existing products")
+    parser.add_argument("--orders-json", help="JSON list of REST-shaped orders to serve under /orders")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every request")
+    args = parser.parse_args()
+
+    split = lambda value: [v.strip() for v in value.split(",") if v.strip()]
+    orders = []
+    if args.orders_json:
+        with open(args.orders_json, "r", encoding="utf-8") as f:
+            orders = json.load(f)
+    mock = MockWoo(split(args.categories), split(args.tags), args.fail_rate, args.latency, args.adopt_ids, orders)
+    server = mock.serve(args.port)
+    print(f"🧪 Mock WooCommerce on http://127.0.0.1:{args.port} – Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(5)
+            print(f"   {len(mock.products)} products, {mock.media} media, {mock.batches} batches, {mock.requests} requests")
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,506 @@
+#!/usr/bin/env python3
+"""
+woo_publisher.py  ────────────────────────────────────────────────────────────────
+Publish a product CSV straight to WooCommerce through the REST batch endpoint.
+
+Replaces the manual CSV import of `products_guiltfree.csv`, `tier1_products.csv`,
+`export_for_reference_enhanced.csv`, `export_enhanced_with_nutrition.csv`, …:
+1. Every row is mapped to a REST product payload (export and scraper column
+   names are both understood; `Enhanced …` columns win over the originals).
+2. Each payload field is hashed and compared with the last published state in
+   `published.db` – only changed fields are sent, unchanged products not at all.
+3. Creates and updates go to `products/batch` in batches of 100, several
+   batches at a time. Products are keyed by export `ID`, else `SKU`, else GTIN
+   (which then becomes the SKU).
+4. Retries are idempotent: before a batch with creates is (re)sent, its SKUs are
+   looked up and products that already exist are turned into updates.
+5. Images of existing products are sent as their attachment IDs (looked up on
+   the product) – a `src` makes WooCommerce download the file again as new
+   media – and only URLs the product does not have yet go out as `src`.
+   Only the meta keys the pipeline writes (`OWNED_META`) are published; plugin
+   state such as RankMath scores or Google Listings sync flags is left alone.
+
+Credentials come from WC_URL, WC_CONSUMER_KEY and WC_CONSUMER_SECRET; point
+WC_URL at `woo_mock_server.py` to try a run locally.
+
+Run:
+    python woo_publisher.py export_enhanced_with_nutrition.csv --dry-run
+    python woo_publisher.py products_guiltfree.csv --workers 4
+    python woo_publisher.py products_guiltfree.csv --changes catalogue_changes.jsonl
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+
+from catalogue_diff import changed_keys, row_keys
+
+# ------------------------------ CONFIG --------------------------------------- #
+STATE_DB = "published.db"
+API_PATH = "/wp-json/wc/v3"
+BATCH_SIZE = 100              # WooCommerce's limit per batch request
+WORKERS = 4
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 2              # seconds, doubled per attempt
+BACKOFF_MAX = 60
+TIMEOUT = 120
+SKU_LOOKUP_CHUNK = 50
+CSV_ENCODING = "utf-8-sig"
+# ----------------------------------------------------------------------------- #
+
+# payload field → CSV columns, first non‑empty wins
+FIELD_SOURCES = {
+    "name": ["Name", "Title"],
+    "sku": ["SKU"],
+    "global_unique_id": ["GTIN, UPC, EAN, or ISBN", "GTIN"],
+    "description": ["Enhanced Long Description", "Description", "Long Description"],
+    "short_description": ["Enhanced Short Description", "Short description", "Short Description"],
+    "regular_price": ["Regular price", "Price"],
+    "sale_price": ["Sale price"],
+    "weight": ["Weight (g)"],
+    "catalog_visibility": ["Visibility in catalogue"],
+}
+STATUS = {"1": "publish", "0": "draft", "-1": "private"}
+STOCK_STATUS = {"1": "instock", "0": "outofstock", "backorder": "onbackorder"}
+TERM_LABELS = {"categories": "category", "tags": "tag"}
+TRANSIENT_STATUS = {408, 425, 429, 500, 502, 503, 504}
+CLEARABLE = {"sale_price": "", "images": []}   # sent empty when a column was emptied
+DUPLICATE_SKU_CODES = {"product_invalid_sku", "woocommerce_rest_product_not_created"}
+# `Meta: …` columns written by the enhancers; every other meta key belongs to a plugin
+OWNED_META = ["rank_math_focus_keyword", "seo_title", "seo_description"]
+
+
+class PublishError(Exception):
+    pass
+
+
+def _cell(row: dict, key: str) -> str:
+    return (row.get(key) or "").strip()
+
+
+def _first(row: dict, keys: List[str]) -> str:
+    for key in keys:
+        if _cell(row, key):
+            return _cell(row, key)
+    return ""
+
+
+def _price(value: str) -> str:
+    """'12,99 zł' → '12.99' (WooCommerce wants a plain decimal string)."""
+    match = re.search(r"\d+(?:[.,]\d+)?", value.replace("\xa0", "").replace(" ", ""))
+    return match.group(0).replace(",", ".") if match else ""
+
+
+def _flag(value: str) -> bool:
+    return value.strip().lower() in ("1", "yes", "true")
+
+
+def field_hash(value) -> str:
+    return hashlib.sha1(json.dumps(value, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+# === CSV ROW → PAYLOAD ===
+def to_payload(row: dict, terms: Optional["TermResolver"] = None) -> dict:
+    """Full REST payload for one CSV row (empty fields are left out)."""
+    payload = {field: _first(row, cols) for field, cols in FIELD_SOURCES.items()}
+    for field in ("regular_price", "sale_price"):
+        payload[field] = _price(payload[field])
+    if not payload["sku"] and payload["global_unique_id"] and not _cell(row, "ID"):
+        payload["sku"] = payload["global_unique_id"]  # new products from scraper CSVs: the GTIN keeps creates idempotent
+
+    if _cell(row, "Published") in STATUS:
+        payload["status"] = STATUS[_cell(row, "Published")]
+    if _cell(row, "Is featured?"):
+        payload["featured"] = _flag(_cell(row, "Is featured?"))
+    if _cell(row, "In stock?") in STOCK_STATUS:
+        payload["stock_status"] = STOCK_STATUS[_cell(row, "In stock?")]
+    if re.fullmatch(r"-?\d+", _cell(row, "Stock")):
+        payload["manage_stock"] = True
+        payload["stock_quantity"] = int(_cell(row, "Stock"))
+
+    images = _first(row, ["Images", "images"])
+    if images:
+        payload["images"] = [{"src": url.strip()} for url in images.split(",") if url.strip()]
+
+    if terms is not None:
+        categories = terms.ids("categories", _cell(row, "Categories"))
+        if categories:
+            payload["categories"] = [{"id": i} for i in categories]
+        tags = terms.ids("tags", _cell(row, "Tags"))
+        if tags:
+            payload["tags"] = [{"id": i} for i in tags]
+
+    attributes = []
+    for n in range(1, 10):
+        name, values = _cell(row, f"Attribute {n} name"), _cell(row, f"Attribute {n} value(s)")
+        if name and values:
+            attributes.append({
+                "name": name,
+                "options": [v.strip() for v in values.split(",") if v.strip()],
+                "visible": _flag(_cell(row, f"Attribute {n} visible") or "1"),
+                "position": n - 1,
+            })
+    if attributes:
+        payload["attributes"] = attributes
+
+    meta = [{"key": key, "value": _cell(row, f"Meta: {key}")} for key in OWNED_META if _cell(row, f"Meta: {key}")]
+    if meta:
+        payload["meta_data"] = meta
+    return {k: v for k, v in payload.items() if v not in ("", None, [])}
+
+
+def payload_hashes(payload: dict) -> Dict[str, str]:
+    """One hash per top‑level field, and one per meta key (meta is merged by key on update)."""
+    hashes = {k: field_hash(v) for k, v in payload.items() if k != "meta_data"}
+    for item in payload.get("meta_data", []):
+        hashes[f"meta:{item['key']}"] = field_hash(item["value"])
+    return hashes
+
+
+def changed_fields(payload: dict, old: Dict[str, str]) -> dict:
+    """Only the fields (and meta keys) whose hash differs from the published state."""
+    new = payload_hashes(payload)
+    diff = {k: v for k, v in payload.items() if k != "meta_data" and old.get(k) != new[k]}
+    meta = [m for m in payload.get("meta_data", []) if old.get(f"meta:{m['key']}") != new[f"meta:{m['key']}"]]
+    if meta:
+        diff["meta_data"] = meta
+    diff.update({k: empty for k, empty in CLEARABLE.items() if k in old and k not in new})
+    return diff
+
+
+def image_name(url: str) -> str:
+    """File name without query, size suffix or `-scaled` – how an upload is recognised across URLs."""
+    name = url.strip().split("?")[0].rsplit("/", 1)[-1].lower()
+    return re.sub(r"(-\d+x\d+|-scaled)(?=\.\w+$)", "", name)
+
+
+def product_key(row: dict, payload: dict) -> Optional[str]:
+    product_id = _cell(row, "ID")
+    if re.fullmatch(r"\d+(\.0)?", product_id):
+        return f"id:{int(float(product_id))}"
+    if payload.get("sku"):
+        return f"sku:{payload['sku']}"
+    return None
+
+
+# === REST CLIENT ===
+class WooClient:
+    """Thin WooCommerce REST client: one `requests.Session` per thread, retries on transient errors."""
+
+    def __init__(self, url: Optional[str] = None, key: Optional[str] = None, secret: Optional[str] = None,
+                 timeout: int = TIMEOUT):
+        self.base = (url or os.getenv("WC_URL", "")).rstrip("/") + API_PATH
+        self.auth = (key or os.getenv("WC_CONSUMER_KEY", ""), secret or os.getenv("WC_CONSUMER_SECRET", ""))
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _session(self):
+        if not hasattr(self._local, "session"):
+            import requests
+
+            session = requests.Session()
+            session.auth = self.auth
+            session.headers["User-Agent"] = "noguiltmeal-publisher"
+            self._local.session = session
+        return self._local.session
+
+    def request(self, method: str, path: str, **kwargs):
+        import requests
+
+        delay = BACKOFF_BASE
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                response = self._session().request(method, f"{self.base}/{path}", timeout=self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = f"{type(e).__name__}: {e}"
+            else:
+                if response.status_code < 400:
+                    return response.json()
+                if response.status_code not in TRANSIENT_STATUS:
+                    raise PublishError(f"{method} {path} → {response.status_code}: {response.text[:300]}")
+                error = f"HTTP {response.status_code}"
+                retry_after = response.headers.get("Retry-After", "")
+                if retry_after.isdigit():
+                    delay = max(delay, int(retry_after))
+            if attempt == MAX_ATTEMPTS:
+                raise PublishError(f"{method} {path} failed after {MAX_ATTEMPTS} attempts ({error})")
+            wait = min(delay, BACKOFF_MAX) + random.uniform(0, 1)
+            print(f"⏳ {error} – retrying {path} in {wait:.0f}s (attempt {attempt}/{MAX_ATTEMPTS})")
+            time.sleep(wait)
+            delay *= 2
+
+    def get_all(self, path: str, params: Optional[dict] = None) -> Iterator[dict]:
+        page = 1
+        while True:
+            items = self.request("GET", path, params={**(params or {}), "per_page": 100, "page": page})
+            yield from items
+            if len(items) < 100:
+                return
+            page += 1
+
+    def find_skus(self, skus: List[str]) -> Dict[str, int]:
+        """{sku: product id} for SKUs that already exist in the shop."""
+        found = {}
+        for i in range(0, len(skus), SKU_LOOKUP_CHUNK):
+            chunk = skus[i:i + SKU_LOOKUP_CHUNK]
+            for product in self.get_all("products", {"sku": ",".join(chunk), "status": "any"}):
+                if product.get("sku") in chunk:
+                    found[product["sku"]] = product["id"]
+        return found
+
+    def find_ids(self, ids: List[int]) -> Dict[int, dict]:
+        """{product id: product} for IDs that exist in the shop."""
+        found = {}
+        for i in range(0, len(ids), 100):
+            chunk = ids[i:i + 100]
+            for product in self.get_all("products", {"include": ",".join(map(str, chunk)), "status": "any"}):
+                found[product["id"]] = product
+        return found
+
+    def batch(self, create: List[dict], update: List[dict]) -> dict:
+        return self.request("POST", "products/batch", json={"create": create, "update": update})
+
+
+class TermResolver:
+    """Category/tag names → term IDs (WooCommerce only accepts IDs). Loaded once per run."""
+
+    def __init__(self, client: WooClient):
+        self.client = client
+        self._terms: Dict[str, Dict[str, int]] = {}
+        self._missing = set()
+
+    def _load(self, taxonomy: str) -> Dict[str, int]:
+        if taxonomy not in self._terms:
+            self._terms[taxonomy] = {
+                term["name"].strip().lower(): term["id"] for term in self.client.get_all(f"products/{taxonomy}")
+            }
+        return self._terms[taxonomy]
+
+    def ids(self, taxonomy: str, value: str) -> List[int]:
+        """'Zdrowa żywność > Przekąski, Bez cukru' → IDs of the leaf terms."""
+        ids = []
+        for path in filter(None, (p.strip() for p in value.split(","))):
+            name = path.split(">")[-1].strip()
+            term_id = self._load(taxonomy).get(name.lower())
+            if term_id:
+                ids.append(term_id)
+            elif (taxonomy, name) not in self._missing:
+                self._missing.add((taxonomy, name))
+                print(f"⚠️ Unknown {TERM_LABELS[taxonomy]} '{name}' – create it in WooCommerce first")
+        return ids
+
+
+# === PUBLISHED STATE ===
+class PublishState:
+    """Field hashes of what was last published, keyed like `product_key()`."""
+
+    def __init__(self, path: str = STATE_DB):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS published "
+            "(key TEXT PRIMARY KEY, woo_id INTEGER, hashes TEXT, published_at TEXT)"
+        )
+        self.conn.commit()
+        self._lock = threading.Lock()
+
+    def load(self) -> Dict[str, Tuple[Optional[int], Dict[str, str]]]:
+        return {key: (woo_id, json.loads(hashes or "{}"))
+                for key, woo_id, hashes in self.conn.execute("SELECT key, woo_id, hashes FROM published")}
+
+    def save(self, rows: List[Tuple[str, int, Dict[str, str]]]):
+        now = datetime.now().isoformat(timespec="seconds")
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO published (key, woo_id, hashes, published_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET woo_id = excluded.woo_id, hashes = excluded.hashes, "
+                "published_at = excluded.published_at",
+                [(key, woo_id, json.dumps(hashes, sort_keys=True), now) for key, woo_id, hashes in rows],
+            )
+
+    def close(self):
+        self.conn.close()
+
+
+# === PUBLISHING ===
+class Operation:
+    """One product to create or update, with the hashes to record once it went through."""
+
+    __slots__ = ("key", "woo_id", "payload", "body", "hashes")
+
+    def __init__(self, key, woo_id, payload, body, hashes):
+        self.key, self.woo_id, self.payload, self.body, self.hashes = key, woo_id, payload, body, hashes
+
+
+def iter_rows(csv_path: str) -> Iterator[dict]:
+    csv.field_size_limit(2**31 - 1)  # long HTML cells
+    with open(csv_path, "r", encoding=CSV_ENCODING, newline="") as f:
+        yield from csv.DictReader(f)
+
+
+def plan(csv_path: str, state: Dict[str, Tuple[Optional[int], Dict[str, str]]],
+         terms: Optional[TermResolver] = None, force: bool = False,
+         only: Optional[Set[str]] = None) -> Tuple[List[Operation], int, int]:
+    """Operations for every changed product; returns (operations, unchanged, skipped).
+
+    `only` restricts the run to rows matching a change set (`catalogue_diff.changed_keys()`).
+    """
+    ops, unchanged, skipped = [], 0, 0
+    for row in iter_rows(csv_path):
+        if only is not None and not only & set(row_keys(row).values()):
+            unchanged += 1
+            continue
+        payload = to_payload(row, terms)
+        key = product_key(row, payload)
+        if key is None or not payload.get("name"):
+            skipped += 1
+            continue
+        woo_id, old = state.get(key, (None, {}))
+        if woo_id is None and key.startswith("id:"):
+            woo_id = int(key[3:])
+        body = dict(payload) if force or woo_id is None else changed_fields(payload, old)
+        if not body:
+            unchanged += 1
+            continue
+        meta = {k: v for k, v in old.items() if k.startswith("meta:")}  # meta keys are never removed by an update
+        ops.append(Operation(key, woo_id, payload, body, {**meta, **payload_hashes(payload)}))
+    return ops, unchanged, skipped
+
+
+def resolve_existing(client: WooClient, ops: List[Operation]):
+    """Turn creates whose SKU already exists into full updates (makes retried creates idempotent)."""
+    creates = [op for op in ops if op.woo_id is None and op.payload.get("sku")]
+    if not creates:
+        return
+    found = client.find_skus([op.payload["sku"] for op in creates])
+    for op in creates:
+        if op.payload["sku"] in found:
+            op.woo_id = found[op.payload["sku"]]
+            op.body = dict(op.payload)
+
+
+def resolve_images(client: WooClient, ops: List[Operation]):
+    """Updates reference the product's existing attachments by ID; unchanged galleries are not sent.
+
+    Images of a product that cannot be looked up are left out rather than re‑uploaded.
+    """
+    updates = [op for op in ops if op.woo_id is not None and op.body.get("images")]
+    if not updates:
+        return
+    products = client.find_ids([op.woo_id for op in updates])
+    for op in updates:
+        product = products.get(op.woo_id)
+        if product is None:
+            del op.body["images"]
+            continue
+        current = [img for img in product.get("images", []) if img.get("id")]
+        by_name = {image_name(img.get("src", "")): img["id"] for img in current}
+        images = [{"id": by_name[image_name(img["src"])]} if image_name(img["src"]) in by_name else img
+                  for img in op.body["images"]]
+        if [img.get("id") for img in images] == [img["id"] for img in current]:
+            del op.body["images"]
+        else:
+            op.body["images"] = images
+
+
+def send_batch(client: WooClient, ops: List[Operation]) -> Tuple[List[Tuple[str, int, Dict[str, str]]], List[str]]:
+    """Send one batch; returns (published state rows, error messages)."""
+    resolve_existing(client, ops)
+    resolve_images(client, ops)
+    settled = [(op.key, op.woo_id, op.hashes) for op in ops if op.woo_id is not None and not op.body]
+    ops = [op for op in ops if op.body or op.woo_id is None]  # only the gallery "changed" – nothing to send
+    if not ops:
+        return settled, []
+    creates = [op for op in ops if op.woo_id is None]
+    updates = [op for op in ops if op.woo_id is not None]
+    response = client.batch([op.body for op in creates], [{"id": op.woo_id, **op.body} for op in updates])
+
+    done, errors, retry = settled, [], []
+    for kind, sent in (("create", creates), ("update", updates)):
+        for op, result in zip(sent, response.get(kind, [])):
+            error = result.get("error")
+            if not error:
+                done.append((op.key, result["id"], op.hashes))
+            elif kind == "create" and error.get("code") in DUPLICATE_SKU_CODES:
+                retry.append(op)  # created by an earlier, timed‑out attempt
+            else:
+                errors.append(f"{op.key} ({op.payload.get('name', '')}): {error.get('message', error)}")
+    if retry:
+        resolve_existing(client, retry)
+        if all(op.woo_id is not None for op in retry):
+            more, more_errors = send_batch(client, retry)
+            return done + more, errors + more_errors
+        errors += [f"{op.key}: duplicate SKU not found by lookup" for op in retry if op.woo_id is None]
+    return done, errors
+
+
+def publish(csv_path: str, client: WooClient, state_path: str = STATE_DB, workers: int = WORKERS,
+            batch_size: int = BATCH_SIZE, force: bool = False, dry_run: bool = False, use_terms: bool = True,
+            only: Optional[Set[str]] = None) -> dict:
+    state = PublishState(state_path)
+    try:
+        terms = TermResolver(client) if use_terms and not dry_run else None
+        ops, unchanged, skipped = plan(csv_path, state.load(), terms, force=force, only=only)
+        summary = {"changed": len(ops), "unchanged": unchanged, "skipped": skipped,
+                   "creates": sum(op.woo_id is None for op in ops), "published": 0, "errors": 0}
+        print(f"📦 {len(ops)} changed ({summary['creates']} new), {unchanged} unchanged, {skipped} skipped")
+        if dry_run or not ops:
+            return summary
+
+        batches = [ops[i:i + batch_size] for i in range(0, len(ops), batch_size)]
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = {pool.submit(send_batch, client, batch): n for n, batch in enumerate(batches, 1)}
+            for future in as_completed(futures):
+                n = futures[future]
+                try:
+                    done, errors = future.result()
+                except PublishError as e:
+                    print(f"❌ Batch {n}/{len(batches)}: {e}")
+                    summary["errors"] += len(batches[n - 1])
+                    continue
+                state.save(done)  # only what WooCommerce confirmed is remembered
+                summary["published"] += len(done)
+                summary["errors"] += len(errors)
+                for message in errors:
+                    print(f"   ❌ {message}")
+                print(f"✅ Batch {n}/{len(batches)}: {len(done)} published, {len(errors)} errors")
+        print(f"🏁 {summary['published']} products published in {time.monotonic() - started:.1f}s, "
+              f"{summary['errors']} errors")
+        return summary
+    finally:
+        state.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publish a product CSV to WooCommerce via the REST batch API.")
+    parser.add_argument("csv")
+    parser.add_argument("--state", default=STATE_DB, help="SQLite file with the last published field hashes")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Concurrent batch requests")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--force", action="store_true", help="Send full payloads, ignoring the published state")
+    parser.add_argument("--no-terms", action="store_true", help="Do not map categories/tags to term IDs")
+    parser.add_argument("--changes", help="Only consider products in this catalogue_diff.py change set")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be sent")
+    args = parser.parse_args()
+
+    load_dotenv()
+    woo = WooClient()
+    if not args.dry_run and not woo.base.startswith("http"):
+        parser.error("set WC_URL (and WC_CONSUMER_KEY / WC_CONSUMER_SECRET)")
+    result = publish(args.csv, woo, state_path=args.state, workers=args.workers,
+                     batch_size=min(args.batch_size, BATCH_SIZE), force=args.force, dry_run=args.dry_run, use_terms=not args.no_terms,
+                     only=changed_keys(args.changes) if args.changes else None)
+    raise SystemExit(1 if result["errors"] else 0)
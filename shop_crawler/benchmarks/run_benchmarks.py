@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+run_benchmarks.py  ───────────────────────────────────────────────────────────────
+Offline throughput benchmarks for the scraping, CSV, enhancement and mail stages.
+
+Everything runs from recorded inputs – no browser, no shop, no LLM, no SMTP
+provider:
+1. extract  – each scraper's `fetch_product_data()` over the saved product pages
+              in `fixtures/<shop>/` through `OfflineDriver` → pages/s per shop
+              (politeness sleeps are skipped, only DOM work is timed) plus the
+              number of filled fields, so a "faster" change that breaks
+              extraction shows up as well.
+2. csv      – the sample export (`Existing_Products/products_missing_nutrition.csv`)
+              blown up to `--rows` rows → rows/s for chunked reading, nutrition
+              table re‑rendering, `update_export()` and `catalogue_diff.diff()`.
+3. enhance  – `regenerate_fields.run()` for all fields, replaying
+              `fixtures/llm_responses.jsonl` through a fake provider with
+              `--llm-latency` per call and `--llm-rps` calls/s → products/min.
+4. mail     – `MailDispatcher` against a local SMTP stub → emails/s.
+
+Each run is appended to `results.jsonl` (with the git commit) and compared to
+the previous run; `--check` exits with 1 when a metric dropped more than
+`--tolerance`. Real saved pages can be dropped into `fixtures/<shop>/` next to
+the hand‑made ones.
+
+Run:
+    python run_benchmarks.py
+    python run_benchmarks.py --stages extract csv --check
+    python run_benchmarks.py --compare          # last two runs, no benchmarking
+"""
+
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import platform
+import shutil
+import socketserver
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from email.message import EmailMessage
+from typing import Callable, Dict, List, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(HERE, ".."))
+sys.path.append(os.path.join(HERE, "..", "Existing_Products"))
+
+from rate_limiter import RateLimiter  # noqa: E402
+
+# ------------------------------ CONFIG --------------------------------------- #
+FIXTURES_DIR = os.path.join(HERE, "fixtures")
+SAMPLE_EXPORT = os.path.join(HERE, "..", "Existing_Products", "products_missing_nutrition.csv")
+LLM_RESPONSES = os.path.join(FIXTURES_DIR, "llm_responses.jsonl")
+RESULTS_JSONL = os.path.join(HERE, "results.jsonl")
+SHOPS = ["guiltfree", "sportmax", "strefamocy", "swiatsupli"]
+STAGES = ["extract", "csv", "enhance", "mail"]
+EXTRACT_PAGES = 200            # per shop
+CSV_ROWS = 5000
+ENHANCE_PRODUCTS = 24
+ENHANCE_WORKERS = 4
+LLM_LATENCY = 0.15             # seconds per simulated completion
+LLM_RPS = 20                   # simulated provider limit, calls per second
+MAIL_MESSAGES = 500
+MAIL_WORKERS = 3
+TOLERANCE = 0.15               # relative drop that counts as a regression
+# ----------------------------------------------------------------------------- #
+
+
+def _rate(count: int, seconds: float) -> float:
+    return round(count / seconds, 2) if seconds > 0 else 0.0
+
+
+@contextlib.contextmanager
+def _quiet():
+    """Swallow the stages' own progress prints while timing them."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+@contextlib.contextmanager
+def _workdir():
+    """Run in a throwaway directory so stores/logs the stages create in cwd never touch real ones."""
+    previous, path = os.getcwd(), tempfile.mkdtemp(prefix="bench_")
+    os.chdir(path)
+    try:
+        yield path
+    finally:
+        os.chdir(previous)
+        shutil.rmtree(path, ignore_errors=True)
+
+
+# === EXTRACTION ===
+def bench_extract(pages: int = EXTRACT_PAGES) -> Dict[str, float]:
+    from offline_driver import OfflineDriver, replaying
+
+    results = {}
+    for shop in SHOPS:
+        folder = os.path.join(FIXTURES_DIR, shop)
+        driver = OfflineDriver.from_directory(folder, f"https://{shop}.fixture/")
+        if not driver.pages:
+            continue
+        try:
+            scraper = importlib.import_module(f"scraper_{shop}")
+        except ImportError as e:
+            print(f"⚠️ extract/{shop}: cannot import the scraper ({e}) – skipped")
+            continue
+        urls = list(driver.pages)
+        filled = []
+        with replaying(scraper), _quiet():
+            started = time.perf_counter()
+            for i in range(pages):
+                driver.get(urls[i % len(urls)])
+                data = scraper.fetch_product_data(driver) or {}
+                if i < len(urls):
+                    filled.append(sum(1 for v in data.values() if str(v).strip()))
+            elapsed = time.perf_counter() - started
+        results[f"extract.{shop}.pages_per_s"] = _rate(pages, elapsed)
+        results[f"extract.{shop}.fields"] = round(sum(filled) / max(1, len(filled)), 1)
+    return results
+
+
+# === CSV ===
+def _sample_export(rows: int, path: str) -> str:
+    """The sample export repeated to `rows` rows with unique IDs."""
+    import csv
+
+    csv.field_size_limit(2**31 - 1)
+    with open(SAMPLE_EXPORT, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.DictReader(f)
+        header, sample = reader.fieldnames, list(reader)
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=header)
+        writer.writeheader()
+        for i in range(rows):
+            row = dict(sample[i % len(sample)])
+            row["ID"] = str(100000 + i)
+            if "SKU" in row:
+                row["SKU"] = f"{row['SKU']}-{i}" if row["SKU"] else ""
+            writer.writerow(row)
+    return path
+
+
+def bench_csv(rows: int = CSV_ROWS) -> Dict[str, float]:
+    import catalogue_diff
+    from export_reader import iter_export_chunks, read_export, update_export
+    from nutrition_renderer import rerender_description
+
+    results = {}
+    with _workdir() as work, _quiet():
+        export = _sample_export(rows, os.path.join(work, "export.csv"))
+
+        started = time.perf_counter()
+        count = sum(len(chunk) for chunk in iter_export_chunks(export))
+        results["csv.read.rows_per_s"] = _rate(count, time.perf_counter() - started)
+
+        descriptions = read_export(export, columns=["ID", "Description"], use_cache=False)["Description"].fillna("")
+        started = time.perf_counter()
+        for text in descriptions:
+            rerender_description(text)
+        results["csv.render.rows_per_s"] = _rate(len(descriptions), time.perf_counter() - started)
+
+        changed = _sample_export(rows, os.path.join(work, "export_new.csv"))
+        updates = {100000 + i: {"Regular price": "9.99"} for i in range(0, rows, 10)}
+        started = time.perf_counter()
+        update_export(changed, updates)
+        results["csv.update.rows_per_s"] = _rate(rows, time.perf_counter() - started)
+
+        started = time.perf_counter()
+        catalogue_diff.diff(export, changed, os.path.join(work, "changes.jsonl"), mode="id")
+        results["csv.diff.rows_per_s"] = _rate(2 * rows, time.perf_counter() - started)
+    return results
+
+
+# === ENHANCEMENT ===
+def replay_backend(path: str = LLM_RESPONSES, latency: float = LLM_LATENCY, rps: float = LLM_RPS) -> Callable:
+    """A `BACKENDS`‑style call answering from recorded replies, paced like a rate‑limited provider."""
+    from llm_backends import clean_html
+
+    with open(path, "r", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    provider = RateLimiter(max(1, int(rps)), period=1.0)
+
+    def call(system_prompt, user_prompt, delay=0):
+        provider.acquire()
+        time.sleep(latency)
+        for rec in records:
+            if rec["when"] in user_prompt:
+                return clean_html(rec["response"])
+        return ""
+
+    return call
+
+
+def bench_enhance(products: int = ENHANCE_PRODUCTS, workers: int = ENHANCE_WORKERS,
+                  latency: float = LLM_LATENCY, rps: float = LLM_RPS) -> Dict[str, float]:
+    import llm_backends
+    import regenerate_fields
+
+    llm_backends.BACKENDS["replay"] = replay_backend(LLM_RESPONSES, latency, rps)
+    with _workdir() as work, _quiet():
+        export = _sample_export(products, os.path.join(work, "export.csv"))
+        todo = {100000 + i: set(regenerate_fields.ALL_FIELDS) for i in range(products)}
+        started = time.perf_counter()
+        done = regenerate_fields.run(export, todo, backend="replay", workers=workers, per_minute=0)
+        elapsed = time.perf_counter() - started
+    return {
+        "enhance.products_per_min": round(len(done) * 60 / elapsed, 1) if elapsed else 0.0,
+        "enhance.completed": len(done),
+    }
+
+
+# === MAIL ===
+class _SmtpStubHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line: str):
+        self.wfile.write(line.encode("ascii") + b"\r\n")
+
+    def handle(self):
+        self._reply("220 bench-stub ESMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            verb = line.decode("utf-8", "replace").strip().split(" ", 1)[0].upper()
+            if verb in ("EHLO", "HELO"):
+                self.wfile.write(b"250-bench-stub\r\n250-8BITMIME\r\n250-SMTPUTF8\r\n250 SIZE 52428800\r\n")
+            elif verb == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b".\n", b""):
+                    pass
+                with self.server.lock:
+                    self.server.received += 1
+                self._reply("250 OK queued")
+            elif verb == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:  # MAIL, RCPT, RSET, NOOP
+                self._reply("250 OK")
+
+
+class SmtpStub(socketserver.ThreadingTCPServer):
+    """Accepts everything, stores nothing, counts messages."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), _SmtpStubHandler)
+        self.received = 0
+        self.lock = threading.Lock()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+
+def bench_mail(messages: int = MAIL_MESSAGES, workers: int = MAIL_WORKERS) -> Dict[str, float]:
+    from mail_dispatch import MailDispatcher
+
+    stub = SmtpStub()
+    try:
+        host, port = stub.server_address
+        batch = []
+        for i in range(messages):
+            msg = EmailMessage()
+            msg["From"] = "bench@noguiltmeal.invalid"
+            msg["To"] = f"recipient{i}@example.invalid"
+            msg["Subject"] = f"Benchmark {i}"
+            msg.set_content("Hello,\n\nThis is a benchmark message.\n\nRegards,\nNGM Team\n")
+            batch.append(msg)
+        dispatcher = MailDispatcher(host, port, workers=workers, per_minute=0, use_tls=False)
+        started = time.perf_counter()
+        sent = sum(r.ok for r in dispatcher.send_all(batch))
+        elapsed = time.perf_counter() - started
+    finally:
+        stub.shutdown()
+        stub.server_close()
+    return {"mail.emails_per_s": _rate(sent, elapsed), "mail.delivered": stub.received}
+
+
+# === RESULTS ===
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True,
+                              text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def load_runs(path: str = RESULTS_JSONL) -> List[dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def save_run(metrics: Dict[str, float], params: dict, path: str = RESULTS_JSONL) -> dict:
+    run = {
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "machine": f"{platform.node()} ({os.cpu_count()} CPUs)",
+        "params": params,
+        "metrics": metrics,
+    }
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(run) + "\n")
+    return run
+
+
+def compare(current: dict, previous: Optional[dict], tolerance: float = TOLERANCE) -> List[str]:
+    """Print a metric table against `previous`; returns the regressed metric names (all are higher‑is‑better)."""
+    regressions = []
+    before = previous["metrics"] if previous else {}
+    label = f"vs {previous['commit'] or previous['time']}" if previous else ""
+    print(f"\n{'metric':36s} {'value':>12s} {'previous':>12s} {'change':>8s}  {label}")
+    for name, value in sorted(current["metrics"].items()):
+        old = before.get(name)
+        change = ""
+        if old:
+            delta = (value - old) / old
+            change = f"{delta:+.0%}"
+            if delta < -tolerance:
+                regressions.append(name)
+                change += " ⚠️"
+        print(f"{name:36s} {value:12,.2f} {'' if old is None else f'{old:12,.2f}':>12s} {change:>8s}")
+    settings = lambda run: {k: v for k, v in run.get("params", {}).items() if k != "stages"}
+    if previous and settings(previous) != settings(current):
+        print("ℹ️ Parameters differ from the previous run – rates are not directly comparable")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline throughput benchmarks for the shop pipelines.")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--pages", type=int, default=EXTRACT_PAGES, help="Product pages extracted per shop")
+    parser.add_argument("--rows", type=int, default=CSV_ROWS, help="Rows in the synthetic export")
+    parser.add_argument("--products", type=int, default=ENHANCE_PRODUCTS, help="Products regenerated")
+    parser.add_argument("--workers", type=int, default=ENHANCE_WORKERS, help="Enhancement worker threads")
+    parser.add_argument("--llm-latency", type=float, default=LLM_LATENCY, help="Seconds per simulated LLM call")
+    parser.add_argument("--llm-rps", type=float, default=LLM_RPS, help="Simulated provider limit (calls/s)")
+    parser.add_argument("--messages", type=int, default=MAIL_MESSAGES)
+    parser.add_argument("--mail-workers", type=int, default=MAIL_WORKERS)
+    parser.add_argument("--results", default=RESULTS_JSONL)
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--check", action="store_true", help="Exit with 1 on a regression against the previous run")
+    parser.add_argument("--compare", action="store_true", help="Only compare the last two stored runs")
+    args = parser.parse_args()
+
+    runs = load_runs(args.results)
+    if args.compare:
+        if len(runs) < 2:
+            sys.exit("Need at least two stored runs to compare")
+        sys.exit(1 if compare(runs[-1], runs[-2], args.tolerance) and args.check else 0)
+
+    stages = {
+        "extract": lambda: bench_extract(args.pages),
+        "csv": lambda: bench_csv(args.rows),
+        "enhance": lambda: bench_enhance(args.products, args.workers, args.llm_latency, args.llm_rps),
+        "mail": lambda: bench_mail(args.messages, args.mail_workers),
+    }
+    metrics: Dict[str, float] = {}
+    for stage in args.stages:
+        print(f"⏱️ {stage}…")
+        started = time.perf_counter()
+        metrics.update(stages[stage]())
+        print(f"   done in {time.perf_counter() - started:.1f}s")
+
+    params = {k: getattr(args, k) for k in ("stages", "pages", "rows", "products", "workers", "llm_latency",
+                                            "llm_rps", "messages", "mail_workers")}
+    previous = next((r for r in reversed(runs) if set(r["metrics"]) & set(metrics)), None)
+    current = save_run(metrics, params, args.results)
+    regressed = compare(current, previous, args.tolerance)
+    print(f"\n💾 Stored in {args.results}")
+    if regressed:
+        print(f"⚠️ Regressions over {args.tolerance:.0%}: {', '.join(regressed)}")
+        if args.check:
+            sys.exit(1)
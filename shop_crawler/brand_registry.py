@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+brand_registry.py  ───────────────────────────────────────────────────────────────
+Local brand registry: brand alias → canonical name → about‑page URL.
+
+Replaces per‑run Google Sheet loads, per‑row `get_close_matches` scans and
+one‑by‑one SerpAPI calls with:
+1. A persistent SQLite cache (`brands.db`) loaded once into memory. Imported
+   CSVs/sheets are authoritative and replace cached URLs (blank cells do not);
+   URLs found by search only fill gaps.
+2. A precomputed alias index keyed by a normalised name, so lookups are O(1).
+   Fuzzy matching only runs for names never seen before, and its result is
+   stored as a new alias.
+3. Concurrent resolution of truly unknown brands through a pluggable search
+   backend (SerpAPI by default; any callable `query -> url` works, e.g. a stub).
+
+Run:
+    python brand_registry.py import Existing_Products/mapped_brands.csv --brand-col "Brand Name" --url-col "Brand URL"
+    python brand_registry.py export brands.csv
+"""
+
+import argparse
+import csv
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from difflib import get_close_matches
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# ------------------------------ CONFIG --------------------------------------- #
+REGISTRY_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "brands.db")
+FUZZY_CUTOFF = 0.6
+RESOLVE_WORKERS = 4
+# ----------------------------------------------------------------------------- #
+
+SearchBackend = Callable[[str], str]
+
+
+def normalise_brand(name) -> str:
+    """Lowercase, strip accents and punctuation: "Olimp Sport-Nutrition®" → "olimp sport nutrition"."""
+    if name is None:
+        return ""
+    text = unicodedata.normalize("NFKD", str(name)).replace("ł", "l").replace("Ł", "L")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    return re.sub(r"[^a-z0-9]+", " ", text).strip()
+
+
+class SerpApiBackend:
+    """Google search through SerpAPI; returns the first organic result for "<brand> o nas"."""
+
+    def __init__(self, api_key: Optional[str] = None):
+        self.api_key = api_key or os.getenv("SERPAPI_KEY")
+        if not self.api_key:
+            raise RuntimeError("Set SERPAPI_KEY in your environment / .env")
+
+    def __call__(self, brand: str) -> str:
+        from serpapi import GoogleSearch
+
+        params = {"engine": "google", "q": f"{brand} o nas", "hl": "pl", "api_key": self.api_key}
+        data = GoogleSearch(params).get_dict()
+        results = data.get("organic_results") or []
+        return results[0].get("link", "") if results else ""
+
+
+class BrandRegistry:
+    def __init__(self, path: str = REGISTRY_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS brands (
+                canonical TEXT PRIMARY KEY,
+                url TEXT,
+                source TEXT,
+                updated_at TEXT
+            );
+            CREATE TABLE IF NOT EXISTS aliases (
+                alias TEXT PRIMARY KEY,
+                canonical TEXT NOT NULL
+            );
+            """
+        )
+        self.urls: Dict[str, str] = dict(self.conn.execute("SELECT canonical, url FROM brands"))
+        self.aliases: Dict[str, str] = dict(self.conn.execute("SELECT alias, canonical FROM aliases"))
+        self._misses = set()  # normalised names fuzzy matching already failed for
+        for canonical in self.urls:
+            self.aliases.setdefault(normalise_brand(canonical), canonical)
+
+    def close(self):
+        self.conn.close()
+
+    def __len__(self):
+        return len(self.urls)
+
+    # --- writes -------------------------------------------------------------------
+    def add(self, canonical: str, url: str = "", source: str = "manual",
+            aliases: Iterable[str] = (), overwrite: bool = True):
+        canonical = str(canonical).strip()
+        if not canonical:
+            return
+        url = (url or "").strip() if isinstance(url, str) else ""
+        with self._lock, self.conn:
+            if canonical not in self.urls or self.urls[canonical] != url and (overwrite or not self.urls[canonical]):
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO brands (canonical, url, source, updated_at) VALUES (?, ?, ?, ?)",
+                    (canonical, url, source, datetime.now().isoformat(timespec="seconds")),
+                )
+                self.urls[canonical] = url
+            for alias in [canonical, *aliases]:
+                key = normalise_brand(alias)
+                if key and self.aliases.get(key) != canonical:
+                    self.conn.execute("INSERT OR REPLACE INTO aliases (alias, canonical) VALUES (?, ?)", (key, canonical))
+                    self.aliases[key] = canonical
+
+    def import_records(self, records: Iterable[dict], brand_col: str, url_col: str,
+                       source: str = "import", overwrite: bool = True) -> int:
+        count = 0
+        for row in records:
+            brand = row.get(brand_col)
+            if brand is None or not str(brand).strip():
+                continue
+            url = row.get(url_col) or ""
+            self.add(str(brand), url, source=source, overwrite=overwrite and bool(str(url).strip()))
+            count += 1
+        return count
+
+    def import_csv(self, csv_path: str, brand_col: str = "Brand Name", url_col: str = "Brand URL",
+                   encoding: str = "utf-8-sig", overwrite: bool = True) -> int:
+        with open(csv_path, "r", encoding=encoding, newline="") as f:
+            return self.import_records(csv.DictReader(f), brand_col, url_col,
+                                       source=os.path.basename(csv_path), overwrite=overwrite)
+
+    def export_csv(self, csv_path: str, brand_col: str = "Brand Name", url_col: str = "Brand URL") -> int:
+        with open(csv_path, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow([brand_col, url_col])
+            for canonical in sorted(self.urls, key=str.lower):
+                writer.writerow([canonical, self.urls[canonical]])
+        return len(self.urls)
+
+    # --- lookups ------------------------------------------------------------------
+    def canonical(self, name, fuzzy: bool = True) -> str:
+        """Canonical brand for any spelling, or "" if unknown."""
+        key = normalise_brand(name)
+        if not key:
+            return ""
+        found = self.aliases.get(key)
+        if found is not None or not fuzzy or key in self._misses:
+            return found or ""
+        match = get_close_matches(key, list(self.aliases), n=1, cutoff=FUZZY_CUTOFF)
+        if not match:
+            self._misses.add(key)
+            return ""
+        found = self.aliases[match[0]]
+        self.add(found, aliases=[name], overwrite=False)  # remember the spelling
+        return found
+
+    def lookup(self, name, fuzzy: bool = True) -> Tuple[str, str]:
+        canonical = self.canonical(name, fuzzy=fuzzy)
+        return canonical, self.urls.get(canonical, "") if canonical else ""
+
+    def url_for(self, name, fuzzy: bool = True) -> str:
+        return self.lookup(name, fuzzy=fuzzy)[1]
+
+    def unknown(self, names: Iterable[str]) -> List[str]:
+        """Names that have no canonical brand or no URL yet (exact alias match only)."""
+        missing = {}
+        for name in names:
+            if name is None or not str(name).strip():
+                continue
+            canonical = self.canonical(name, fuzzy=False)
+            if not canonical or not self.urls.get(canonical):
+                missing.setdefault(normalise_brand(name), str(name).strip())
+        return sorted(missing.values())
+
+    # --- resolution ---------------------------------------------------------------
+    def resolve(self, names: Iterable[str], backend: SearchBackend,
+                workers: int = RESOLVE_WORKERS) -> Dict[str, str]:
+        """Look up unknown brands concurrently via `backend` and cache the results."""
+        todo = self.unknown(names)
+        if not todo:
+            return {}
+
+        def search(brand):
+            try:
+                return brand, backend(brand) or ""
+            except Exception as e:
+                print(f"❌ Search failed for {brand}: {e}")
+                return brand, ""
+
+        results = {}
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for brand, url in pool.map(search, todo):
+                canonical = self.canonical(brand, fuzzy=False) or brand
+                self.add(canonical, url, source="search", aliases=[brand], overwrite=False)
+                self._misses.discard(normalise_brand(brand))
+                results[brand] = url
+                print(f"{brand:25s} → {url}")
+        return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the local brand registry.")
+    parser.add_argument("action", choices=["import", "export"])
+    parser.add_argument("csv", help="CSV to import from / export to")
+    parser.add_argument("--brand-col", default="Brand Name")
+    parser.add_argument("--url-col", default="Brand URL")
+    parser.add_argument("--encoding", default="utf-8-sig")
+    parser.add_argument("--db", default=REGISTRY_DB)
+    args = parser.parse_args()
+
+    registry = BrandRegistry(args.db)
+    if args.action == "import":
+        count = registry.import_csv(args.csv, args.brand_col, args.url_col, args.encoding)
+        print(f"✅ Imported {count} brands from {args.csv} ({len(registry)} in registry)")
+    else:
+        count = registry.export_csv(args.csv, args.brand_col, args.url_col)
+        print(f"✅ Exported {count} brands to {args.csv}")
+    registry.close()
@@ -1,11 +1,10 @@
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-import smtplib
-from email.mime.text import MIMEText
-from datetime import datetime
-import sqlite3
+import argparse
 import os
 from dotenv import load_dotenv
+from sheets_sync import SheetSync, GspreadBackend
+from mail_dispatch import MailDispatcher
+from sent_log import DEFAULT_CAMPAIGN
+from campaign_queue import Campaign, CampaignQueue, DAILY_LIMIT, HOURLY_LIMIT
 
 # --- CONFIGURATION ---
 
@@ -14,12 +13,21 @@ load_dotenv()
 SPREADSHEET_ID = "1UWR5F3c20ZSc7kpf9eKz8OpC5bLFdoHGPwF7F0Apsm0"
 GOOGLE_KEY_FILE = os.getenv("GOOGLE_KEY_PATH")
 WORKSHEET_NAME = "BulkMail"
+CAMPAIGN = os.getenv("MAIL_CAMPAIGN", DEFAULT_CAMPAIGN)  # same list can be mailed once per campaign
 
 EMAIL_SENDER = os.getenv("EMAIL_SENDER")
 EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
-SMTP_SERVER = 'smtp.gmail.com'
-SMTP_PORT = 587
-
+SMTP_SERVER = os.getenv("SMTP_SERVER", 'smtp.gmail.com')   # e.g. 127.0.0.1 for a local aiosmtpd
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USE_TLS = os.getenv("SMTP_USE_TLS", "1") == "1"
+SMTP_WORKERS = int(os.getenv("SMTP_WORKERS", "3"))            # parallel authenticated sessions
+SMTP_PER_MINUTE = int(os.getenv("SMTP_PER_MINUTE", "60"))     # total send cap across workers
+SMTP_MESSAGES_PER_SESSION = 100                               # reconnect after this many sends
+SMTP_DAILY_LIMIT = int(os.getenv("SMTP_DAILY_LIMIT", str(DAILY_LIMIT)))    # provider quota, rolling 24 h
+SMTP_HOURLY_LIMIT = int(os.getenv("SMTP_HOURLY_LIMIT", str(HOURLY_LIMIT)))
+
+# Used when a campaign is created without --subject / --body-file.
+# $Name, $Email and any other BulkMail column can be used in both.
 EMAIL_SUBJECT = 'Your Daily Email Subject'
 EMAIL_BODY = '''
 Hello,
@@ -30,111 +38,99 @@ Regards,
 NGM Team
 '''
 
-MAX_EMAILS_PER_RUN = int(input("How many emails do you want to send this run? "))
-
 # --- SETUP GOOGLE SHEET ---
 
 def get_emails_from_sheet():
-    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-    creds = ServiceAccountCredentials.from_json_keyfile_name(GOOGLE_KEY_FILE, scope)
-    client = gspread.authorize(creds)
-    sheet = client.open_by_key(SPREADSHEET_ID).worksheet(WORKSHEET_NAME)
-    data = sheet.get_all_records()
-    
-    # Add unique IDs for each email (using index) if not already present
-    emails_with_id = []
-    for idx, row in enumerate(data):
-        if 'Email' in row:
-            emails_with_id.append({
-                'id': idx + 1,
-                'email': row['Email'].strip()
-            })
-    return emails_with_id
-
-# --- DATABASE SETUP ---
-
-def init_db():
-    conn = sqlite3.connect('sent_log.db')
-    c = conn.cursor()
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS sent_log (
-            id INTEGER PRIMARY KEY,
-            email TEXT UNIQUE,
-            date_sent TEXT
-        )
-    ''')
-    conn.commit()
-    conn.close()
-
-def was_email_sent(email):
-    conn = sqlite3.connect('sent_log.db')
-    c = conn.cursor()
-    c.execute("SELECT 1 FROM sent_log WHERE email = ?", (email,))
-    result = c.fetchone()
-    conn.close()
-    return result is not None
-
-def mark_email_sent(email):
-    conn = sqlite3.connect('sent_log.db')
-    c = conn.cursor()
-    today = datetime.today().strftime('%Y-%m-%d')
-    c.execute("INSERT OR IGNORE INTO sent_log (email, date_sent) VALUES (?, ?)", (email, today))
-    conn.commit()
-    conn.close()
+    sync = SheetSync(GspreadBackend(GOOGLE_KEY_FILE))
+    data = sync.records(SPREADSHEET_ID, WORKSHEET_NAME)
+    sync.close()
 
-# --- EMAIL SENDER ---
+    # Keep every column so it can be used as a template field
+    return [row for row in data if str(row.get('Email', '')).strip()]
 
-def send_email(to_email):
-    msg = MIMEText(EMAIL_BODY, 'plain')
-    msg['Subject'] = EMAIL_SUBJECT
-    msg['From'] = EMAIL_SENDER
-    msg['To'] = to_email
-    msg['Reply-To'] = EMAIL_SENDER  # Helps avoid spam
-    msg['Return-Path'] = EMAIL_SENDER
-    msg.add_header('X-Mailer', 'Python')
+# --- EMAIL SENDER ---
 
-    try:
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.login(EMAIL_SENDER, EMAIL_PASSWORD)
-            server.send_message(msg)
-            print(f"✅ Sent to {to_email}")
-            return True
-    except Exception as e:
-        print(f"❌ Failed to send to {to_email}: {e}")
-        return False
+def get_dispatcher():
+    return MailDispatcher(
+        SMTP_SERVER, SMTP_PORT, EMAIL_SENDER, EMAIL_PASSWORD,
+        workers=SMTP_WORKERS,
+        per_minute=SMTP_PER_MINUTE,
+        messages_per_session=SMTP_MESSAGES_PER_SESSION,
+        use_tls=SMTP_USE_TLS,
+    )
+
+def on_send_result(result):
+    if result.ok:
+        print(f"✅ Sent to {result.recipient}")
+    elif result.transient:
+        print(f"🔁 Will retry {result.recipient}: {result.error}")
+    else:
+        print(f"❌ Failed to send to {result.recipient}: {result.error}")
+
+def ensure_campaign(queue, args):
+    campaign = queue.campaign(args.campaign)
+    if campaign is None or args.subject or args.body_file:
+        body = EMAIL_BODY
+        if args.body_file:
+            with open(args.body_file, 'r', encoding='utf-8') as f:
+                body = f.read()
+        elif campaign:
+            body = campaign.body
+        campaign = Campaign(
+            name=args.campaign,
+            subject=args.subject or (campaign.subject if campaign else EMAIL_SUBJECT),
+            body=body,
+            sender=EMAIL_SENDER or '',
+            daily_limit=SMTP_DAILY_LIMIT,
+            hourly_limit=SMTP_HOURLY_LIMIT,
+        )
+        queue.define(campaign)
+        print(f"📝 Campaign '{campaign.name}' saved")
+    return campaign
 
 # --- BULK MAILER MAIN ---
 
-def run_bulk_mailer():
-    init_db()
-    emails = get_emails_from_sheet()
-
-    print("📄 Emails read from Google Sheet:")
-    for e in emails:
-        print(f" - {e['email']}")
-
-    unsent_emails = [e for e in emails if not was_email_sent(e['email'])]
+def parse_args():
+    parser = argparse.ArgumentParser(description="Queue the BulkMail sheet for a campaign and send it within quota.")
+    parser.add_argument('--campaign', default=CAMPAIGN)
+    parser.add_argument('--subject', help="Set/replace the campaign subject (template)")
+    parser.add_argument('--body-file', help="Set/replace the campaign body from a text file (template)")
+    parser.add_argument('--limit', type=int, help="Send at most this many emails this run")
+    parser.add_argument('--no-enqueue', action='store_true', help="Don't read the sheet, only drain the queue")
+    parser.add_argument('--enqueue-only', action='store_true', help="Queue the sheet but send nothing")
+    parser.add_argument('--daemon', action='store_true', help="Keep running, sending as quota and retries allow")
+    parser.add_argument('--status', action='store_true', help="Show queue counts and exit")
+    return parser.parse_args()
+
+def run_bulk_mailer(args):
+    queue = CampaignQueue()
+    try:
+        if args.status:
+            print(f"📦 {args.campaign}: {queue.counts(args.campaign)}")
+            return
 
-    print("\n📬 Emails not yet sent:")
-    if unsent_emails:
-        for e in unsent_emails:
-            print(f" - {e['email']}")
-    else:
-        print(" - None")
+        ensure_campaign(queue, args)
 
-    if not unsent_emails:
-        print("\n✅ All emails have already been sent.")
-        return
+        if not args.no_enqueue:
+            recipients = get_emails_from_sheet()
+            added = queue.enqueue(args.campaign, recipients)
+            print(f"📄 {len(recipients)} rows in Google Sheet, {added} newly queued")
 
-    print(f"\n🚀 Sending to first {min(len(unsent_emails), MAX_EMAILS_PER_RUN)} emails...\n")
+        if args.enqueue_only:
+            return
 
-    to_send = unsent_emails[:MAX_EMAILS_PER_RUN]
+        counts = queue.counts(args.campaign)
+        print(f"📬 Pending: {counts.get('pending', 0)}, sent so far: {counts.get('sent', 0)}")
+        if not counts.get('pending') and not args.daemon:
+            print("\n✅ All emails have already been sent.")
+            return
 
-    for record in to_send:
-        if send_email(record['email']):
-            mark_email_sent(record['email'])
+        sent = queue.drain(args.campaign, get_dispatcher(), limit=args.limit,
+                           daemon=args.daemon, on_result=on_send_result)
+        print(f"\n🏁 {sent} emails sent this run — {queue.counts(args.campaign)}")
+    finally:
+        queue.close()
 
 
 if __name__ == "__main__":
-    run_bulk_mailer()
+    run_bulk_mailer(parse_args())
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+campaign_queue.py  ───────────────────────────────────────────────────────────────
+Persistent, resumable send queue for bulk mail campaigns (in `sent_log.db`).
+
+1. A campaign stores its subject and a `string.Template` body plus the provider
+   quota it must respect (`daily_limit` / `hourly_limit`, rolling windows).
+2. `enqueue()` adds recipients with their sheet columns as template fields
+   ($Name, $Email, …); addresses already in the delivery ledger are skipped.
+3. `drain()` claims due rows, sends them through `MailDispatcher` and records
+   every outcome as it arrives. Transient failures (4xx, dropped connections)
+   are retried with exponential backoff; permanent ones are marked `failed`.
+4. Claimed rows are marked `sending` with a lease (`claimed_at`). Rows whose
+   lease ran out – their run crashed – are claimed again by the next drain, so
+   the queue resumes where it stopped (at most one message per worker can be
+   sent twice). Rows of a live run are never touched, so `status` or a second
+   process can run next to a draining daemon.
+
+Run:
+    python campaign_queue.py status [campaign]
+    python campaign_queue.py retry-failed <campaign>
+"""
+
+import argparse
+import json
+import random
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from email.mime.text import MIMEText
+from string import Template
+from typing import Dict, Iterable, List, Optional
+
+from mail_dispatch import MailDispatcher, SendResult
+from sent_log import SENT_LOG_DB, SentLog, normalise_email
+
+# ------------------------------ CONFIG --------------------------------------- #
+DAILY_LIMIT = 500         # Gmail allows ~500 recipients per rolling 24 h
+HOURLY_LIMIT = 100
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 60         # seconds; doubled per attempt (+ jitter)
+BACKOFF_MAX = 6 * 3600
+BATCH_SIZE = 50           # rows claimed per dispatcher run
+POLL_INTERVAL = 30        # daemon sleep when nothing is due
+LEASE_SECONDS = 3600      # a claimed batch must be sent within this; after it the rows are reclaimed
+# ----------------------------------------------------------------------------- #
+
+PENDING, SENDING, SENT, FAILED = "pending", "sending", "sent", "failed"
+
+
+@dataclass
+class Campaign:
+    name: str
+    subject: str
+    body: str
+    sender: str = ""
+    daily_limit: int = DAILY_LIMIT
+    hourly_limit: int = HOURLY_LIMIT
+
+    def render(self, fields: Dict[str, str]) -> MIMEText:
+        body = Template(self.body).safe_substitute(fields)
+        subject = Template(self.subject).safe_substitute(fields)
+        msg = MIMEText(body, "plain")
+        msg["Subject"] = subject
+        msg["From"] = self.sender
+        msg["To"] = fields["Email"]
+        msg["Reply-To"] = self.sender  # Helps avoid spam
+        msg["Return-Path"] = self.sender
+        msg.add_header("X-Mailer", "Python")
+        return msg
+
+
+def backoff_delay(attempts: int) -> float:
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** max(0, attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+class CampaignQueue:
+    def __init__(self, path: str = SENT_LOG_DB, sent_log: Optional[SentLog] = None):
+        self.sent_log = sent_log or SentLog(path)
+        self._own_log = sent_log is None
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS campaigns (
+                name TEXT PRIMARY KEY,
+                subject TEXT NOT NULL,
+                body TEXT NOT NULL,
+                sender TEXT,
+                daily_limit INTEGER,
+                hourly_limit INTEGER,
+                created_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS queue (
+                id INTEGER PRIMARY KEY,
+                campaign TEXT NOT NULL,
+                email TEXT NOT NULL,
+                fields TEXT,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL DEFAULT 0,
+                sent_at REAL,
+                last_error TEXT,
+                claimed_at REAL,
+                UNIQUE (campaign, email)
+            );
+            CREATE INDEX IF NOT EXISTS queue_due ON queue (status, next_attempt_at);
+            CREATE INDEX IF NOT EXISTS queue_sent_at ON queue (sent_at);
+            """
+        )
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(queue)")}
+        if "claimed_at" not in columns:  # queues created before leases
+            self.conn.execute("ALTER TABLE queue ADD COLUMN claimed_at REAL")
+
+    def close(self):
+        self.conn.close()
+        if self._own_log:
+            self.sent_log.close()
+
+    # --- campaigns ----------------------------------------------------------------
+    def define(self, campaign: Campaign):
+        with self._lock, self.conn:
+            self.conn.execute(
+                """
+                INSERT INTO campaigns (name, subject, body, sender, daily_limit, hourly_limit, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (name) DO UPDATE SET subject = excluded.subject, body = excluded.body,
+                    sender = excluded.sender, daily_limit = excluded.daily_limit,
+                    hourly_limit = excluded.hourly_limit
+                """,
+                (campaign.name, campaign.subject, campaign.body, campaign.sender,
+                 campaign.daily_limit, campaign.hourly_limit, time.time()),
+            )
+
+    def campaign(self, name: str) -> Optional[Campaign]:
+        row = self.conn.execute(
+            "SELECT name, subject, body, sender, daily_limit, hourly_limit FROM campaigns WHERE name = ?", (name,)
+        ).fetchone()
+        return Campaign(*row) if row else None
+
+    # --- queue --------------------------------------------------------------------
+    def recover(self, lease: float = LEASE_SECONDS) -> int:
+        """Put rows whose lease expired (left in `sending` by a crashed run) back in the queue."""
+        with self._lock, self.conn:
+            return self._reclaim(lease)
+
+    def _reclaim(self, lease: float) -> int:
+        return self.conn.execute(
+            "UPDATE queue SET status = ?, claimed_at = NULL WHERE status = ? AND "
+            "(claimed_at IS NULL OR claimed_at < ?)",
+            (PENDING, SENDING, time.time() - lease),
+        ).rowcount
+
+    def enqueue(self, campaign: str, recipients: Iterable[Dict[str, str]],
+                send_after: float = 0) -> int:
+        """Queue recipients (dicts with at least `Email`); returns how many were new."""
+        by_email = {}
+        for row in recipients:
+            email = normalise_email(row.get("Email"))
+            if email and email not in by_email:
+                by_email[email] = {k: str(v) for k, v in row.items()}
+        fresh = self.sent_log.unsent(by_email, campaign)
+        with self._lock, self.conn:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO queue (campaign, email, fields, next_attempt_at) VALUES (?, ?, ?, ?)",
+                ((campaign, email, json.dumps(by_email[email], ensure_ascii=False), send_after)
+                 for email in fresh),
+            )
+            return self.conn.total_changes - before
+
+    def retry_failed(self, campaign: str) -> int:
+        with self._lock, self.conn:
+            return self.conn.execute(
+                "UPDATE queue SET status = ?, attempts = 0, next_attempt_at = 0 WHERE campaign = ? AND status = ?",
+                (PENDING, campaign, FAILED),
+            ).rowcount
+
+    def counts(self, campaign: Optional[str] = None) -> Dict[str, int]:
+        sql = "SELECT status, COUNT(*) FROM queue"
+        params = ()
+        if campaign:
+            sql += " WHERE campaign = ?"
+            params = (campaign,)
+        return dict(self.conn.execute(sql + " GROUP BY status", params))
+
+    def sent_since(self, since: float) -> int:
+        """Messages sent from this account (any campaign) after `since`."""
+        return self.conn.execute("SELECT COUNT(*) FROM queue WHERE sent_at >= ?", (since,)).fetchone()[0]
+
+    def allowance(self, campaign: Campaign, now: Optional[float] = None) -> int:
+        """How many more messages the daily/hourly windows allow right now."""
+        now = now or time.time()
+        left = []
+        if campaign.daily_limit and campaign.daily_limit > 0:
+            left.append(campaign.daily_limit - self.sent_since(now - 86400))
+        if campaign.hourly_limit and campaign.hourly_limit > 0:
+            left.append(campaign.hourly_limit - self.sent_since(now - 3600))
+        return max(0, min(left)) if left else BATCH_SIZE
+
+    def quota_frees_at(self, campaign: Campaign, now: Optional[float] = None) -> float:
+        """Earliest time a slot opens again in an exhausted window."""
+        now = now or time.time()
+        waits = []
+        for limit, window in ((campaign.daily_limit, 86400), (campaign.hourly_limit, 3600)):
+            if not limit or limit <= 0:
+                continue
+            row = self.conn.execute(
+                "SELECT sent_at FROM queue WHERE sent_at >= ? ORDER BY sent_at DESC LIMIT 1 OFFSET ?",
+                (now - window, limit - 1),
+            ).fetchone()
+            if row:
+                waits.append(row[0] + window)
+        return max(waits) if waits else now
+
+    def next_due_at(self, campaign: str) -> Optional[float]:
+        return self.conn.execute(
+            "SELECT MIN(next_attempt_at) FROM queue WHERE campaign = ? AND status = ?", (campaign, PENDING)
+        ).fetchone()[0]
+
+    def claim(self, campaign: str, limit: int, lease: float = LEASE_SECONDS) -> List[tuple]:
+        """Lease up to `limit` due rows (`sending`) and return (id, email, fields).
+
+        Expired leases are reclaimed first. The write lock is taken up front so
+        two processes draining the same queue cannot claim the same rows.
+        """
+        with self._lock, self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self._reclaim(lease)
+            rows = self.conn.execute(
+                """
+                SELECT id, email, fields FROM queue
+                WHERE campaign = ? AND status = ? AND next_attempt_at <= ?
+                ORDER BY next_attempt_at, id LIMIT ?
+                """,
+                (campaign, PENDING, time.time(), limit),
+            ).fetchall()
+            now = time.time()
+            self.conn.executemany("UPDATE queue SET status = ?, claimed_at = ? WHERE id = ?",
+                                  ((SENDING, now, r[0]) for r in rows))
+        return [(row_id, email, json.loads(fields or "{}")) for row_id, email, fields in rows]
+
+    def complete(self, row_id: int, campaign: str, result: SendResult):
+        with self._lock, self.conn:
+            if result.ok:
+                self.conn.execute(
+                    "UPDATE queue SET status = ?, sent_at = ?, attempts = attempts + 1, last_error = NULL, "
+                    "claimed_at = NULL WHERE id = ?",
+                    (SENT, time.time(), row_id),
+                )
+            else:
+                attempts = self.conn.execute("SELECT attempts FROM queue WHERE id = ?", (row_id,)).fetchone()[0] + 1
+                retry = result.transient and attempts < MAX_ATTEMPTS
+                self.conn.execute(
+                    "UPDATE queue SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?, "
+                    "claimed_at = NULL WHERE id = ?",
+                    (PENDING if retry else FAILED, attempts,
+                     time.time() + backoff_delay(attempts) if retry else 0, result.error, row_id),
+                )
+        if result.ok:
+            self.sent_log.record(result.recipient, campaign)
+
+    # --- worker -------------------------------------------------------------------
+    def drain(self, name: str, dispatcher: MailDispatcher, limit: Optional[int] = None,
+              daemon: bool = False, poll: float = POLL_INTERVAL, on_result=None) -> int:
+        """Send due messages within quota; returns how many were sent.
+
+        Without `daemon` it stops when nothing is due or the quota is used up;
+        with it, it sleeps until the next retry or quota slot and carries on.
+        """
+        campaign = self.campaign(name)
+        if campaign is None:
+            raise KeyError(f"Unknown campaign: {name}")
+        sent = 0
+        while limit is None or sent < limit:
+            room = self.allowance(campaign)
+            if room <= 0:
+                if not daemon:
+                    print("⏸️ Provider quota reached — run again later or use --daemon.")
+                    break
+                wait = max(poll, self.quota_frees_at(campaign) - time.time())
+                print(f"⏸️ Quota reached, sleeping {wait:.0f}s")
+                time.sleep(wait)
+                continue
+
+            batch = min(room, BATCH_SIZE, limit - sent if limit is not None else BATCH_SIZE)
+            rows = self.claim(name, batch)
+            if not rows:
+                due = self.next_due_at(name)
+                if not daemon:
+                    if due is not None:
+                        print(f"⏳ {self.counts(name).get(PENDING, 0)} messages waiting for retry")
+                    break
+                time.sleep(min(poll, max(1.0, (due or 0) - time.time())) if due else poll)
+                continue
+
+            ids = {}
+            messages = []
+            for row_id, email, fields in rows:
+                fields["Email"] = email
+                ids[email] = row_id
+                messages.append(campaign.render(fields))
+
+            def record(result: SendResult):
+                nonlocal sent
+                self.complete(ids[normalise_email(result.recipient)], name, result)
+                sent += result.ok
+                if on_result:
+                    on_result(result)
+
+            try:
+                dispatcher.send_all(messages, on_result=record)
+            finally:
+                self.sent_log.flush()
+        return sent
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect the mail campaign queue.")
+    parser.add_argument("action", choices=["status", "retry-failed"])
+    parser.add_argument("campaign", nargs="?")
+    parser.add_argument("--db", default=SENT_LOG_DB)
+    args = parser.parse_args()
+
+    q = CampaignQueue(args.db)
+    if args.action == "retry-failed":
+        if not args.campaign:
+            parser.error("retry-failed needs a campaign")
+        print(f"🔁 {q.retry_failed(args.campaign)} failed messages re-queued")
+    else:
+        names = [args.campaign] if args.campaign else [r[0] for r in q.conn.execute("SELECT name FROM campaigns")]
+        for name in names:
+            counts = q.counts(name)
+            print(f"📦 {name}: " + ", ".join(f"{k}={counts.get(k, 0)}" for k in (PENDING, SENDING, SENT, FAILED)))
+    q.close()
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+content_metrics.py  ──────────────────────────────────────────────────────────────
+Fast content metrics for generated articles and enhanced product HTML.
+
+1. Streams each document through `html.parser.HTMLParser` (no DOM) collecting
+   visible text, headings, paragraphs and links.
+2. Computes word count, focus‑keyword density, heading structure, internal /
+   external link counts and a Polish readability index (FOG‑PL: Gunning fog
+   with "hard" words = 4+ syllables).
+3. Scans documents across cores with a process pool; results are cached by
+   content hash in `.content_metrics_cache.json`, so unchanged documents are
+   never re‑parsed.
+
+Run:
+    python content_metrics.py Blog/generated_articles
+    python content_metrics.py Existing_Products/export_for_reference_enhanced.csv --column "Enhanced Long Description" --csv metrics.csv
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+# ------------------------------ CONFIG --------------------------------------- #
+CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".content_metrics_cache.json")
+SITE_HOST = "noguiltmeal.pl"
+PRODUCT_COLUMN = "Enhanced Long Description"
+KEYWORD_COLUMN = "Meta: rank_math_focus_keyword"
+PARALLEL_THRESHOLD = 64      # fewer uncached documents than this are scanned inline
+METRICS_VERSION = 1          # bump when the metric definitions change (invalidates cache)
+# ----------------------------------------------------------------------------- #
+
+SKIP_TAGS = {"script", "style", "noscript", "template"}
+BLOCK_TAGS = {"p", "div", "li", "td", "th", "tr", "br", "h1", "h2", "h3", "h4", "h5", "h6", "section", "article", "table"}
+HEADINGS = {"h1": 1, "h2": 2, "h3": 3, "h4": 4, "h5": 5, "h6": 6}
+WORD_RE = re.compile(r"[^\W\d_]+(?:[-'][^\W\d_]+)*|\d+(?:[.,]\d+)?", re.UNICODE)
+SENTENCE_END = re.compile(r"[.!?…]+(?=\s|$)")
+VOWEL_GROUPS = re.compile(r"[aąeęioóuy]+", re.I)
+
+METRIC_COLUMNS = [
+    "words", "sentences", "paragraphs", "h1", "h2", "h3", "heading_skips",
+    "links_internal", "links_external", "images", "keyword", "keyword_count",
+    "keyword_density", "keyword_in_first_paragraph", "fog_pl",
+]
+
+
+class _Tokenizer(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.chunks: List[str] = []
+        self.headings: List[Tuple[int, str]] = []
+        self.paragraphs: List[str] = []
+        self.links: List[str] = []
+        self.images = 0
+        self._skip = 0
+        self._heading: Optional[int] = None
+        self._heading_text: List[str] = []
+        self._para: Optional[List[str]] = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip += 1
+        elif tag in HEADINGS:
+            self._heading, self._heading_text = HEADINGS[tag], []
+        elif tag == "p":
+            self._para = []
+        elif tag == "a":
+            self.links.append(dict(attrs).get("href") or "")
+        elif tag == "img":
+            self.images += 1
+        if tag in BLOCK_TAGS:
+            self.chunks.append("\n")
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag in SKIP_TAGS:
+            self._skip -= 1
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self._skip = max(0, self._skip - 1)
+        elif tag in HEADINGS and self._heading is not None:
+            self.headings.append((self._heading, " ".join("".join(self._heading_text).split())))
+            self._heading = None
+        elif tag == "p" and self._para is not None:
+            text = " ".join("".join(self._para).split())
+            if text:
+                self.paragraphs.append(text)
+            self._para = None
+        if tag in BLOCK_TAGS:
+            self.chunks.append("\n")
+
+    def handle_data(self, data):
+        if self._skip:
+            return
+        self.chunks.append(data)
+        if self._heading is not None:
+            self._heading_text.append(data)
+        if self._para is not None:
+            self._para.append(data)
+
+
+def visible_text(html: str) -> str:
+    parser = _Tokenizer()
+    parser.feed(html or "")
+    parser.close()
+    return "".join(parser.chunks)
+
+
+def word_count(html: str) -> int:
+    return len(WORD_RE.findall(visible_text(html)))
+
+
+def syllables(word: str) -> int:
+    return max(1, len(VOWEL_GROUPS.findall(word)))
+
+
+def _phrase_count(tokens: List[str], phrase: List[str]) -> int:
+    if not phrase:
+        return 0
+    return f" {' '.join(tokens)} ".count(f" {' '.join(phrase)} ")
+
+
+def analyse(html: str, keyword: Optional[str] = None) -> Dict[str, object]:
+    """All metrics for one HTML document (and its focus keyword, if any)."""
+    parser = _Tokenizer()
+    parser.feed(html or "")
+    parser.close()
+    text = "".join(parser.chunks)
+    words = WORD_RE.findall(text)
+    lowered = [w.lower() for w in words]
+    sentences = max(1, sum(len(SENTENCE_END.findall(block)) or 1 for block in text.split("\n") if block.strip())) \
+        if words else 0
+
+    counts = Counter(lowered)  # syllables once per distinct word
+    hard = sum(n for w, n in counts.items() if len(w) >= 4 and syllables(w) >= 4)
+    fog = 0.4 * (len(words) / sentences + 100 * hard / len(words)) if words else 0.0
+
+    levels = [level for level, _ in parser.headings]
+    skips = sum(1 for prev, cur in zip(levels, levels[1:]) if cur > prev + 1)
+
+    internal = external = 0
+    for href in parser.links:
+        if not href or href.startswith(("#", "mailto:", "tel:", "javascript:")):
+            continue
+        host = urlparse(href).netloc.lower()
+        if not host or host == SITE_HOST or host.endswith("." + SITE_HOST):
+            internal += 1
+        else:
+            external += 1
+
+    keyword = (keyword or "").strip()
+    phrase = [w.lower() for w in WORD_RE.findall(keyword)]
+    kw_count = _phrase_count(lowered, phrase)
+    first_para = parser.paragraphs[0].lower() if parser.paragraphs else ""
+    return {
+        "words": len(words),
+        "sentences": sentences,
+        "paragraphs": len(parser.paragraphs),
+        "h1": levels.count(1),
+        "h2": levels.count(2),
+        "h3": levels.count(3),
+        "heading_skips": skips,
+        "links_internal": internal,
+        "links_external": external,
+        "images": parser.images,
+        "keyword": keyword,
+        "keyword_count": kw_count,
+        "keyword_density": round(100.0 * kw_count * len(phrase) / len(words), 2) if words and phrase else 0.0,
+        "keyword_in_first_paragraph": bool(phrase) and _phrase_count(
+            [w.lower() for w in WORD_RE.findall(first_para)], phrase) > 0,
+        "fog_pl": round(fog, 1),
+    }
+
+
+def _analyse_job(job):
+    key, html, keyword = job
+    return key, analyse(html, keyword)
+
+
+def content_key(html: str, keyword: Optional[str]) -> str:
+    data = f"{METRICS_VERSION}\0{keyword or ''}\0{html or ''}".encode("utf-8")
+    return hashlib.sha1(data).hexdigest()
+
+
+class MetricsCache:
+    def __init__(self, path: str = CACHE_FILE):
+        self.path = path
+        self.data: Dict[str, dict] = {}
+        self.dirty = False
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.data = json.load(f)
+            except (OSError, ValueError):
+                self.data = {}
+
+    def save(self):
+        if not self.dirty:
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+        self.dirty = False
+
+
+def scan(documents: Iterable[Tuple[str, str, Optional[str]]], workers: Optional[int] = None,
+         cache: Optional[MetricsCache] = None) -> List[Dict[str, object]]:
+    """Metrics for (name, html, keyword) documents, in input order; uncached ones in parallel."""
+    cache = cache if cache is not None else MetricsCache()
+    names, keys, todo = [], [], {}
+    for name, html, keyword in documents:
+        key = content_key(html, keyword)
+        names.append(name)
+        keys.append(key)
+        if key not in cache.data and key not in todo:
+            todo[key] = (key, html, keyword)
+
+    if todo:
+        jobs = list(todo.values())
+        if len(jobs) < PARALLEL_THRESHOLD or workers == 1:
+            results = list(map(_analyse_job, jobs))
+        else:
+            chunksize = max(1, len(jobs) // ((workers or os.cpu_count() or 1) * 4))
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_analyse_job, jobs, chunksize=chunksize))
+        cache.data.update(results)
+        cache.dirty = True
+        cache.save()
+
+    return [{"name": name, **cache.data[key]} for name, key in zip(names, keys)]
+
+
+# --- sources ----------------------------------------------------------------------
+def iter_directory(path: str, keyword: Optional[str] = None):
+    for filename in sorted(os.listdir(path)):
+        if filename.endswith(".html"):
+            with open(os.path.join(path, filename), "r", encoding="utf-8") as f:
+                yield filename, f.read(), keyword
+
+
+def iter_export(csv_path: str, column: str = PRODUCT_COLUMN, keyword_column: str = KEYWORD_COLUMN):
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "Existing_Products"))
+    from export_reader import iter_export_chunks, read_header
+
+    header = read_header(csv_path)
+    columns = [c for c in ("ID", "Name", column, keyword_column) if c in header]
+    for chunk in iter_export_chunks(csv_path, columns=columns):
+        chunk = chunk.astype(object).where(chunk.notna(), None)
+        for row in chunk.to_dict("records"):
+            html = row.get(column)
+            if not html or not str(html).strip():
+                continue
+            keyword = row.get(keyword_column)
+            keyword = str(keyword).split(",")[0] if keyword else None
+            yield f"{row.get('ID')} {row.get('Name') or ''}", str(html), keyword
+
+
+def print_table(rows: List[Dict[str, object]], limit: Optional[int] = None):
+    print(f"{'document':50s} {'words':>6s} {'h2':>3s} {'links':>5s} {'kw%':>5s} {'fog':>5s}")
+    for r in rows[:limit] if limit else rows:
+        links = f"{r['links_internal']}/{r['links_external']}"
+        print(f"{str(r['name'])[:50]:50s} {r['words']:6d} {r['h2']:3d} {links:>5s} "
+              f"{r['keyword_density']:5.2f} {r['fog_pl']:5.1f}")
+
+
+def write_csv(rows: List[Dict[str, object]], path: str):
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["name"] + METRIC_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Word count, keyword density, headings, links and readability.")
+    parser.add_argument("source", help="Directory of .html files or an export CSV")
+    parser.add_argument("--column", default=PRODUCT_COLUMN, help="HTML column when scanning a CSV")
+    parser.add_argument("--keyword", help="Focus keyword for every document in a directory")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--csv", help="Also write the metrics to this CSV")
+    parser.add_argument("--sort", default=None, choices=METRIC_COLUMNS, help="Sort table by this metric")
+    args = parser.parse_args()
+
+    if os.path.isdir(args.source):
+        docs = iter_directory(args.source, args.keyword)
+    else:
+        docs = iter_export(args.source, args.column)
+    rows = scan(docs, workers=args.workers)
+    if args.sort:
+        rows.sort(key=lambda r: r[args.sort])
+    print_table(rows)
+    print(f"📦 {len(rows)} documents")
+    if args.csv:
+        write_csv(rows, args.csv)
+        print(f"✅ Saved {args.csv}")
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+crawl_archive.py  ────────────────────────────────────────────────────────────────
+Record a crawl once, re‑extract it offline as often as needed.
+
+1. Capture: `RecordingDriver` wraps the Selenium driver of a scraper (`--record`)
+   and saves every visited page as it was when the scraper left it – rendered
+   HTML after JavaScript and after the tab clicks (GuiltFree's nutrition tab,
+   Świat Supli's product details). `ArchiveAdapter` does the same for
+   `requests` sessions (`price_watch.py poll --record`).
+2. Storage: one gzip‑compressed JSONL file per run under `crawls/`, a WARC‑like
+   sequence of records: `meta` (what was crawled), `page` (requested URL, final
+   URL, HTML) and `http` (status, headers, body). Records are flushed one by one,
+   so an interrupted crawl is still readable up to its last page.
+3. Replay: `OfflineDriver.from_archive()` serves the pages to `fetch_product_data()`,
+   `ReplayAdapter` answers `requests` calls from the archive – no network.
+4. Re‑extraction: the `reextract` command walks a scraper archive in crawl order
+   (category page → its products) and rebuilds the scraper's CSV, e.g. after a
+   change to `extract_dieta_attribute`, in seconds.
+
+Run:
+    python scraper_guiltfree.py --record --headless
+    python crawl_archive.py list
+    python crawl_archive.py reextract crawls/guiltfree-20260101-120000.jsonl.gz
+"""
+
+import argparse
+import base64
+import csv
+import gzip
+import importlib
+import inspect
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+# ------------------------------ CONFIG --------------------------------------- #
+CRAWL_DIR = "crawls"
+ARCHIVE_SUFFIX = ".jsonl.gz"
+TEXT_TYPES = ("text/", "application/json", "application/ld+json", "application/xml", "application/xhtml")
+# ----------------------------------------------------------------------------- #
+
+
+def new_archive_path(source: str, folder: str = CRAWL_DIR) -> str:
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, f"{source}-{datetime.now():%Y%m%d-%H%M%S}{ARCHIVE_SUFFIX}")
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+# === ARCHIVE FILE ===
+class CrawlArchive:
+    """Append‑only gzip JSONL writer, safe to share between threads."""
+
+    def __init__(self, path: str, source: str = ""):
+        self.path = path
+        self.records = 0
+        self._lock = threading.Lock()
+        self._file = gzip.open(path, "at", encoding="utf-8", compresslevel=6)
+        self.write({"type": "meta", "source": source, "started": _now()})
+
+    def write(self, record: dict):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line)
+            self._file.flush()  # sync‑flushes the deflate stream: readable even if the crawl dies
+            self.records += 1
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_records(path: str, kind: Optional[str] = None) -> Iterator[dict]:
+    """Records in crawl order; stops quietly at the cut‑off end of an interrupted archive."""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        try:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:  # half‑written last line
+                    break
+                if kind is None or record.get("type") == kind:
+                    yield record
+        except (EOFError, gzip.BadGzipFile):
+            return
+
+
+def archive_source(path: str) -> str:
+    meta = next(iter_records(path, "meta"), {})
+    return meta.get("source") or os.path.basename(path).split("-")[0]
+
+
+# === SELENIUM CAPTURE ===
+class RecordingDriver:
+    """Selenium driver proxy that archives each page when the scraper navigates away (or quits).
+
+    Snapshotting on leave instead of on load means the saved DOM includes whatever
+    the scraper clicked open and waited for while it was on the page.
+    """
+
+    def __init__(self, driver, archive: CrawlArchive):
+        self._driver = driver
+        self._archive = archive
+        self._requested: Optional[str] = None
+
+    def __getattr__(self, name):
+        return getattr(self._driver, name)
+
+    def snapshot(self, state: str = "final"):
+        if self._requested is None:
+            return
+        try:
+            html, url, title = self._driver.page_source, self._driver.current_url, self._driver.title
+        except Exception as e:  # a crashed tab should not take the crawl down
+            print(f"⚠️ Could not archive {self._requested}: {type(e).__name__}")
+            return
+        self._archive.write({"type": "page", "requested_url": self._requested, "url": url, "title": title,
+                             "state": state, "captured_at": _now(), "html": html})
+
+    def get(self, url: str):
+        self.snapshot()
+        self._requested = url
+        self._driver.get(url)
+
+    def quit(self):
+        self.snapshot()
+        self._requested = None
+        self._archive.close()
+        print(f"🗄️ {self._archive.records - 1} pages archived → {self._archive.path}")
+        self._driver.quit()
+
+
+# === REQUESTS CAPTURE / REPLAY ===
+def _adapters():
+    from requests.adapters import BaseAdapter, HTTPAdapter
+
+    class ArchiveAdapter(HTTPAdapter):
+        """Real HTTP, plus every response written to the archive."""
+
+        def __init__(self, archive: CrawlArchive, **kwargs):
+            super().__init__(**kwargs)
+            self.archive = archive
+
+        def send(self, request, **kwargs):
+            response = super().send(request, **kwargs)
+            content_type = response.headers.get("Content-Type", "")
+            body, encoding = response.content, "text"
+            if content_type.startswith(TEXT_TYPES):
+                text = body.decode(response.encoding or "utf-8", errors="replace")
+            else:
+                text, encoding = base64.b64encode(body).decode("ascii"), "base64"
+            self.archive.write({"type": "http", "method": request.method, "requested_url": request.url,
+                                "url": response.url, "status": response.status_code,
+                                "headers": dict(response.headers), "encoding": encoding, "body": text,
+                                "captured_at": _now()})
+            return response
+
+    class ReplayAdapter(BaseAdapter):
+        """Answers from an archive; URLs that were never recorded get a 404."""
+
+        def __init__(self, path: str):
+            super().__init__()
+            self.responses: Dict[tuple, dict] = {}
+            for record in iter_records(path, "http"):
+                self.responses[(record["method"], record["requested_url"])] = record  # last one wins
+
+        def send(self, request, **kwargs):
+            import requests
+            from requests.structures import CaseInsensitiveDict
+
+            record = self.responses.get((request.method, request.url))
+            response = requests.Response()
+            response.request, response.url = request, request.url
+            if record is None:
+                response.status_code, response._content = 404, b""
+                response.reason = "Not in archive"
+                return response
+            headers = CaseInsensitiveDict(record["headers"])
+            headers.pop("Content-Encoding", None)  # the body is stored decoded
+            headers.pop("Transfer-Encoding", None)
+            response.status_code, response.headers, response.url = record["status"], headers, record["url"]
+            if record["encoding"] == "base64":
+                response._content = base64.b64decode(record["body"])
+            else:
+                response.encoding = "utf-8"
+                response._content = record["body"].encode("utf-8")
+            return response
+
+        def close(self):
+            pass
+
+    return ArchiveAdapter, ReplayAdapter
+
+
+def archive_adapter(archive: CrawlArchive, **kwargs):
+    """`session.mount("https://", archive_adapter(archive))` records everything the session fetches."""
+    return _adapters()[0](archive, **kwargs)
+
+
+def replay_adapter(path: str):
+    """`session.mount("https://", replay_adapter(path))` serves the session from an archive."""
+    return _adapters()[1](path)
+
+
+# === RE‑EXTRACTION ===
+def reextract(path: str, shop: Optional[str] = None) -> List[dict]:
+    """Run `scraper_<shop>.fetch_product_data()` over every archived product page, in crawl order."""
+    from offline_driver import OfflineDriver, replaying
+
+    shop = shop or archive_source(path)
+    scraper = importlib.import_module(f"scraper_{shop}")
+    categories = {url: scraper.CATEGORY_NAMES.get(url, "") for url in scraper.CATEGORY_URLS}
+    takes_category = "category_name" in inspect.signature(scraper.fetch_product_data).parameters
+
+    # (category, product URL) → last visit, so a retried page counts once
+    visits: Dict[tuple, dict] = {}
+    category = ""
+    for record in iter_records(path, "page"):
+        if record["requested_url"] in categories:
+            category = categories[record["requested_url"]]
+        else:
+            visits[(category, record["requested_url"])] = record
+
+    driver = OfflineDriver()
+    results = []
+    with replaying(scraper):  # no politeness pauses, no waiting for elements that cannot appear
+        for (category, url), record in visits.items():
+            driver.pages[url] = record["html"]
+            driver.redirects[url] = record["url"]
+            driver.get(url)
+            data = scraper.fetch_product_data(driver, category) if takes_category else scraper.fetch_product_data(driver)
+            if data:
+                data["Categories"] = scraper.CATEGORY_STRUCTURE.get(category, category)
+                results.append(data)
+    return results
+
+
+def list_archives(folder: str = CRAWL_DIR) -> List[dict]:
+    out = []
+    for name in sorted(os.listdir(folder)) if os.path.isdir(folder) else []:
+        if name.endswith(ARCHIVE_SUFFIX):
+            path = os.path.join(folder, name)
+            counts = {"page": 0, "http": 0}
+            for record in iter_records(path):
+                if record.get("type") in counts:
+                    counts[record["type"]] += 1
+            out.append({"path": path, "source": archive_source(path), "size": os.path.getsize(path), **counts})
+    return out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect crawl archives and re-extract products offline.")
+    parser.add_argument("action", choices=["list", "reextract"])
+    parser.add_argument("archive", nargs="?", help="reextract: archive file")
+    parser.add_argument("--shop", help="Scraper to use (default: from the archive)")
+    parser.add_argument("--out", help="CSV to write (default: products_<shop>_reextracted.csv)")
+    parser.add_argument("--dir", default=CRAWL_DIR)
+    args = parser.parse_args()
+
+    if args.action == "list":
+        for a in list_archives(args.dir):
+            print(f"   {a['path']}  {a['source']:12s} {a['page']:5d} pages {a['http']:5d} http  {a['size'] / 1e6:.1f} MB")
+    else:
+        if not args.archive:
+            parser.error("reextract needs an archive")
+        shop = args.shop or archive_source(args.archive)
+        started = time.perf_counter()
+        products = reextract(args.archive, shop)
+        elapsed = time.perf_counter() - started
+        out = args.out or f"products_{shop}_reextracted.csv"
+        if products:
+            fieldnames = list(dict.fromkeys(k for p in products for k in p))
+            with open(out, "w", encoding="utf-8-sig", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=fieldnames)
+                writer.writeheader()
+                writer.writerows(products)
+        print(f"✅ {len(products)} products re-extracted in {elapsed:.2f}s "
+              f"({len(products) / elapsed if elapsed else 0:.0f}/s) → {out}")
@@ -5,9 +5,9 @@ from openai import OpenAI
 from tqdm import tqdm
 from dotenv import load_dotenv
 import re
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-from difflib import get_close_matches
+from brand_registry import BrandRegistry
+from instrumentation import traced
+from sheets_sync import SheetSync, GspreadBackend
 
 # Load environment variables
 load_dotenv()
@@ -18,12 +18,9 @@ SHEET_ID = "1YJDjmEu_RPvy4DDJoLA7ZO-4lgGtLSUCo1obJp7lFlI"
 SHEET_NAME = "Sheet2"
 GOOGLE_KEY_FILE = os.getenv("GOOGLE_KEY_PATH")
 
-scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-creds = ServiceAccountCredentials.from_json_keyfile_name(GOOGLE_KEY_FILE, scope)
-gc = gspread.authorize(creds)
-sheet = gc.open_by_key(SHEET_ID).worksheet(SHEET_NAME)
-brand_data = sheet.get_all_records()
-brand_map = {row['Brand Name'].strip().lower(): row['Brand URL'].strip() for row in brand_data}
+brand_data = SheetSync(GspreadBackend(GOOGLE_KEY_FILE)).records(SHEET_ID, SHEET_NAME)
+brands = BrandRegistry()
+brands.import_records(brand_data, "Brand Name", "Brand URL", source="sheet", overwrite=True)
 
 TIER1_CSV = "tier1_products.csv"
 TIER2_CSV = "tier2_products.csv"
@@ -80,6 +77,7 @@ client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 INPUT_CSV = "products.csv"
 OUTPUT_CSV = "products_enhanced.csv"
 
+@traced("enhance_with_gpt")
 def enhance_with_gpt(system_prompt: str, user_prompt: str) -> str:
     try:
         response = client.chat.completions.create(
@@ -96,11 +94,6 @@ def enhance_with_gpt(system_prompt: str, user_prompt: str) -> str:
         print(f"GPT error: {e}")
         return ""
 
-def match_brand(scraped_name: str, brand_list: list) -> str:
-    scraped = str(scraped_name).strip().lower()
-    match = get_close_matches(scraped, brand_list, n=1, cutoff=0.6)
-    return match[0] if match else ""
-
 # Main Enhancement Pipeline
 tier1_rows, tier2_rows = [], []
 
@@ -112,13 +105,11 @@ for file_path in glob.glob("missing.csv"):
         print(f"Skipping {file_path} due to missing columns.")
         continue
 
-    # Fix brand
-    brand_list = list(brand_map.keys())
-    for i, row in df.iterrows():
-        scraped_brand = str(row.get("Brand", "")).strip()
-        corrected = match_brand(scraped_brand, brand_list)
-        if corrected:
-            df.at[i, "Brand"] = corrected.title()
+    # Fix brand (one registry lookup per distinct scraped name)
+    corrected = {b: brands.canonical(b) for b in df["Brand"].dropna().astype(str).str.strip().unique()}
+    df["Brand"] = [
+        corrected.get(str(b).strip()) or b for b in df["Brand"]
+    ]
 
     df["Enhanced Short Description"] = ""
     df["Enhanced Long Description"] = ""
@@ -148,10 +139,7 @@ for file_path in glob.glob("missing.csv"):
             tier2_rows.append(row)
             continue
 
-        scraped_brand = str(row.get("Brand", "")).strip().lower()
-        matched_brand = match_brand(scraped_brand, list(brand_map.keys()))
-        brand_url = brand_map.get(matched_brand.lower(), "")
-        brand = matched_brand 
+        brand, brand_url = brands.lookup(row.get("Brand", ""))
 
         # Short description prompt
         short_prompt = f"""
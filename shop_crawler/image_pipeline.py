@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+image_pipeline.py  ───────────────────────────────────────────────────────────────
+Download, dedupe and re‑host the product images of a scraper/export CSV.
+
+WooCommerce used to fetch every gallery URL itself, one by one, during the
+import – including the same packshot scraped from three shops. Instead:
+1. All image URLs of the CSV (`images`, `Images`, `product_image_gallery`) are
+   downloaded concurrently through one pooled HTTP session; URLs seen in an
+   earlier run are not fetched again.
+2. Originals go into a content‑addressed store (`image_store/ab/<sha256>.<ext>`),
+   so byte‑identical files are stored – and hosted – once, whichever product
+   or shop they came from.
+3. In a process pool every new original gets a 64‑bit difference hash (dHash)
+   and WebP variants (`VARIANT_WIDTHS`).
+4. The CSV's image fields are rewritten to the WebP of each image under
+   `--base-url` where `image_store/public/` is hosted. Galleries are deduped by
+   sha256 only; dHash look‑alikes are just reported (`stats`) – a 9×8 hash
+   cannot tell flavour variants, or the front and the back (label) of one
+   box, apart.
+
+Run:
+    python image_pipeline.py products_guiltfree.csv --base-url https://noguiltmeal.pl/media/catalogue
+    python image_pipeline.py stats
+"""
+
+import argparse
+import csv
+import hashlib
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    from PIL import Image
+except ImportError:  # content dedup still works, dHash + variants need Pillow
+    Image = None
+
+# ------------------------------ CONFIG --------------------------------------- #
+STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "image_store")
+PUBLIC_DIR = "public"                  # inside STORE_DIR, this is what gets hosted
+IMAGE_BASE_URL = os.getenv("IMAGE_BASE_URL", "")
+IMAGE_COLUMNS = ["images", "Images", "product_image_gallery"]
+DOWNLOAD_WORKERS = 16
+PROCESS_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+VARIANT_WIDTHS = [300, 600, 1200]      # WooCommerce thumbnail / single / zoom
+WEBP_QUALITY = 82
+DHASH_DISTANCE = 6                     # ≤ this many differing bits → reported as look‑alikes
+TIMEOUT = 30
+MAX_BYTES = 15 * 1024 * 1024
+USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+# ----------------------------------------------------------------------------- #
+
+EXTENSIONS = {"image/jpeg": ".jpg", "image/png": ".png", "image/webp": ".webp", "image/gif": ".gif",
+              "image/avif": ".avif"}
+
+
+def split_urls(value: str) -> List[str]:
+    return [u.strip() for u in (value or "").split(",") if u.strip().startswith("http")]
+
+
+# === PER‑IMAGE WORK (process pool) ===
+def dhash(img, size: int = 8) -> int:
+    """64‑bit difference hash: brighter‑than‑right‑neighbour bits of a 9×8 greyscale thumbnail."""
+    small = img.convert("L").resize((size + 1, size), Image.LANCZOS)
+    pixels = small.tobytes()
+    value = 0
+    for row in range(size):
+        for col in range(size):
+            left, right = pixels[row * (size + 1) + col], pixels[row * (size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def variant_name(sha: str, width: int) -> str:
+    return f"{sha[:2]}/{sha[:20]}-{width}.webp"
+
+
+def process_original(sha: str, path: str, public_dir: str) -> Tuple[str, int, int, Optional[int], List[int]]:
+    """(sha, width, height, dhash, variant widths) – runs in a worker process."""
+    if Image is None:
+        return sha, 0, 0, None, []
+    with Image.open(path) as img:
+        img.load()
+        width, height = img.size
+        fingerprint = dhash(img)
+        base = img.convert("RGBA" if img.mode in ("RGBA", "LA", "P") else "RGB")
+        widths = sorted({w for w in VARIANT_WIDTHS if w < width} | {min(width, VARIANT_WIDTHS[-1])})
+        for w in widths:
+            target = os.path.join(public_dir, variant_name(sha, w))
+            if os.path.exists(target):
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            resized = base if w == width else base.resize((w, max(1, round(height * w / width))), Image.LANCZOS)
+            resized.save(target + ".tmp", "WEBP", quality=WEBP_QUALITY, method=4)
+            os.replace(target + ".tmp", target)
+    return sha, width, height, fingerprint, widths
+
+
+def _signed(value: Optional[int]) -> Optional[int]:
+    """SQLite integers are signed 64‑bit."""
+    return None if value is None else value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _unsigned(value: Optional[int]) -> Optional[int]:
+    return None if value is None else value + (1 << 64) if value < 0 else value
+
+
+# === STORE ===
+class ImageStore:
+    """Content‑addressed originals + `index.db` (URL → sha256, blob metadata, dHash)."""
+
+    def __init__(self, root: str = STORE_DIR):
+        self.root = root
+        self.public_dir = os.path.join(root, PUBLIC_DIR)
+        os.makedirs(self.public_dir, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(root, "index.db"), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS urls (url TEXT PRIMARY KEY, sha TEXT, fetched_at TEXT, error TEXT);
+            CREATE TABLE IF NOT EXISTS blobs (
+                sha TEXT PRIMARY KEY, ext TEXT, bytes INTEGER, width INTEGER, height INTEGER,
+                dhash INTEGER, variants TEXT);
+        """)
+        self.conn.commit()
+        self._lock = threading.Lock()
+        self._bands: Dict[Tuple[int, int], List[str]] = {}  # (band, byte) → shas, for near‑duplicate lookup
+        self._hashes: Dict[str, int] = {}
+        for sha, value in self.conn.execute("SELECT sha, dhash FROM blobs WHERE dhash IS NOT NULL"):
+            self._index_hash(sha, _unsigned(value))
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def original_path(self, sha: str, ext: str) -> str:
+        return os.path.join(self.root, sha[:2], sha + ext)
+
+    def known_urls(self, urls: Iterable[str]) -> Dict[str, Optional[str]]:
+        urls = list(urls)
+        found = {}
+        for i in range(0, len(urls), 500):
+            chunk = urls[i:i + 500]
+            marks = ",".join("?" for _ in chunk)
+            found.update(self.conn.execute(
+                f"SELECT url, sha FROM urls WHERE sha IS NOT NULL AND url IN ({marks})", chunk).fetchall())
+        return found
+
+    # --- writes -------------------------------------------------------------------
+    def add_download(self, url: str, tmp_path: str, sha: str, ext: str, size: int) -> bool:
+        """Move a downloaded file into the store; False when the content was already there."""
+        path = self.original_path(sha, ext)
+        with self._lock:
+            new = self.conn.execute("SELECT 1 FROM blobs WHERE sha = ?", (sha,)).fetchone() is None
+            if new:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                shutil.move(tmp_path, path)
+                self.conn.execute("INSERT INTO blobs (sha, ext, bytes) VALUES (?, ?, ?)", (sha, ext, size))
+            else:
+                os.remove(tmp_path)
+            self.conn.execute("INSERT OR REPLACE INTO urls (url, sha, fetched_at, error) VALUES (?, ?, ?, NULL)",
+                              (url, sha, datetime.now().isoformat(timespec="seconds")))
+            self.conn.commit()
+        return new
+
+    def add_error(self, url: str, error: str):
+        with self._lock:
+            self.conn.execute("INSERT OR REPLACE INTO urls (url, sha, fetched_at, error) VALUES (?, NULL, ?, ?)",
+                              (url, datetime.now().isoformat(timespec="seconds"), error[:300]))
+            self.conn.commit()
+
+    def local_paths(self, urls: Iterable[str]) -> Dict[str, Tuple[str, str]]:
+        """{source URL: (sha256, path of the stored original)} for downloaded URLs."""
+        urls = list(urls)
+        found = {}
+        for i in range(0, len(urls), 500):
+            chunk = urls[i:i + 500]
+            marks = ",".join("?" for _ in chunk)
+            rows = self.conn.execute(
+                f"SELECT u.url, b.sha, b.ext FROM urls u JOIN blobs b ON b.sha = u.sha WHERE u.url IN ({marks})", chunk)
+            found.update({url: (sha, self.original_path(sha, ext)) for url, sha, ext in rows})
+        return found
+
+    def pending_processing(self) -> List[Tuple[str, str]]:
+        rows = self.conn.execute("SELECT sha, ext FROM blobs WHERE variants IS NULL").fetchall()
+        return [(sha, self.original_path(sha, ext)) for sha, ext in rows]
+
+    # --- near‑duplicates --------------------------------------------------------------
+    def _index_hash(self, sha: str, value: int):
+        self._hashes[sha] = value
+        for band in range(8):
+            self._bands.setdefault((band, (value >> (8 * band)) & 0xFF), []).append(sha)
+
+    def _near(self, value: int) -> List[str]:
+        """Stored images within DHASH_DISTANCE bits (any such pair shares one of 8 bytes when distance < 8)."""
+        candidates = set()
+        for band in range(8):
+            candidates.update(self._bands.get((band, (value >> (8 * band)) & 0xFF), ()))
+        return [sha for sha in candidates if bin(self._hashes[sha] ^ value).count("1") <= DHASH_DISTANCE]
+
+    def add_processed(self, sha: str, width: int, height: int, value: Optional[int], widths: List[int]):
+        """Record size, dHash and the WebP variants of an original."""
+        with self._lock:
+            if value is not None:
+                self._index_hash(sha, value)
+            self.conn.execute(
+                "UPDATE blobs SET width = ?, height = ?, dhash = ?, variants = ? WHERE sha = ?",
+                (width, height, _signed(value), ",".join(map(str, widths)), sha))
+            self.conn.commit()
+
+    def look_alikes(self) -> int:
+        """Originals with at least one other original within DHASH_DISTANCE bits (report only)."""
+        return sum(len(self._near(value)) > 1 for value in self._hashes.values())
+
+    # --- reads ----------------------------------------------------------------------------
+    def public_urls(self, base_url: str) -> Dict[str, str]:
+        """{source URL: re‑hosted URL of its original's largest variant}."""
+        rows = self.conn.execute("""
+            SELECT u.url, b.sha, b.variants FROM urls u JOIN blobs b ON b.sha = u.sha
+            WHERE b.variants IS NOT NULL AND b.variants != ''""")
+        base = base_url.rstrip("/")
+        return {url: f"{base}/{variant_name(sha, int(variants.split(',')[-1]))}" for url, sha, variants in rows}
+
+    def stats(self) -> Dict[str, int]:
+        one = lambda sql: self.conn.execute(sql).fetchone()[0] or 0
+        variant_bytes = sum(os.path.getsize(os.path.join(d, f))
+                            for d, _, files in os.walk(self.public_dir) for f in files)
+        return {
+            "urls": one("SELECT COUNT(*) FROM urls"),
+            "failed": one("SELECT COUNT(*) FROM urls WHERE sha IS NULL"),
+            "originals": one("SELECT COUNT(*) FROM blobs"),
+            "look_alikes": self.look_alikes(),
+            "original_bytes": one("SELECT SUM(bytes) FROM blobs"),
+            "variant_bytes": variant_bytes,
+        }
+
+
+# === DOWNLOADS ===
+def make_session(pool_size: int = DOWNLOAD_WORKERS):
+    """One session for all threads: keep‑alive connections pooled per host, retries on 429/5xx."""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    session = requests.Session()
+    retry = Retry(total=3, backoff_factor=1, status_forcelist=(429, 500, 502, 503, 504), allowed_methods=["GET"])
+    adapter = HTTPAdapter(pool_connections=32, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = USER_AGENT
+    return session
+
+
+def download(session, store: ImageStore, url: str) -> Tuple[str, str]:
+    """Stream one image to a temp file while hashing it; returns (url, 'new' | 'duplicate' | error)."""
+    try:
+        with session.get(url, timeout=TIMEOUT, stream=True) as response:
+            response.raise_for_status()
+            content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+            ext = EXTENSIONS.get(content_type) or os.path.splitext(url.split("?")[0])[1].lower() or ".img"
+            digest, size = hashlib.sha256(), 0
+            fd, tmp = tempfile.mkstemp(dir=store.root, suffix=".part")
+            with os.fdopen(fd, "wb") as f:
+                for chunk in response.iter_content(64 * 1024):
+                    size += len(chunk)
+                    if size > MAX_BYTES:
+                        raise ValueError(f"larger than {MAX_BYTES // (1024 * 1024)} MB")
+                    digest.update(chunk)
+                    f.write(chunk)
+    except Exception as e:
+        if "tmp" in locals() and os.path.exists(tmp):
+            os.remove(tmp)
+        store.add_error(url, f"{type(e).__name__}: {e}")
+        return url, f"error: {type(e).__name__}"
+    new = store.add_download(url, tmp, digest.hexdigest(), ext, size)
+    return url, "new" if new else "duplicate"
+
+
+def run(csv_path: str, out_path: str, base_url: str, store: ImageStore, workers: int = DOWNLOAD_WORKERS,
+        processes: int = PROCESS_WORKERS, columns: Iterable[str] = IMAGE_COLUMNS) -> Dict[str, int]:
+    csv.field_size_limit(2**31 - 1)  # long HTML cells
+    with open(csv_path, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.DictReader(f)
+        header, rows = reader.fieldnames or [], list(reader)
+    columns = [c for c in columns if c in header]
+    urls = list(dict.fromkeys(u for row in rows for c in columns for u in split_urls(row.get(c))))
+    known = store.known_urls(urls)
+    todo = [u for u in urls if u not in known]
+    counts = {"urls": len(urls), "cached": len(known), "new": 0, "duplicate": 0, "failed": 0}
+    print(f"🖼️ {len(urls)} image URLs in {len(rows)} rows – {len(todo)} to download")
+
+    session = make_session(workers)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for future in as_completed([pool.submit(download, session, store, u) for u in todo]):
+            _, outcome = future.result()
+            counts["failed" if outcome.startswith("error") else outcome] += 1
+
+    pending = store.pending_processing()
+    if pending and Image is None:
+        print("⚠️ Pillow is not installed – no dHash report or WebP variants; image fields are left as they are")
+    elif pending:
+        with ProcessPoolExecutor(max_workers=max(1, processes)) as pool:
+            futures = [pool.submit(process_original, sha, path, store.public_dir) for sha, path in pending]
+            for future in as_completed(futures):
+                try:
+                    store.add_processed(*future.result())
+                except Exception as e:
+                    print(f"⚠️ Could not process an image: {e}")
+
+    mapping = store.public_urls(base_url) if base_url else {}
+    rewritten = 0
+    for row in rows:
+        for col in columns:
+            sources = split_urls(row.get(col))
+            if not sources or not mapping:
+                continue
+            hosted = list(dict.fromkeys(mapping.get(u, u) for u in sources))  # one URL per sha256
+            row[col] = ",".join(hosted)
+            rewritten += sum(u in mapping for u in sources)
+    counts["rewritten"] = rewritten
+    with open(out_path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=header)
+        writer.writeheader()
+        writer.writerows(rows)
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download, dedupe and re-host product images of a CSV.")
+    parser.add_argument("csv", help="Scraper/export CSV, or 'stats'")
+    parser.add_argument("--out", help="Rewritten CSV (default: <csv>_images.csv)")
+    parser.add_argument("--base-url", default=IMAGE_BASE_URL, help="Where image_store/public/ is served from")
+    parser.add_argument("--store", default=STORE_DIR)
+    parser.add_argument("--workers", type=int, default=DOWNLOAD_WORKERS)
+    parser.add_argument("--processes", type=int, default=PROCESS_WORKERS)
+    args = parser.parse_args()
+
+    with ImageStore(args.store) as images:
+        if args.csv == "stats":
+            for name, value in images.stats().items():
+                print(f"   {name:15s} {value:,}")
+        else:
+            if not args.base_url:
+                print("⚠️ No --base-url / IMAGE_BASE_URL – images are stored but the CSV keeps the source URLs")
+            out = args.out or os.path.splitext(args.csv)[0] + "_images.csv"
+            result = run(args.csv, out, args.base_url, images, args.workers, args.processes)
+            print(f"✅ {result['new']} new, {result['duplicate']} byte-identical, {result['cached']} cached, "
+                  f"{result['failed']} failed – {result['rewritten']} image references rewritten → {out}")
+            stats = images.stats()
+            print(f"📦 {stats['originals']} originals ({stats['look_alikes']} look alike another original), "
+                  f"{stats['original_bytes'] / 1e6:.1f} MB originals, {stats['variant_bytes'] / 1e6:.1f} MB WebP")
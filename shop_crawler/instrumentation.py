@@ -0,0 +1,309 @@
+"""
+instrumentation.py  ──────────────────────────────────────────────────────────────
+Counters, histograms, spans and structured logs shared by every pipeline.
+
+    from instrumentation import inc, observe, span, log, traced
+
+    inc("pages_fetched_total", shop="sportmax")
+    observe("llm_latency_seconds", 2.4, backend="grok")
+    with span("product", shop="sportmax", url=url) as s:
+        ...
+        s.set(fields=12)
+    log("rate_limited", backend="gpt", wait=41)
+
+    @traced("fetch_product_data", shop="sportmax")   # span + fetch_product_data_seconds{shop}
+    def fetch_product_data(driver): ...
+
+Metrics are always kept in memory (a dict update under a lock – cheap enough
+for per‑page/per‑call use). Where they go is configured by environment:
+    METRICS_JSONL=run.jsonl   spans, log events and the final summary as JSON lines
+    METRICS_PORT=9108         Prometheus text format on http://127.0.0.1:9108/metrics
+    METRICS_SUMMARY=0         no summary table at exit (printed when anything was recorded)
+Each span also lands in the `span_seconds{span=...}` histogram, so the summary
+shows where the time of a run went even without a sink.
+"""
+
+import atexit
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, Optional, Tuple
+
+# ------------------------------ CONFIG --------------------------------------- #
+PREFIX = "ngm_"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+SUMMARY_TOP_SPANS = 12
+# ----------------------------------------------------------------------------- #
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: dict) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "count", "sum", "min", "max")
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last one is +Inf
+        self.count, self.sum, self.min, self.max = 0, 0.0, float("inf"), 0.0
+
+    def observe(self, value: float):
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+        self.min, self.max = min(self.min, value), max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Estimate from the buckets, linear inside a bucket narrowed to the seen min/max."""
+        if not self.count:
+            return 0.0
+        rank, seen, lower = q * self.count, 0, self.min
+        for i, n in enumerate(self.counts):
+            upper = min(self.buckets[i], self.max) if i < len(self.buckets) else self.max
+            if n and seen + n >= rank:
+                return lower + (max(upper, lower) - lower) * (rank - seen) / n
+            seen += n
+            lower = max(lower, upper)
+        return self.max
+
+
+class Registry:
+    """Thread‑safe counters and histograms keyed by (name, labels)."""
+
+    def __init__(self):
+        self.counters: Dict[str, Dict[LabelKey, float]] = {}
+        self.histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _labels(labels)
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _labels(labels)
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = Histogram()
+            series[key].observe(value)
+
+    def empty(self) -> bool:
+        return not self.counters and not self.histograms
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "counters": {n: [{"labels": dict(k), "value": v} for k, v in s.items()]
+                             for n, s in self.counters.items()},
+                "histograms": {n: [{"labels": dict(k), "count": h.count, "sum": round(h.sum, 6),
+                                    "p50": round(h.quantile(0.5), 6), "p95": round(h.quantile(0.95), 6),
+                                    "max": round(h.max, 6)} for k, h in s.items()]
+                               for n, s in self.histograms.items()},
+            }
+
+    # --- Prometheus text format ----------------------------------------------------------
+    def render_prometheus(self) -> str:
+        def fmt(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+            pairs = key + extra
+            if not pairs:
+                return ""
+            escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+            return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+        lines = []
+        with self._lock:
+            for name, series in sorted(self.counters.items()):
+                lines.append(f"# TYPE {PREFIX}{name} counter")
+                lines += [f"{PREFIX}{name}{fmt(k)} {v:g}" for k, v in series.items()]
+            for name, series in sorted(self.histograms.items()):
+                lines.append(f"# TYPE {PREFIX}{name} histogram")
+                for key, h in series.items():
+                    cumulative = 0
+                    for bound, n in zip(list(h.buckets) + ["+Inf"], h.counts):
+                        cumulative += n
+                        lines.append(f"{PREFIX}{name}_bucket{fmt(key, (('le', str(bound)),))} {cumulative}")
+                    lines.append(f"{PREFIX}{name}_sum{fmt(key)} {h.sum:.6f}")
+                    lines.append(f"{PREFIX}{name}_count{fmt(key)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+_started = time.time()
+_run_id = uuid.uuid4().hex[:12]
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+_sink = None
+_sink_lock = threading.Lock()
+SPAN_HOOKS: list = []  # (on_enter(span), on_exit(span)) pairs – `profiler.py` attributes time to spans
+
+
+# === SINKS ===
+def _emit(record: dict):
+    if _sink is None:
+        return
+    record = {"ts": datetime.now().isoformat(timespec="milliseconds"), "run": _run_id, **record}
+    line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+    with _sink_lock:
+        _sink.write(line)
+
+
+def configure(jsonl: Optional[str] = None, prometheus_port: Optional[int] = None):
+    """Open the JSONL sink and/or start the /metrics endpoint (also done from the environment on import)."""
+    global _sink
+    if jsonl and _sink is None:
+        _sink = open(jsonl, "a", encoding="utf-8", buffering=1)
+    if prometheus_port:
+        serve_prometheus(prometheus_port)
+
+
+def serve_prometheus(port: int, host: str = "127.0.0.1", registry: Registry = REGISTRY) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_response(404)
+                self.end_headers()
+                return
+            body = registry.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# === RECORDING API ===
+def inc(name: str, value: float = 1, **labels):
+    REGISTRY.inc(name, value, **labels)
+
+
+def observe(name: str, value: float, **labels):
+    REGISTRY.observe(name, value, **labels)
+
+
+def log(event: str, level: str = "info", **fields):
+    """A structured event (JSONL sink only – keep the existing prints for humans)."""
+    current = _current_span.get()
+    _emit({"type": "log", "level": level, "event": event,
+           "trace": current.trace_id if current else None, "span": current.span_id if current else None,
+           **fields})
+
+
+class Span:
+    """A timed unit of work; nested spans share the trace of the outermost one (per thread/context)."""
+
+    def __init__(self, name: str, **attrs):
+        self.name = name
+        self.attrs = attrs
+        parent = _current_span.get()
+        self.parent_id = parent.span_id if parent else None
+        self.span_id = uuid.uuid4().hex[:16]
+        self.trace_id = parent.trace_id if parent else self.span_id
+        self.status = "ok"
+        self.duration = 0.0
+        self._token = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self) -> "Span":
+        self._start_wall = time.time()
+        self._start = time.perf_counter()
+        self._token = _current_span.set(self)
+        for on_enter, _ in SPAN_HOOKS:
+            on_enter(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self._start
+        for _, on_exit in reversed(SPAN_HOOKS):
+            on_exit(self)
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.status = "error"
+            self.attrs.setdefault("error", f"{exc_type.__name__}: {exc}")
+        observe("span_seconds", self.duration, span=self.name)
+        if self.status != "ok":
+            inc("span_errors_total", span=self.name)
+        _emit({"type": "span", "name": self.name, "trace": self.trace_id, "span": self.span_id,
+               "parent": self.parent_id, "start": round(self._start_wall, 6),
+               "duration": round(self.duration, 6), "status": self.status, "attrs": self.attrs})
+        return False
+
+
+def span(name: str, **attrs) -> Span:
+    return Span(name, **attrs)
+
+
+def traced(name: str, **labels):
+    """Decorator: every call is a span, and its duration also lands in `<name>_seconds{labels}`."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, **labels) as s:
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    observe(f"{name}_seconds", time.perf_counter() - s._start, **labels)
+        return wrapper
+    return decorate
+
+
+# === SUMMARY ===
+def _series(name: str, key: LabelKey) -> str:
+    return name + ("{" + ",".join(f"{k}={v}" for k, v in key) + "}" if key else "")
+
+
+def summary(registry: Registry = REGISTRY) -> str:
+    lines = [f"📊 Run summary – {time.time() - _started:.1f}s"]
+    with registry._lock:
+        counters = {n: dict(s) for n, s in registry.counters.items()}
+        histograms = {n: dict(s) for n, s in registry.histograms.items()}
+    for name in sorted(counters):
+        for key, value in sorted(counters[name].items()):
+            lines.append(f"   {_series(name, key)}".ljust(60) + f"{value:>10g}")
+    spans = sorted(histograms.pop("span_seconds", {}).items(), key=lambda kv: -kv[1].sum)
+    for name in sorted(histograms):
+        for key, h in sorted(histograms[name].items()):
+            lines.append(f"   {_series(name, key)}".ljust(60) +
+                         f"n={h.count:<6d} avg={h.sum / h.count:.3f} p50={h.quantile(0.5):.3f} "
+                         f"p95={h.quantile(0.95):.3f} max={h.max:.3f}")
+    if spans:
+        lines.append("   ⏱️ time by span (total, count, avg, p95):")
+        for key, h in spans[:SUMMARY_TOP_SPANS]:
+            lines.append(f"     {dict(key).get('span', '?'):40s} {h.sum:9.2f}s {h.count:6d} "
+                         f"{h.sum / h.count:8.3f}s {h.quantile(0.95):8.3f}s")
+    return "\n".join(lines)
+
+
+def _at_exit():
+    if REGISTRY.empty():
+        return
+    _emit({"type": "summary", "elapsed": round(time.time() - _started, 3), **REGISTRY.snapshot()})
+    if os.getenv("METRICS_SUMMARY", "1") != "0":
+        print("\n" + summary())
+    if _sink is not None:
+        _sink.close()
+
+
+atexit.register(_at_exit)
+configure(os.getenv("METRICS_JSONL"), int(os.getenv("METRICS_PORT", "0") or 0))
@@ -0,0 +1,153 @@
+"""
+mail_dispatch.py  ────────────────────────────────────────────────────────────────
+Pooled SMTP sending: a few authenticated sessions, many messages per session.
+
+Opening a connection, STARTTLS and LOGIN per recipient dominated bulk sends.
+`MailDispatcher` runs `workers` threads, each holding one authenticated session
+that is reused for up to `messages_per_session` messages. All workers share one
+`RateLimiter`, so the total stays under `per_minute`. A dropped session is
+re‑opened and the message retried; refused recipients fail without retry.
+
+Point `host`/`port` at a local `aiosmtpd` server (`use_tls=False`, no login) to
+exercise it without a real provider.
+
+Metrics: `emails_sent_total{outcome}`, `smtp_sessions_total`, `smtp_retries_total`
+and `smtp_send_seconds` (one `send_message`, without the rate‑limit wait); each
+message, retries included, is a `send_email` span.
+"""
+
+import queue
+import smtplib
+import ssl
+import threading
+import time
+from dataclasses import dataclass
+from email.message import Message
+from typing import Callable, Iterable, List, Optional
+
+from instrumentation import inc, log, observe, span
+from rate_limiter import RateLimiter
+
+# Errors after which the session is considered dead and re‑opened
+RECONNECT_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)
+
+
+@dataclass
+class SendResult:
+    recipient: str
+    ok: bool
+    error: str = ""
+    transient: bool = False  # worth retrying later (4xx reply, dropped connection)
+
+
+def _is_transient(error: smtplib.SMTPException) -> bool:
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in error.recipients.values()]
+        return bool(codes) and all(400 <= code < 500 for code in codes)
+    code = getattr(error, "smtp_code", None)
+    return code is not None and 400 <= code < 500
+
+
+class MailDispatcher:
+    def __init__(self, host: str, port: int, username: Optional[str] = None, password: Optional[str] = None,
+                 workers: int = 3, per_minute: int = 60, messages_per_session: int = 100,
+                 use_tls: bool = True, timeout: float = 30, max_retries: int = 2):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.workers = max(1, workers)
+        self.messages_per_session = messages_per_session
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.limiter = RateLimiter(per_minute, period=60)
+        self._callback_lock = threading.Lock()
+
+    # --- sessions -----------------------------------------------------------------
+    def _open(self) -> smtplib.SMTP:
+        session = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.use_tls:
+            session.starttls(context=ssl.create_default_context())
+        if self.username:
+            session.login(self.username, self.password)
+        inc("smtp_sessions_total")
+        return session
+
+    @staticmethod
+    def _close(session: Optional[smtplib.SMTP]):
+        if session is None:
+            return
+        try:
+            session.quit()
+        except Exception:
+            session.close()
+
+    # --- sending ------------------------------------------------------------------
+    def _worker(self, jobs: "queue.Queue", results: List[SendResult], on_result):
+        session, sent_in_session = None, 0
+        while True:
+            msg = jobs.get()
+            if msg is None:
+                break
+            recipient = msg["To"]
+            with span("send_email"):
+                result = SendResult(recipient, False, "not sent")
+                for attempt in range(self.max_retries + 1):
+                    if attempt:
+                        inc("smtp_retries_total")
+                    try:
+                        if session is None or sent_in_session >= self.messages_per_session:
+                            self._close(session)
+                            session, sent_in_session = self._open(), 0
+                        self.limiter.acquire()
+                        started = time.perf_counter()
+                        session.send_message(msg)
+                        observe("smtp_send_seconds", time.perf_counter() - started)
+                        sent_in_session += 1
+                        result = SendResult(recipient, True)
+                        break
+                    except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+                        result = SendResult(recipient, False, str(e), transient=_is_transient(e))
+                        break
+                    except RECONNECT_ERRORS as e:
+                        self._close(session)
+                        session = None
+                        result = SendResult(recipient, False, str(e), transient=True)
+                    except smtplib.SMTPException as e:
+                        result = SendResult(recipient, False, str(e), transient=_is_transient(e))
+                        break
+                    except OSError as e:  # socket‑level failure → new session
+                        self._close(session)
+                        session = None
+                        result = SendResult(recipient, False, str(e), transient=True)
+            inc("emails_sent_total", outcome="sent" if result.ok else "transient" if result.transient else "failed")
+            if not result.ok:
+                log("email_failed", level="warning", recipient=recipient, error=result.error,
+                    transient=result.transient)
+            with self._callback_lock:
+                results.append(result)
+                if on_result:
+                    on_result(result)
+        self._close(session)
+
+    def send_all(self, messages: Iterable[Message],
+                 on_result: Optional[Callable[[SendResult], None]] = None) -> List[SendResult]:
+        """Send every message; `on_result` is called (serialised) as each one finishes."""
+        jobs: "queue.Queue" = queue.Queue()
+        count = 0
+        for msg in messages:
+            jobs.put(msg)
+            count += 1
+        threads = min(self.workers, count)
+        for _ in range(threads):
+            jobs.put(None)
+
+        results: List[SendResult] = []
+        pool = [threading.Thread(target=self._worker, args=(jobs, results, on_result), daemon=True)
+                for _ in range(threads)]
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        return results
@@ -0,0 +1,252 @@
+"""
+offline_driver.py  ───────────────────────────────────────────────────────────────
+A Selenium WebDriver stand‑in that serves saved HTML instead of a browser.
+Pages come from a dict, a directory of .html files or a `crawl_archive.py`
+recording (`OfflineDriver.from_archive()`).
+
+`fetch_product_data(driver)` in the scrapers only reads the DOM, so it can run
+on parsed HTML: `OfflineDriver` answers `find_element(s)` for every `By` the
+scrapers use (CSS, XPath, ID, class, tag), elements expose `.text`,
+`get_attribute()` (incl. `innerText`, `textContent`, `outerHTML`, absolute
+`href`/`src`), `is_displayed()` and a no‑op `click()`. Missing elements raise
+Selenium's `NoSuchElementException`, so `WebDriverWait` and the scrapers' own
+error handling behave as with Chrome. No JavaScript runs – pages must be saved
+after the tabs the scraper clicks have rendered (true for `page_source`).
+Nothing can appear later on a saved page, so `replaying(scraper)` turns the
+scraper's `WebDriverWait`s into a single check and its `time.sleep` pauses
+into no‑ops – otherwise a missing tab costs the full 5–10 s timeout.
+
+    driver = OfflineDriver({"https://shop/p/1": html})
+    driver.get("https://shop/p/1")
+    with replaying(scraper_sportmax):
+        data = scraper_sportmax.fetch_product_data(driver)
+
+Needs `lxml` and `cssselect`.
+"""
+
+import os
+import re
+import types
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, List, Optional
+from urllib.parse import urljoin
+
+from lxml import html as lxml_html
+from lxml.cssselect import CSSSelector, SelectorError
+
+try:
+    from selenium.common.exceptions import NoSuchElementException
+except ImportError:  # the offline driver is also handy without Selenium installed
+    class NoSuchElementException(Exception):
+        pass
+
+EMPTY_PAGE = "<html><head><title></title></head><body></body></html>"
+BLOCK_TAGS = {"address", "article", "aside", "blockquote", "br", "dd", "div", "dl", "dt", "fieldset", "figcaption",
+              "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main", "nav",
+              "ol", "p", "pre", "section", "table", "tbody", "thead", "tfoot", "tr", "ul"}
+CELL_TAGS = {"td", "th"}
+HIDDEN_TAGS = {"script", "style", "noscript", "template", "head"}
+_HIDDEN_STYLE = re.compile(r"display\s*:\s*none|visibility\s*:\s*hidden", re.IGNORECASE)
+
+
+@lru_cache(maxsize=512)
+def _css(selector: str) -> CSSSelector:
+    try:
+        return CSSSelector(selector)
+    except SelectorError:  # cssselect rejects IdoSell's ".--description" style classes
+        return CSSSelector(re.sub(r"\.(-[\w-]+)", r'[class~="\1"]', selector))
+
+
+def _locate(node, by: str, value: str) -> list:
+    """All matches of a Selenium locator below `node` (XPath is evaluated like Selenium, "//" = document)."""
+    if by == "css selector":
+        return _css(value)(node)
+    if by == "xpath":
+        return [n for n in node.xpath(value) if isinstance(n, lxml_html.HtmlElement)]
+    if by == "id":
+        return _css(f"[id={_quote(value)}]")(node)
+    if by == "class name":
+        return _css("." + value.strip().replace(" ", "."))(node)
+    if by == "tag name":
+        return _css(value)(node)
+    if by == "name":
+        return _css(f"[name={_quote(value)}]")(node)
+    if by in ("link text", "partial link text"):
+        full = by == "link text"
+        return [a for a in _css("a")(node)
+                if (_inner_text(a) == value if full else value in _inner_text(a))]
+    raise ValueError(f"Unsupported locator strategy: {by}")
+
+
+def _quote(value: str) -> str:
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _inner_text(node) -> str:
+    """Rough `innerText`: block elements on their own lines, cells tab‑separated, whitespace collapsed."""
+    parts: List[str] = []
+
+    def walk(el):
+        tag = el.tag if isinstance(el.tag, str) else ""
+        if tag in HIDDEN_TAGS or (el.get("style") and _HIDDEN_STYLE.search(el.get("style"))):
+            return
+        if tag in BLOCK_TAGS:
+            parts.append("\n")
+        if tag and el.text:
+            parts.append(el.text)
+        for child in el:
+            walk(child)
+            if child.tail:
+                parts.append(child.tail)
+        if tag in CELL_TAGS:
+            parts.append("\t")
+        elif tag in BLOCK_TAGS:
+            parts.append("\n")
+
+    walk(node)
+    lines = (re.sub(r"[ \t\r\f\v\xa0]+", " ", line).strip() for line in "".join(parts).split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+class OfflineElement:
+    def __init__(self, driver: "OfflineDriver", node):
+        self._driver = driver
+        self._node = node
+
+    @property
+    def tag_name(self) -> str:
+        return self._node.tag
+
+    @property
+    def text(self) -> str:
+        return _inner_text(self._node) if self.is_displayed() else ""
+
+    def get_attribute(self, name: str) -> Optional[str]:
+        if name == "innerText":  # not rendered (e.g. <script>) → textContent, as in the browser
+            return _inner_text(self._node) if self.is_displayed() else self._node.text_content()
+        if name == "textContent":
+            return self._node.text_content()
+        if name == "outerHTML":
+            return lxml_html.tostring(self._node, encoding="unicode", with_tail=False)
+        if name == "innerHTML":
+            inner = (self._node.text or "") + "".join(
+                lxml_html.tostring(child, encoding="unicode") for child in self._node)
+            return inner
+        value = self._node.get(name)
+        if value is not None and name in ("href", "src"):  # Selenium returns the resolved property
+            return urljoin(self._driver.current_url, value.strip())
+        return value
+
+    def get_property(self, name: str):
+        return self.get_attribute(name)
+
+    def is_displayed(self) -> bool:
+        node = self._node
+        while node is not None:
+            if node.tag in HIDDEN_TAGS or node.get("hidden") is not None or node.get("type") == "hidden":
+                return False
+            if node.get("style") and _HIDDEN_STYLE.search(node.get("style")):
+                return False
+            node = node.getparent()
+        return True
+
+    def is_enabled(self) -> bool:
+        return self._node.get("disabled") is None
+
+    def click(self):
+        """Tabs and accordions are already expanded in saved HTML – nothing to do."""
+
+    def find_element(self, by: str = "id", value: Optional[str] = None) -> "OfflineElement":
+        found = self.find_elements(by, value)
+        if not found:
+            raise NoSuchElementException(f"Unable to locate element: {{\"method\":\"{by}\",\"selector\":\"{value}\"}}")
+        return found[0]
+
+    def find_elements(self, by: str = "id", value: Optional[str] = None) -> List["OfflineElement"]:
+        return [OfflineElement(self._driver, n) for n in _locate(self._node, by, value)]
+
+
+class OfflineDriver:
+    """`get(url)` loads `pages[url]` (or `EMPTY_PAGE`); the rest of the API reads that document."""
+
+    def __init__(self, pages: Optional[Dict[str, str]] = None):
+        self.pages: Dict[str, str] = dict(pages or {})
+        self.redirects: Dict[str, str] = {}  # requested URL → final URL, as recorded
+        self.current_url = ""
+        self.page_source = EMPTY_PAGE
+        self._root = lxml_html.fromstring(EMPTY_PAGE)
+        self.loads = 0
+
+    @classmethod
+    def from_directory(cls, path: str, base_url: str = "https://offline.invalid/") -> "OfflineDriver":
+        """Every *.html file under `path` as `<base_url><relative path>`."""
+        pages = {}
+        for folder, _, files in os.walk(path):
+            for name in sorted(files):
+                if name.endswith((".html", ".htm")):
+                    full = os.path.join(folder, name)
+                    with open(full, "r", encoding="utf-8") as f:
+                        pages[urljoin(base_url, os.path.relpath(full, path).replace(os.sep, "/"))] = f.read()
+        return cls(pages)
+
+    @classmethod
+    def from_archive(cls, path: str) -> "OfflineDriver":
+        """The pages of a `crawl_archive.py` recording, keyed by the URL the scraper requested."""
+        from crawl_archive import iter_records
+
+        driver = cls()
+        for record in iter_records(path, "page"):
+            driver.pages[record["requested_url"]] = record["html"]
+            driver.redirects[record["requested_url"]] = record["url"]
+        return driver
+
+    # --- navigation -------------------------------------------------------------------
+    def get(self, url: str):
+        self.current_url = self.redirects.get(url, url)
+        self.page_source = self.pages.get(url, EMPTY_PAGE)
+        self._root = lxml_html.fromstring(self.page_source or EMPTY_PAGE)
+        self.loads += 1
+
+    @property
+    def title(self) -> str:
+        found = self._root.find(".//title")
+        return (found.text or "").strip() if found is not None else ""
+
+    def execute_script(self, script: str, *args):
+        return None
+
+    def implicitly_wait(self, seconds: float):
+        pass
+
+    def set_page_load_timeout(self, seconds: float):
+        pass
+
+    def quit(self):
+        pass
+
+    close = quit
+
+    # --- DOM ------------------------------------------------------------------------
+    def find_element(self, by: str = "id", value: Optional[str] = None) -> OfflineElement:
+        return OfflineElement(self, self._root).find_element(by, value)
+
+    def find_elements(self, by: str = "id", value: Optional[str] = None) -> List[OfflineElement]:
+        return OfflineElement(self, self._root).find_elements(by, value)
+
+
+@contextmanager
+def replaying(scraper):
+    """Patch a scraper module for offline runs: no politeness pauses, every wait checks once."""
+    patched = {"time": types.SimpleNamespace(sleep=lambda s: None)}
+    if hasattr(scraper, "WebDriverWait"):
+        wait = scraper.WebDriverWait
+        patched["WebDriverWait"] = lambda driver, timeout, *args, **kwargs: wait(driver, 0, *args, **kwargs)
+    saved = {name: getattr(scraper, name) for name in patched}
+    for name, value in patched.items():
+        setattr(scraper, name, value)
+    try:
+        yield scraper
+    finally:
+        for name, value in saved.items():
+            setattr(scraper, name, value)
@@ -0,0 +1,463 @@
+#!/usr/bin/env python3
+"""
+price_watch.py  ──────────────────────────────────────────────────────────────────
+Lightweight competitor price monitoring – no browser.
+
+1. Known product URLs (a URL list, or any scraper CSV with a `Source URL`
+   column) are registered once in `prices.db` with their GTIN / export ID.
+2. `poll` re‑fetches only those pages with plain HTTP (conditional GET, a
+   per‑shop rate limit, several shops in parallel) and reads price and
+   availability from JSON‑LD, then price meta tags, then the shop's price
+   selector (`SHOP_SELECTORS`).
+3. Every poll is appended to the `observations` time series; `latest` keeps the
+   newest observation per URL so "cheapest shop per product" never scans the
+   history, and "price changes in the last N days" only reads the window
+   through the (url, observed_at) index.
+
+Run:
+    python price_watch.py add products_guiltfree.csv          # or a CSV with url[,GTIN,ID,Name]
+    python price_watch.py poll                                 # --record archives responses under crawls/
+    python price_watch.py cheapest --out cheapest.csv
+    python price_watch.py changes --days 7
+"""
+
+import argparse
+import csv
+import html
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+
+from instrumentation import inc, observe
+from rate_limiter import RateLimiter
+
+# ------------------------------ CONFIG --------------------------------------- #
+PRICE_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prices.db")
+WORKERS = 8
+PER_SHOP_PER_MINUTE = 30
+TIMEOUT = 20
+USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+INSERT_BATCH = 200
+
+# host suffix → CSS selector of the price, tried when JSON‑LD and meta tags have none
+SHOP_SELECTORS = {
+    "swiatsupli.pl": "div.current-price span.price",
+    "sport-max.pl": "strong.projector_prices__price, #projector_price_value",
+    "guiltfree.pl": "span.current-price-value, div.current-price span[itemprop='price']",
+}
+# ----------------------------------------------------------------------------- #
+
+_LD_JSON = re.compile(r'<script[^>]+type=["\']application/ld\+json["\'][^>]*>(.*?)</script>', re.I | re.S)
+_META_PRICE = re.compile(
+    r'<meta[^>]+(?:property|itemprop|name)=["\'](?:product:price:amount|og:price:amount|price)["\'][^>]*>', re.I)
+_CONTENT = re.compile(r'content=["\']([^"\']+)["\']', re.I)
+_CURRENCY = re.compile(
+    r'<meta[^>]+(?:property|itemprop)=["\'](?:product:price:currency|og:price:currency|priceCurrency)["\']'
+    r'[^>]*content=["\']([A-Z]{3})["\']', re.I)
+
+
+def parse_price(value) -> Optional[float]:
+    """'1 299,99 zł' / '129.99' / 129.99 → float (None when there is no number)."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = html.unescape(str(value or "")).replace("\xa0", "").replace(" ", "")
+    match = re.search(r"\d+(?:[.,]\d{3})*(?:[.,]\d{1,2})?", text)
+    if not match:
+        return None
+    number = match.group(0)
+    if re.fullmatch(r"\d+[.,]\d{1,2}", number):
+        return float(number.replace(",", "."))
+    return float(re.sub(r"[.,](?=\d{3}(\D|$))", "", number).replace(",", "."))
+
+
+def normalise_gtin(value) -> str:
+    value = re.sub(r"\.0$", "", str(value or "").strip())
+    return re.sub(r"\D", "", value).lstrip("0")
+
+
+def shop_of(url: str) -> str:
+    host = urlparse(url).netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+# === EXTRACTION ===
+def _walk_ld(node) -> Iterable[dict]:
+    if isinstance(node, list):
+        for item in node:
+            yield from _walk_ld(item)
+    elif isinstance(node, dict):
+        yield node
+        for key in ("@graph", "offers", "mainEntity"):
+            if key in node:
+                yield from _walk_ld(node[key])
+
+
+def _from_json_ld(page: str) -> Dict[str, object]:
+    for block in _LD_JSON.findall(page):
+        try:
+            data = json.loads(block.strip())
+        except ValueError:
+            continue
+        for node in _walk_ld(data):
+            types = node.get("@type", "")
+            types = types if isinstance(types, list) else [types]
+            if not any(t in ("Offer", "AggregateOffer") for t in types):
+                continue
+            price = node.get("price", node.get("lowPrice"))
+            if price in (None, ""):
+                spec = node.get("priceSpecification") or {}
+                price = spec.get("price") if isinstance(spec, dict) else None
+            if parse_price(price) is None:
+                continue
+            availability = str(node.get("availability", ""))
+            return {
+                "price": parse_price(price),
+                "currency": node.get("priceCurrency") or "PLN",
+                "available": None if not availability else int(
+                    availability.rsplit("/", 1)[-1] in ("InStock", "LimitedAvailability", "PreOrder", "OnlineOnly")),
+                "source": "json-ld",
+            }
+    return {}
+
+
+def _from_meta(page: str) -> Dict[str, object]:
+    for tag in _META_PRICE.findall(page):
+        content = _CONTENT.search(tag)
+        if content and parse_price(content.group(1)) is not None:
+            currency = _CURRENCY.search(page)
+            return {"price": parse_price(content.group(1)), "currency": currency.group(1) if currency else "PLN",
+                    "available": None, "source": "meta"}
+    return {}
+
+
+def _from_selector(page: str, url: str) -> Dict[str, object]:
+    selector = next((sel for host, sel in SHOP_SELECTORS.items() if shop_of(url).endswith(host)), None)
+    if not selector:
+        return {}
+    try:
+        from bs4 import BeautifulSoup
+    except ImportError:
+        return {}
+    element = BeautifulSoup(page, "html.parser").select_one(selector)
+    if element is None:
+        return {}
+    price = parse_price(element.get("content") or element.get_text(" ", strip=True))
+    return {"price": price, "currency": "PLN", "available": None, "source": "selector"} if price is not None else {}
+
+
+def extract_offer(page: str, url: str = "") -> Dict[str, object]:
+    """Price, currency and availability of a product page: JSON‑LD → meta tags → shop selector."""
+    return _from_json_ld(page) or _from_meta(page) or _from_selector(page, url) or {}
+
+
+# === STORE ===
+class PriceStore:
+    """Watched URLs, the append‑only observation series and the latest observation per URL."""
+
+    def __init__(self, path: str = PRICE_DB):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS watch (
+                url TEXT PRIMARY KEY, shop TEXT, product_key TEXT, name TEXT,
+                added_at TEXT, etag TEXT, last_modified TEXT);
+            CREATE TABLE IF NOT EXISTS observations (
+                url TEXT, shop TEXT, product_key TEXT, observed_at TEXT,
+                price REAL, currency TEXT, available INTEGER, source TEXT, status INTEGER);
+            CREATE INDEX IF NOT EXISTS obs_url_time ON observations (url, observed_at);
+            CREATE INDEX IF NOT EXISTS obs_time ON observations (observed_at);
+            CREATE TABLE IF NOT EXISTS latest (
+                url TEXT PRIMARY KEY, shop TEXT, product_key TEXT, observed_at TEXT,
+                price REAL, currency TEXT, available INTEGER);
+            CREATE INDEX IF NOT EXISTS latest_product ON latest (product_key, price);
+        """)
+        self.conn.commit()
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- watch list ---------------------------------------------------------------
+    def add_urls(self, rows: Iterable[dict]) -> int:
+        """Register `{url, GTIN?, ID?, Name?}` rows; the product key is `gtin:…`, else `id:…`, else the URL."""
+        now = datetime.now().isoformat(timespec="seconds")
+        records = []
+        for row in rows:
+            url = (row.get("url") or row.get("URL") or row.get("Source URL") or "").strip()
+            if not url.startswith("http"):
+                continue
+            gtin = normalise_gtin(row.get("GTIN") or row.get("GTIN, UPC, EAN, or ISBN"))
+            product_id = str(row.get("ID") or "").strip()
+            key = f"gtin:{gtin}" if gtin else f"id:{int(float(product_id))}" if product_id else url
+            records.append((url, shop_of(url), key, (row.get("Name") or row.get("Title") or "").strip(), now))
+        before = self.conn.total_changes
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO watch (url, shop, product_key, name, added_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET product_key = excluded.product_key, "
+                "name = COALESCE(NULLIF(excluded.name, ''), watch.name)",
+                records,
+            )
+        return self.conn.total_changes - before
+
+    def watched(self, shop: Optional[str] = None) -> List[dict]:
+        sql = "SELECT url, shop, product_key, etag, last_modified FROM watch"
+        rows = self.conn.execute(sql + (" WHERE shop = ?" if shop else ""), (shop,) if shop else ()).fetchall()
+        return [dict(zip(("url", "shop", "product_key", "etag", "last_modified"), r)) for r in rows]
+
+    # --- observations ---------------------------------------------------------------
+    def record(self, results: List[dict]):
+        """Append observations and refresh `latest` / the validators in one transaction.
+
+        Priced results replace the latest offer; a 404/410 ("gone") keeps the last
+        price but marks it unavailable, so `cheapest()` stops offering it.
+        """
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO observations (url, shop, product_key, observed_at, price, currency, available, "
+                "source, status) VALUES (:url, :shop, :product_key, :observed_at, :price, :currency, "
+                ":available, :source, :status)",
+                results,
+            )
+            priced = [r for r in results if r["price"] is not None]
+            self.conn.executemany(
+                "INSERT INTO latest (url, shop, product_key, observed_at, price, currency, available) "
+                "VALUES (:url, :shop, :product_key, :observed_at, :price, :currency, :available) "
+                "ON CONFLICT(url) DO UPDATE SET observed_at = excluded.observed_at, price = excluded.price, "
+                "currency = excluded.currency, available = excluded.available, product_key = excluded.product_key",
+                priced,
+            )
+            self.conn.executemany(
+                "INSERT INTO latest (url, shop, product_key, observed_at, price, currency, available) "
+                "VALUES (:url, :shop, :product_key, :observed_at, NULL, NULL, 0) "
+                "ON CONFLICT(url) DO UPDATE SET observed_at = excluded.observed_at, available = 0",
+                [r for r in results if r["source"] == "gone"],
+            )
+            self.conn.executemany(
+                "UPDATE watch SET etag = :etag, last_modified = :last_modified WHERE url = :url",
+                [r for r in results if r.get("etag") or r.get("last_modified")],
+            )
+
+    def last_known(self, url: str) -> dict:
+        row = self.conn.execute("SELECT price, currency, available FROM latest WHERE url = ?", (url,)).fetchone()
+        return dict(zip(("price", "currency", "available"), row)) if row else {}
+
+    # --- queries ------------------------------------------------------------------------
+    def cheapest(self, max_age_days: float = 7, in_stock_only: bool = True) -> List[dict]:
+        """Cheapest current offer per product across shops (offers older than `max_age_days` ignored)."""
+        since = (datetime.now() - timedelta(days=max_age_days)).isoformat(timespec="seconds")
+        stock = "AND COALESCE(l.available, 1) = 1" if in_stock_only else ""
+        rows = self.conn.execute(f"""
+            WITH ranked AS (
+                SELECT l.*, ROW_NUMBER() OVER (PARTITION BY l.product_key ORDER BY l.price, l.observed_at DESC) AS rn,
+                       COUNT(*) OVER (PARTITION BY l.product_key) AS shops
+                FROM latest l WHERE l.observed_at >= ? AND l.price IS NOT NULL {stock})
+            SELECT r.product_key, w.name, r.shop, r.price, r.currency, r.url, r.observed_at, r.shops
+            FROM ranked r LEFT JOIN watch w ON w.url = r.url
+            WHERE r.rn = 1 ORDER BY r.product_key""", (since,)).fetchall()
+        cols = ("product_key", "name", "shop", "price", "currency", "url", "observed_at", "shops")
+        return [dict(zip(cols, r)) for r in rows]
+
+    def changes(self, days: float = 7) -> List[dict]:
+        """Every price change inside the last `days`, compared with the observation before it.
+
+        Only URLs observed since `since` are touched (via `obs_time`); each one's
+        last priced row before the window is a single `obs_url_time` seek.
+        """
+        since = (datetime.now() - timedelta(days=days)).isoformat(timespec="seconds")
+        rows = self.conn.execute("""
+            WITH urls AS (
+                SELECT DISTINCT url FROM observations INDEXED BY obs_time WHERE observed_at >= :since),
+            recent AS (
+                SELECT o.url, o.product_key, o.shop, o.observed_at, o.price FROM observations o
+                WHERE o.observed_at >= :since AND o.price IS NOT NULL
+                UNION ALL
+                SELECT o.url, o.product_key, o.shop, o.observed_at, o.price
+                FROM urls u JOIN observations o ON o.rowid = (
+                    SELECT p.rowid FROM observations p
+                    WHERE p.url = u.url AND p.observed_at < :since AND p.price IS NOT NULL
+                    ORDER BY p.observed_at DESC LIMIT 1)),
+            steps AS (
+                SELECT *, LAG(price) OVER (PARTITION BY url ORDER BY observed_at) AS previous FROM recent)
+            SELECT s.product_key, w.name, s.shop, s.previous, s.price, s.observed_at, s.url
+            FROM steps s LEFT JOIN watch w ON w.url = s.url
+            WHERE s.observed_at >= :since AND s.previous IS NOT NULL AND s.previous != s.price
+            ORDER BY s.observed_at DESC""", {"since": since}).fetchall()
+        cols = ("product_key", "name", "shop", "old_price", "new_price", "changed_at", "url")
+        out = [dict(zip(cols, r)) for r in rows]
+        for row in out:
+            row["change_pct"] = round(100 * (row["new_price"] - row["old_price"]) / row["old_price"], 1) \
+                if row["old_price"] else None
+        return out
+
+
+# === POLLING ===
+class Poller:
+    """Conditional GETs with one `requests.Session` per thread and one rate limiter per shop."""
+
+    def __init__(self, per_shop_per_minute: int = PER_SHOP_PER_MINUTE, timeout: int = TIMEOUT, adapter=None):
+        self.per_shop = per_shop_per_minute
+        self.timeout = timeout
+        self.adapter = adapter  # crawl_archive record/replay adapter, mounted on every session
+        self._limiters: Dict[str, RateLimiter] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _limiter(self, shop: str) -> RateLimiter:
+        with self._lock:
+            if shop not in self._limiters:
+                self._limiters[shop] = RateLimiter(self.per_shop, period=60)
+            return self._limiters[shop]
+
+    def _session(self):
+        if not hasattr(self._local, "session"):
+            import requests
+
+            self._local.session = requests.Session()
+            self._local.session.headers.update({"User-Agent": USER_AGENT, "Accept-Language": "pl-PL,pl;q=0.9"})
+            if self.adapter is not None:
+                self._local.session.mount("http://", self.adapter)
+                self._local.session.mount("https://", self.adapter)
+        return self._local.session
+
+    def fetch(self, item: dict) -> dict:
+        headers = {}
+        if item.get("etag"):
+            headers["If-None-Match"] = item["etag"]
+        if item.get("last_modified"):
+            headers["If-Modified-Since"] = item["last_modified"]
+        self._limiter(item["shop"]).acquire()
+        result = {"url": item["url"], "shop": item["shop"], "product_key": item["product_key"],
+                  "observed_at": datetime.now().isoformat(timespec="seconds"),
+                  "price": None, "currency": None, "available": None, "source": None, "status": 0,
+                  "etag": None, "last_modified": None}
+        started = time.perf_counter()
+        try:
+            response = self._session().get(item["url"], headers=headers, timeout=self.timeout)
+        except Exception as e:
+            result["source"] = f"error: {type(e).__name__}"
+            inc("pages_fetched_total", shop=item["shop"], kind="price", status="error")
+            return result
+        observe("http_fetch_seconds", time.perf_counter() - started, shop=item["shop"])
+        inc("pages_fetched_total", shop=item["shop"], kind="price", status=response.status_code)
+        result["status"] = response.status_code
+        if response.status_code == 304:
+            result["source"] = "not-modified"  # filled from `latest` by the caller
+            return result
+        if response.status_code == 404 or response.status_code == 410:
+            result.update(available=0, source="gone")
+            return result
+        if response.status_code >= 400:
+            result["source"] = f"http {response.status_code}"
+            return result
+        started = time.perf_counter()
+        result.update(extract_offer(response.text, item["url"]))
+        observe("parse_seconds", time.perf_counter() - started, shop=item["shop"])
+        result["source"] = result["source"] or "no-price"
+        result["etag"] = response.headers.get("ETag")
+        result["last_modified"] = response.headers.get("Last-Modified")
+        return result
+
+
+def poll(store: PriceStore, poller: Optional[Poller] = None, shop: Optional[str] = None,
+         workers: int = WORKERS) -> Dict[str, int]:
+    """Poll every watched URL once; returns counts by extraction source."""
+    poller = poller or Poller()
+    items = store.watched(shop)
+    counts: Dict[str, int] = {}
+    pending: List[dict] = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for future in as_completed([pool.submit(poller.fetch, item) for item in items]):
+            result = future.result()
+            if result["source"] == "not-modified":
+                result.update(store.last_known(result["url"]))
+            counts[result["source"]] = counts.get(result["source"], 0) + 1
+            pending.append(result)
+            if len(pending) >= INSERT_BATCH:
+                store.record(pending)
+                pending = []
+    if pending:
+        store.record(pending)
+    return counts
+
+
+def read_url_csv(path: str) -> List[dict]:
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def write_rows(rows: List[dict], path: str):
+    if not rows:
+        return
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Poll competitor prices for known product URLs.")
+    parser.add_argument("action", choices=["add", "poll", "cheapest", "changes"])
+    parser.add_argument("csv", nargs="?", help="add: CSV with url / Source URL (+ GTIN, ID, Name)")
+    parser.add_argument("--db", default=PRICE_DB)
+    parser.add_argument("--shop", help="poll: only this shop host")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--per-minute", type=int, default=PER_SHOP_PER_MINUTE, help="Requests per shop per minute")
+    parser.add_argument("--days", type=float, default=7, help="Window for changes / max offer age for cheapest")
+    parser.add_argument("--out", help="Write query results to this CSV")
+    parser.add_argument("--record", action="store_true", help="poll: archive every response under crawls/")
+    parser.add_argument("--replay", help="poll: answer from this crawl archive instead of the network (use a scratch --db)")
+    args = parser.parse_args()
+
+    with PriceStore(args.db) as prices:
+        if args.action == "add":
+            if not args.csv:
+                parser.error("add needs a CSV")
+            print(f"✅ {prices.add_urls(read_url_csv(args.csv))} URLs added/updated")
+        elif args.action == "poll":
+            from crawl_archive import CrawlArchive, archive_adapter, new_archive_path, replay_adapter
+
+            archive, adapter, per_minute = None, None, args.per_minute
+            if args.replay:
+                adapter, per_minute = replay_adapter(args.replay), 0
+            elif args.record:
+                archive = CrawlArchive(new_archive_path("price_watch"), source="price_watch")
+                adapter = archive_adapter(archive, pool_maxsize=args.workers)
+            try:
+                stats = poll(prices, Poller(per_minute, adapter=adapter), shop=args.shop, workers=args.workers)
+            finally:
+                if archive:
+                    archive.close()
+                    print(f"🗄️ {archive.records - 1} responses archived → {archive.path}")
+            print("✅ Polled: " + ", ".join(f"{k} {v}" for k, v in sorted(stats.items())))
+        elif args.action == "cheapest":
+            result = prices.cheapest(args.days)
+            for row in result[:50]:
+                print(f"💰 {row['product_key']:22s} {row['price']:8.2f} {row['currency']}  {row['shop']:18s} "
+                      f"({row['shops']} shops) {row['name'] or ''}")
+            print(f"📦 {len(result)} products")
+            if args.out:
+                write_rows(result, args.out)
+        else:
+            result = prices.changes(args.days)
+            for row in result[:50]:
+                print(f"{'🔺' if row['new_price'] > row['old_price'] else '🔻'} {row['changed_at'][:10]} "
+                      f"{row['shop']:18s} {row['old_price']:8.2f} → {row['new_price']:8.2f} "
+                      f"({row['change_pct'] or 0:+.1f}%) {row['name'] or row['product_key']}")
+            print(f"📈 {len(result)} price changes in the last {args.days:g} days")
+            if args.out:
+                write_rows(result, args.out)
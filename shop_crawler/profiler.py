@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+profiler.py  ─────────────────────────────────────────────────────────────────────
+Where does the wall time of a run go? Profiling mode for any pipeline script.
+
+1. Stages: every `instrumentation` span becomes a frame, labelled with its shop
+   or backend – `product[sportmax]`, `fetch_product_data[sportmax]`,
+   `enhance_with_grok`, `send_email`, `extract_nutrition`,
+   `regenerate_product[gpt]` … Time outside any span goes to the script itself.
+2. Categories: while profiling, the primitives underneath are timed:
+     sleep        time.sleep – politeness pauses, backoff, rate‑limiter waits
+     browser_rpc  Selenium WebDriver commands (`get` includes the page load)
+     network      socket / TLS connect, send, receive and DNS (requests, SMTP, LLM APIs)
+     disk         read/write/flush of files opened with open(), SQLite statements
+     wait         blocked on other threads – pool results, joins, queues, events
+     cpu          the rest of a frame's own time – parsing, rendering, Python
+   A primitive running inside another (the HTTP under a WebDriver command, the
+   sleep inside `RateLimiter.acquire`) is counted once, for the outer one.
+3. Output in `profiles/`: `<script>-<timestamp>.folded` – folded stacks in
+   microseconds for flamegraph.pl, speedscope or inferno – and
+   `<script>-<timestamp>.txt`, the per‑frame × category table (also printed).
+
+Every thread adds its own time, so with worker pools the totals exceed wall time.
+
+Run:
+    python profiler.py scraper_sportmax.py --count 5 --headless
+    python profiler.py Existing_Products/regenerate_fields.py --validate --workers 4
+    python profiler.py --out /tmp/prof benchmarks/run_benchmarks.py --stages extract
+    flamegraph.pl profiles/scraper_sportmax-20260101-120000.folded > sportmax.svg
+"""
+
+import argparse
+import builtins
+import os
+import runpy
+import socket
+import sqlite3
+import ssl
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import instrumentation
+
+# ------------------------------ CONFIG --------------------------------------- #
+PROFILE_DIR = "profiles"
+CATEGORIES = ("network", "sleep", "browser_rpc", "disk", "wait", "cpu")
+FRAME_LABELS = ("shop", "backend")  # span attributes that become part of the frame name
+SOCKET_METHODS = ("connect", "connect_ex", "recv", "recv_into", "recvfrom", "send", "sendall", "sendto")
+SSL_METHODS = ("do_handshake", "read", "write", "recv", "recv_into", "send", "sendall")
+FILE_METHODS = ("read", "read1", "readinto", "readline", "readlines", "write", "writelines", "flush", "truncate")
+SQLITE_METHODS = ("execute", "executemany", "executescript")
+TOP_LEAVES = 10
+# ----------------------------------------------------------------------------- #
+
+_perf = time.perf_counter  # bound before anything is patched
+Key = Tuple[Tuple[str, ...], str, Optional[str]]  # (frames, category, detail)
+
+
+def _frame_name(text: str) -> str:
+    return str(text).replace(";", ",").replace(" ", "_")
+
+
+class _Frame:
+    __slots__ = ("name", "start", "children")
+
+    def __init__(self, name: str):
+        self.name, self.start, self.children = name, _perf(), 0.0
+
+
+class _TimedFile:
+    """File object proxy: read/write/flush time goes to `disk`, everything else passes through."""
+
+    def __init__(self, f, profiler: "Profiler"):
+        self._f = f
+        for name in FILE_METHODS:
+            method = getattr(f, name, None)
+            if method is not None:
+                setattr(self, name, profiler.timed("disk", method))
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self.readline()
+        if not line:
+            raise StopIteration
+        return line
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return self._f.__exit__(*exc)
+
+
+class Profiler:
+    def __init__(self, root: str = "run"):
+        self.root = _frame_name(root)
+        self.totals: Dict[Key, float] = defaultdict(float)
+        self.wall = 0.0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._patches: list = []  # (owner, attribute, original, owner had its own attribute)
+        self._started = 0.0
+        self._hooks = (lambda span: self.push(self._span_frame(span)), lambda span: self.pop())
+
+    # --- attribution ------------------------------------------------------------------
+    def _stack(self) -> List[_Frame]:
+        local = self._local
+        if not hasattr(local, "stack"):
+            local.stack, local.busy = [_Frame(self.root)], False
+        return local.stack
+
+    def _charge(self, stack: List[_Frame], category: str, detail: Optional[str], seconds: float):
+        key = (tuple(f.name for f in stack), category, detail)
+        with self._lock:
+            self.totals[key] += seconds
+
+    @staticmethod
+    def _span_frame(span) -> str:
+        label = next((span.attrs[k] for k in FRAME_LABELS if span.attrs.get(k)), None)
+        return _frame_name(f"{span.name}[{label}]" if label else span.name)
+
+    def push(self, name: str):
+        self._stack().append(_Frame(name))
+
+    def pop(self):
+        stack = self._stack()
+        if len(stack) < 2:
+            return
+        elapsed = _perf() - stack[-1].start
+        self._charge(stack, "cpu", None, max(0.0, elapsed - stack[-1].children))
+        stack.pop()
+        stack[-1].children += elapsed
+
+    def timed(self, category: str, func, detail=None):
+        """`func` with its duration charged to `category`; `detail(args)` names the leaf below it."""
+        profiler = self
+
+        def wrapper(*args, **kwargs):
+            stack = profiler._stack()
+            local = profiler._local
+            if local.busy:  # inside another timed primitive – that one owns the time
+                return func(*args, **kwargs)
+            local.busy = True
+            started = _perf()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = _perf() - started
+                local.busy = False
+                stack[-1].children += elapsed
+                profiler._charge(stack, category, detail(args) if detail else None, elapsed)
+
+        wrapper.__wrapped__ = func
+        return wrapper
+
+    # --- patching ---------------------------------------------------------------------
+    def _patch(self, owner, name: str, replacement):
+        self._patches.append((owner, name, getattr(owner, name), name in vars(owner)))
+        setattr(owner, name, replacement)
+
+    def _patch_timed(self, owner, names, category: str, detail=None):
+        for name in names:
+            if hasattr(owner, name):
+                self._patch(owner, name, self.timed(category, getattr(owner, name), detail))
+
+    def _timed_sqlite(self):
+        """`sqlite3.connect` handing out connections whose statements and fetches count as disk I/O."""
+
+        class TimedCursor(sqlite3.Cursor):
+            pass
+
+        class TimedConnection(sqlite3.Connection):
+            def cursor(self, factory=TimedCursor):
+                return sqlite3.Connection.cursor(self, factory)
+
+        for name in SQLITE_METHODS + ("fetchone", "fetchmany", "fetchall", "__next__"):
+            setattr(TimedCursor, name, self.timed("disk", getattr(sqlite3.Cursor, name)))
+        for name in SQLITE_METHODS + ("commit",):
+            setattr(TimedConnection, name, self.timed("disk", getattr(sqlite3.Connection, name)))
+        connect = self.timed("disk", sqlite3.connect)
+
+        def timed_connect(*args, **kwargs):
+            kwargs.setdefault("factory", TimedConnection)
+            return connect(*args, **kwargs)
+
+        return timed_connect
+
+    def enable(self):
+        self._started = _perf()
+        self._stack()[0].start = self._started  # the root frame of this (main) thread
+        self._patch_timed(time, ["sleep"], "sleep")
+        try:
+            from rate_limiter import RateLimiter
+
+            self._patch_timed(RateLimiter, ["acquire"], "sleep", lambda args: "rate_limit")
+        except ImportError:
+            pass
+        try:
+            from selenium.webdriver.remote.remote_connection import RemoteConnection
+
+            self._patch_timed(RemoteConnection, ["execute"], "browser_rpc", lambda args: _frame_name(args[1]))
+        except ImportError:
+            pass
+        self._patch_timed(socket.socket, SOCKET_METHODS, "network")
+        self._patch_timed(ssl.SSLSocket, SSL_METHODS, "network")
+        self._patch_timed(socket, ["getaddrinfo"], "network", lambda args: "dns")
+        self._patch_timed(threading.Condition, ["wait"], "wait")
+        self._patch_timed(threading.Thread, ["join"], "wait")
+        timed_open = self.timed("disk", builtins.open)
+        self._patch(builtins, "open", lambda *args, **kwargs: _TimedFile(timed_open(*args, **kwargs), self))
+        self._patch(sqlite3, "connect", self._timed_sqlite())
+        instrumentation.SPAN_HOOKS.append(self._hooks)
+
+    def disable(self):
+        if self._hooks in instrumentation.SPAN_HOOKS:
+            instrumentation.SPAN_HOOKS.remove(self._hooks)
+        for owner, name, original, had_own in reversed(self._patches):
+            if had_own:
+                setattr(owner, name, original)
+            else:
+                delattr(owner, name)
+        self._patches = []
+        self.wall = _perf() - self._started
+        root = self._stack()[0]
+        self._charge([root], "cpu", None, max(0.0, self.wall - root.children))
+
+    def __enter__(self) -> "Profiler":
+        self.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.disable()
+
+    # --- output -----------------------------------------------------------------------
+    def folded(self) -> List[str]:
+        lines = []
+        for (frames, category, detail), seconds in sorted(self.totals.items(), key=lambda kv: kv[0][:2]):
+            micros = round(seconds * 1e6)
+            if micros:
+                leaf = (category,) + ((detail,) if detail else ())
+                lines.append(f"{';'.join(frames + leaf)} {micros}")
+        return lines
+
+    def breakdown(self) -> Dict[str, Dict[str, float]]:
+        """Seconds per innermost frame and category."""
+        table: Dict[str, Dict[str, float]] = defaultdict(lambda: dict.fromkeys(CATEGORIES, 0.0))
+        for (frames, category, _), seconds in self.totals.items():
+            table[frames[-1]][category] += seconds
+        return dict(table)
+
+    def table(self) -> str:
+        rows = sorted(self.breakdown().items(), key=lambda kv: -sum(kv[1].values()))
+        totals = {c: sum(r[c] for _, r in rows) for c in CATEGORIES}
+        grand = sum(totals.values()) or 1.0
+        width = max([len(name) for name, _ in rows] + [20])
+        header = "frame".ljust(width) + "".join(f"{c:>13s}" for c in CATEGORIES) + f"{'total':>11s}"
+        lines = [f"🔬 Profile of {self.root} – wall {self.wall:.1f}s, attributed {grand:.1f}s (all threads)",
+                 header, "─" * len(header)]
+        for name, row in rows:
+            lines.append(name.ljust(width) + "".join(f"{row[c]:12.2f}s" for c in CATEGORIES)
+                         + f"{sum(row.values()):10.2f}s")
+        lines.append("─" * len(header))
+        lines.append("total".ljust(width) + "".join(f"{totals[c]:12.2f}s" for c in CATEGORIES) + f"{grand:10.2f}s")
+        lines.append("share".ljust(width) + "".join(f"{totals[c] / grand:12.0%} " for c in CATEGORIES))
+
+        leaves: Dict[str, float] = defaultdict(float)
+        for (_, category, detail), seconds in self.totals.items():
+            leaves[f"{category}:{detail}" if detail else category] += seconds
+        lines.append("\n⏱️ biggest leaves:")
+        for leaf, seconds in sorted(leaves.items(), key=lambda kv: -kv[1])[:TOP_LEAVES]:
+            lines.append(f"   {leaf:30s} {seconds:10.2f}s {seconds / grand:6.1%}")
+        return "\n".join(lines)
+
+    def write(self, folder: str = PROFILE_DIR) -> str:
+        """Folded stacks + table under `folder`; returns the path prefix."""
+        os.makedirs(folder, exist_ok=True)
+        prefix = os.path.join(folder, f"{self.root}-{datetime.now():%Y%m%d-%H%M%S}")
+        with open(prefix + ".folded", "w", encoding="utf-8") as f:
+            f.write("\n".join(self.folded()) + "\n")
+        with open(prefix + ".txt", "w", encoding="utf-8") as f:
+            f.write(self.table() + "\n")
+        return prefix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a pipeline script and attribute its wall time.",
+                                     usage="python profiler.py [--out DIR] script.py [script args ...]")
+    parser.add_argument("--out", default=PROFILE_DIR, help="Folder for the .folded and .txt output")
+    parser.add_argument("script")
+    parser.add_argument("args", nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+
+    script = os.path.abspath(args.script)
+    out = os.path.abspath(args.out)
+    sys.argv = [script] + args.args
+    sys.path.insert(0, os.path.dirname(script))
+
+    profiler = Profiler(os.path.splitext(os.path.basename(script))[0])
+    profiler.enable()
+    try:
+        runpy.run_path(script, run_name="__main__")
+    finally:
+        profiler.disable()
+        prefix = profiler.write(out)
+        print("\n" + profiler.table())
+        print(f"\n🔥 Folded stacks → {prefix}.folded")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+rate_limiter.py  ─────────────────────────────────────────────────────────────────
+Thread‑safe sliding‑window rate limiter shared by the mail and LLM pipelines.
+
+    limiter = RateLimiter(60, period=60)   # at most 60 calls per minute
+    limiter.acquire()                      # blocks until a slot is free
+"""
+
+import threading
+import time
+from collections import deque
+
+
+class RateLimiter:
+    """Allow at most `rate` acquisitions in any `period`‑second window (rate <= 0 → unlimited)."""
+
+    def __init__(self, rate: int, period: float = 60.0):
+        self.rate = rate
+        self.period = period
+        self._stamps = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Block until a call is allowed; returns the seconds spent waiting."""
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._stamps and now - self._stamps[0] >= self.period:
+                    self._stamps.popleft()
+                if len(self._stamps) < self.rate:
+                    self._stamps.append(now)
+                    return waited
+                delay = self.period - (now - self._stamps[0])
+            time.sleep(delay)
+            waited += delay
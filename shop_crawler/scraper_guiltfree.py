@@ -12,11 +12,10 @@ import random
 import re
 import json
 import argparse
+from crawl_archive import CrawlArchive, RecordingDriver, new_archive_path
+from instrumentation import inc, span, traced
+from price_watch import extract_offer
 
-parser = argparse.ArgumentParser()
-parser.add_argument('--count', type=int, default=10, help="Number of products per category")
-parser.add_argument('--headless', action='store_true', help="Run browser in headless mode")
-args = parser.parse_args()
 
 CATEGORY_URLS = [
     "https://guiltfree.pl/gb/354-high-protein-products",
@@ -61,8 +60,8 @@ CATEGORY_STRUCTURE = {
 }
 
 
-PRODUCTS_PER_CATEGORY = args.count
-HEADLESS = args.headless
+PRODUCTS_PER_CATEGORY = 10
+HEADLESS = False
 
 def random_sleep(min_s=2, max_s=5):
     time.sleep(random.uniform(min_s, max_s))
@@ -107,6 +106,7 @@ def extract_kalorii_attribute(nutrition_text):
             return "Over 1000 calories"
     return ""
 
+@traced("fetch_product_data", shop="guiltfree")
 def fetch_product_data(driver):
     try:
         body_text = driver.find_element(By.TAG_NAME, "body").text.strip()
@@ -196,15 +196,18 @@ def fetch_product_data(driver):
     except:
         pass
 
+    offer = extract_offer(driver.page_source, driver.current_url)  # JSON-LD / meta price, no extra request
+
     return {
         "GTIN": gtin,
         "Title": title,
-        "Price": "",
+        "Price": offer.get("price") or "",
         "Brand": brand,
         "Short Description": short_desc,
         "Long Description": long_desc,
         "Nutrition Facts": nutrition_flat,
         "Nutrition Label URL": label_img,
+        "Source URL": driver.current_url,
         "images": ",".join(image_urls),
         "Attribute 1 name": "Dieta",
         "Attribute 1 value(s)": dieta_val,
@@ -220,122 +223,108 @@ def fetch_product_data(driver):
         "Attribute 3 global": 1,
     }
 
-options = webdriver.ChromeOptions()
-options.add_argument("--window-size=1920,1080")
-if HEADLESS:
-    options.add_argument("--headless")
-    options.add_argument("--disable-gpu")  # Optional for Windows compatibility
-
-driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=PRODUCTS_PER_CATEGORY, help="Number of products per category")
+    parser.add_argument('--headless', action='store_true', default=HEADLESS, help="Run browser in headless mode")
+    parser.add_argument('--record', action='store_true', help="Archive every visited page under crawls/ for offline re-extraction")
+    args = parser.parse_args()
+    products_per_category = args.count
 
-results = []
+    options = webdriver.ChromeOptions()
+    options.add_argument("--window-size=1920,1080")
+    if args.headless:
+        options.add_argument("--headless")
+        options.add_argument("--disable-gpu")  # Optional for Windows compatibility
 
-for category_url in CATEGORY_URLS:
-    category_name = CATEGORY_NAMES.get(category_url, "")
-    print(f"\n🔍 Scraping category: {category_name} ({category_url})")
+    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+    if args.record:
+        driver = RecordingDriver(driver, CrawlArchive(new_archive_path("guiltfree"), source="guiltfree"))
 
-    driver.get(category_url)
-    time.sleep(2)
+    results = []
 
-    try:
-        btn = WebDriverWait(driver, 5).until(
-            EC.element_to_be_clickable((By.CSS_SELECTOR, ".x13eucookies__btn--accept-all"))
-        )
-        btn.click()
-    except:
-        pass
+    for category_url in CATEGORY_URLS:
+        category_name = CATEGORY_NAMES.get(category_url, "")
+        print(f"\n🔍 Scraping category: {category_name} ({category_url})")
 
-    WebDriverWait(driver, 15).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
+        driver.get(category_url)
+        inc("pages_fetched_total", shop="guiltfree", kind="category")
+        time.sleep(2)
 
-    for _ in range(10):
-        driver.execute_script("window.scrollBy(0,500)")
-        time.sleep(1)
-
-    product_urls = []
-    cards = driver.find_elements(By.CSS_SELECTOR, "section#products article.product-miniature")
-    print(f"🔍 Found {len(cards)} product cards on the page")
-
-    for card in cards:
         try:
-            if card.is_displayed():
-                link = card.find_element(By.CSS_SELECTOR, "a.thumbnail").get_attribute("href")
-                if link and "/gb/" in link:
-                    print(f"🧲 Candidate product link: {link}")
-                    product_urls.append(link)
-            if len(product_urls) >= PRODUCTS_PER_CATEGORY:
-                break
+            btn = WebDriverWait(driver, 5).until(
+                EC.element_to_be_clickable((By.CSS_SELECTOR, ".x13eucookies__btn--accept-all"))
+            )
+            btn.click()
         except:
-            continue
-
-for category_url in CATEGORY_URLS:
-    category_name = CATEGORY_NAMES.get(category_url, "")
-    print(f"\n🔍 Scraping category: {category_name} ({category_url})")
+            pass
 
-    driver.get(category_url)
-    time.sleep(2)
+        WebDriverWait(driver, 15).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
 
-    try:
-        btn = WebDriverWait(driver, 5).until(
-            EC.element_to_be_clickable((By.CSS_SELECTOR, ".x13eucookies__btn--accept-all"))
-        )
-        btn.click()
-    except:
-        pass
+        for _ in range(10):
+            driver.execute_script("window.scrollBy(0,500)")
+            time.sleep(1)
 
-    WebDriverWait(driver, 15).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
+        product_urls = []
+        cards = driver.find_elements(By.CSS_SELECTOR, "section#products article.product-miniature")
+        print(f"🔍 Found {len(cards)} product cards on the page")
 
-    for _ in range(10):
-        driver.execute_script("window.scrollBy(0,500)")
-        time.sleep(1)
+        for card in cards:
+            try:
+                if card.is_displayed():
+                    link = card.find_element(By.CSS_SELECTOR, "a.thumbnail").get_attribute("href")
+                    if link and "/gb/" in link:
+                        print(f"🧲 Candidate product link: {link}")
+                        product_urls.append(link)
+            except:
+                continue
 
-    product_urls = []
-    cards = driver.find_elements(By.CSS_SELECTOR, "section#products article.product-miniature")
-    print(f"🔍 Found {len(cards)} product cards on the page")
+        added_count = 0
+        for url in product_urls:
+            if added_count >= products_per_category:
+                break
 
-    for card in cards:
-        try:
-            if card.is_displayed():
-                link = card.find_element(By.CSS_SELECTOR, "a.thumbnail").get_attribute("href")
-                if link and "/gb/" in link:
-                    print(f"🧲 Candidate product link: {link}")
-                    product_urls.append(link)
-        except:
-            continue
-
-    added_count = 0
-    for url in product_urls:
-        if added_count >= PRODUCTS_PER_CATEGORY:
-            break
-
-        driver.get(url)
-        random_sleep(3, 6)
-        data = fetch_product_data(driver)
-
-        if not data:
-            print("⚠️ Skipped a product due to scraping failure or missing data, retrying once...")
-            time.sleep(2)
-            driver.get(url)
-            random_sleep(2, 4)
-            data = fetch_product_data(driver)
-
-        if data:
-            hierarchical_category = CATEGORY_STRUCTURE.get(category_name, category_name)
-            data["Categories"] = hierarchical_category
-            results.append(data)
-            added_count += 1
-            print(f"✅ Product added: {data['Title']}")
-        else:
-            print("❌ Product skipped after retry")
-
-driver.quit()
-
-results = [r for r in results if r.get("Title")]
-
-if results:
-    with open("products_guiltfree.csv", "w", encoding="utf-8-sig", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=list(results[0].keys()))
-        writer.writeheader()
-        writer.writerows(results)
-    print("Scraping complete — products_guiltfree.csv ready")
-else:
-    print("No data scraped")
+            with span("product", shop="guiltfree", category=category_name, url=url) as product_span:
+                driver.get(url)
+                inc("pages_fetched_total", shop="guiltfree", kind="product")
+                random_sleep(3, 6)
+                data = fetch_product_data(driver)
+
+                if not data:
+                    print("⚠️ Skipped a product due to scraping failure or missing data, retrying once...")
+                    inc("product_retries_total", shop="guiltfree")
+                    time.sleep(2)
+                    driver.get(url)
+                    inc("pages_fetched_total", shop="guiltfree", kind="product")
+                    random_sleep(2, 4)
+                    data = fetch_product_data(driver)
+
+                if data:
+                    hierarchical_category = CATEGORY_STRUCTURE.get(category_name, category_name)
+                    data["Categories"] = hierarchical_category
+                    results.append(data)
+                    added_count += 1
+                    print(f"✅ Product added: {data['Title']}")
+                    product_span.set(outcome="added")
+                    inc("products_total", shop="guiltfree", outcome="added")
+                else:
+                    print("❌ Product skipped after retry")
+                    product_span.set(outcome="skipped")
+                    inc("products_total", shop="guiltfree", outcome="skipped")
+
+    driver.quit()
+
+    results = [r for r in results if r.get("Title")]
+
+    if results:
+        with open("products_guiltfree.csv", "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(results[0].keys()))
+            writer.writeheader()
+            writer.writerows(results)
+        print("Scraping complete — products_guiltfree.csv ready")
+    else:
+        print("No data scraped")
+
+
+if __name__ == "__main__":
+    main()
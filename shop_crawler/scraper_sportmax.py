@@ -10,11 +10,10 @@ import time
 import random
 import re
 import argparse
+from crawl_archive import CrawlArchive, RecordingDriver, new_archive_path
+from instrumentation import inc, span, traced
+from price_watch import extract_offer
 
-parser = argparse.ArgumentParser()
-parser.add_argument('--count', type=int, default=10, help="Number of products per category")
-parser.add_argument('--headless', action='store_true', help="Run browser in headless mode")
-args = parser.parse_args()
 
 CATEGORY_URLS = [
     "https://sklep.sport-max.pl/odzywki-bialkowe/?filter_text=&filter_price=&filter_traits[1322223536]=&filter_producer=1335778696,1321975103,1320788286&filter_traits[1322222772]=&filter_traits[1322222144]=&filter_traits[1322222136]=",
@@ -46,8 +45,8 @@ CATEGORY_STRUCTURE = {
     "Aminokwasy BCAA": "Aminokwasy > Aminokwasy BCAA",
 }
 
-PRODUCTS_PER_CATEGORY = args.count
-HEADLESS = args.headless
+PRODUCTS_PER_CATEGORY = 10
+HEADLESS = False
 
 def random_sleep(min_s=2, max_s=5):
     time.sleep(random.uniform(min_s, max_s))
@@ -92,6 +91,7 @@ def extract_kalorii_attribute(nutrition_text):
                 return ""
     return ""
 
+@traced("fetch_product_data", shop="sportmax")
 def fetch_product_data(driver):
     try:
         title = driver.find_element(By.CSS_SELECTOR, "h1.product_name__name").text.strip()
@@ -165,15 +165,18 @@ def fetch_product_data(driver):
     dieta_val = extract_dieta_attribute(short_desc + " " + long_desc)
     kalorii_val = extract_kalorii_attribute(nutrition_flat)
 
+    offer = extract_offer(driver.page_source, driver.current_url)  # JSON-LD / meta price, no extra request
+
     return {
         "GTIN": gtin,
         "Title": title,
-        "Price": "",
+        "Price": offer.get("price") or "",
         "Brand": brand,
         "Short Description": short_desc,
         "Long Description": long_desc,
         "Nutrition Facts": nutrition_flat,
         "Nutrition Label URL": "",
+        "Source URL": driver.current_url,
         "images": ",".join(image_urls),
         "Attribute 1 name": "Dieta",
         "Attribute 1 value(s)": dieta_val,
@@ -189,93 +192,118 @@ def fetch_product_data(driver):
         "Attribute 3 global": 1,
     }
 
-# --- Setup WebDriver ---
-options = webdriver.ChromeOptions()
-options.add_argument("--window-size=1920,1080")
-if HEADLESS:
-    options.add_argument("--headless")
-    options.add_argument("--disable-gpu")  # Optional for Windows compatibility
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=PRODUCTS_PER_CATEGORY, help="Number of products per category")
+    parser.add_argument('--headless', action='store_true', default=HEADLESS, help="Run browser in headless mode")
+    parser.add_argument('--record', action='store_true', help="Archive every visited page under crawls/ for offline re-extraction")
+    args = parser.parse_args()
+    products_per_category = args.count
+
+    # --- Setup WebDriver ---
+    options = webdriver.ChromeOptions()
+    options.add_argument("--window-size=1920,1080")
+    if args.headless:
+        options.add_argument("--headless")
+        options.add_argument("--disable-gpu")  # Optional for Windows compatibility
+
+    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+    if args.record:
+        driver = RecordingDriver(driver, CrawlArchive(new_archive_path("sportmax"), source="sportmax"))
+
+    results = []
+
+    for category_url in CATEGORY_URLS:
+        category_name = CATEGORY_NAMES.get(category_url, "")
+        print(f"\n🔍 Scraping category: {category_name} ({category_url})")
+
+        driver.get(category_url)
+        inc("pages_fetched_total", shop="sportmax", kind="category")
+        time.sleep(2)
 
-driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+        try:
+            accept_button = WebDriverWait(driver, 5).until(
+                EC.element_to_be_clickable((By.CSS_SELECTOR, "a.acceptAll"))
+            )
+            accept_button.click()
+        except:
+            pass
 
-results = []
+        WebDriverWait(driver, 15).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
 
-for category_url in CATEGORY_URLS:
-    category_name = CATEGORY_NAMES.get(category_url, "")
-    print(f"\n🔍 Scraping category: {category_name} ({category_url})")
+        for _ in range(10):
+            driver.execute_script("window.scrollBy(0,500)")
+            time.sleep(1)
 
-    driver.get(category_url)
-    time.sleep(2)
+        product_urls = []
+        cards = driver.find_elements(By.XPATH, "//a[contains(@class, 'product__name')]")
+        print(f"🔍 Found {len(cards)} product links")
 
-    try:
-        accept_button = WebDriverWait(driver, 5).until(
-            EC.element_to_be_clickable((By.CSS_SELECTOR, "a.acceptAll"))
-        )
-        accept_button.click()
-    except:
-        pass
+        for card in cards:
+            try:
+                link = card.get_attribute("href")
+                if link and link not in product_urls:
+                    print(f"🧲 Candidate product link: {link}")
+                    product_urls.append(link)
+                if len(product_urls) >= products_per_category * 2:
+                    break
+            except:
+                continue
 
-    WebDriverWait(driver, 15).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
+        scraped_titles = set()
+        added_count = 0
 
-    for _ in range(10):
-        driver.execute_script("window.scrollBy(0,500)")
-        time.sleep(1)
+        for url in product_urls:
+            if added_count >= products_per_category:
+                break
 
-    product_urls = []
-    cards = driver.find_elements(By.XPATH, "//a[contains(@class, 'product__name')]")
-    print(f"🔍 Found {len(cards)} product links")
+            with span("product", shop="sportmax", category=category_name, url=url) as product_span:
+                driver.get(url)
+                inc("pages_fetched_total", shop="sportmax", kind="product")
+                random_sleep(3, 6)
+                data = fetch_product_data(driver)
+
+                if not data:
+                    print("⚠️ Skipped due to error, retrying...")
+                    inc("product_retries_total", shop="sportmax")
+                    time.sleep(2)
+                    driver.get(url)
+                    inc("pages_fetched_total", shop="sportmax", kind="product")
+                    random_sleep(2, 4)
+                    data = fetch_product_data(driver)
+
+                if data:
+                    title = data.get("Title", "").strip()
+                    if title in scraped_titles:
+                        print(f"⏩ Duplicate skipped: {title}")
+                        product_span.set(outcome="duplicate")
+                        inc("products_total", shop="sportmax", outcome="duplicate")
+                        continue
+
+                    scraped_titles.add(title)
+                    added_count += 1
+                    data["Categories"] = CATEGORY_STRUCTURE.get(category_name, category_name)
+                    results.append(data)
+                    print(f"✅ Product added: {title}")
+                    product_span.set(outcome="added")
+                    inc("products_total", shop="sportmax", outcome="added")
+                else:
+                    print("❌ Skipped after retry")
+                    product_span.set(outcome="skipped")
+                    inc("products_total", shop="sportmax", outcome="skipped")
 
-    for card in cards:
-        try:
-            link = card.get_attribute("href")
-            if link and link not in product_urls:
-                print(f"🧲 Candidate product link: {link}")
-                product_urls.append(link)
-            if len(product_urls) >= PRODUCTS_PER_CATEGORY * 2:
-                break
-        except:
-            continue
-
-    scraped_titles = set()
-    added_count = 0
-
-    for url in product_urls:
-        if added_count >= PRODUCTS_PER_CATEGORY:
-            break
-
-        driver.get(url)
-        random_sleep(3, 6)
-        data = fetch_product_data(driver)
-
-        if not data:
-            print("⚠️ Skipped due to error, retrying...")
-            time.sleep(2)
-            driver.get(url)
-            random_sleep(2, 4)
-            data = fetch_product_data(driver)
-
-        if data:
-            title = data.get("Title", "").strip()
-            if title in scraped_titles:
-                print(f"⏩ Duplicate skipped: {title}")
-                continue
+    driver.quit()
 
-            scraped_titles.add(title)
-            added_count += 1
-            data["Categories"] = CATEGORY_STRUCTURE.get(category_name, category_name)
-            results.append(data)
-            print(f"✅ Product added: {title}")
-        else:
-            print("❌ Skipped after retry")
-
-driver.quit()
-
-# --- Save CSV ---
-if results:
-    with open("products_sportmax.csv", "w", encoding="utf-8-sig", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=list(results[0].keys()))
-        writer.writeheader()
-        writer.writerows(results)
-    print("📦 Scraping complete — products_sportmax.csv saved")
-else:
-    print("⚠️ No data scraped.")
+    # --- Save CSV ---
+    if results:
+        with open("products_sportmax.csv", "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(results[0].keys()))
+            writer.writeheader()
+            writer.writerows(results)
+        print("📦 Scraping complete — products_sportmax.csv saved")
+    else:
+        print("⚠️ No data scraped.")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,11 +11,10 @@ import time
 import random
 import re
 import argparse
+from crawl_archive import CrawlArchive, RecordingDriver, new_archive_path
+from instrumentation import inc, span, traced
+from price_watch import extract_offer
 
-parser = argparse.ArgumentParser()
-parser.add_argument('--count', type=int, default=10, help="Number of products per category")
-parser.add_argument('--headless', action='store_true', help="Run browser in headless mode")
-args = parser.parse_args()
 
 CATEGORY_URLS = [
     "https://sklep.sport-max.pl/odzywki-bialkowe/?filter_producer=1335778696,1321975103,1320788286",
@@ -47,8 +46,8 @@ CATEGORY_STRUCTURE = {
     "Aminokwasy BCAA": "Aminokwasy > Aminokwasy BCAA",
 }
 
-PRODUCTS_PER_CATEGORY = args.count
-HEADLESS = args.headless
+PRODUCTS_PER_CATEGORY = 10
+HEADLESS = False
 
 def random_sleep(min_s=2, max_s=5):
     time.sleep(random.uniform(min_s, max_s))
@@ -92,7 +91,8 @@ def extract_kalorii_attribute(nutrition_text):
                 return ""
     return ""
 
-def fetch_product_data(driver):
+@traced("fetch_product_data", shop="strefamocy")
+def fetch_product_data(driver, category_name=""):
     try:
         title = driver.find_element(By.CSS_SELECTOR, "h1.product_name__name").text.strip()
     except:
@@ -152,6 +152,8 @@ def fetch_product_data(driver):
     dieta_val = extract_dieta_attribute(short_desc + " " + long_desc)
     kalorii_val = extract_kalorii_attribute(nutrition_flat)
 
+    offer = extract_offer(driver.page_source, driver.current_url)  # JSON-LD / meta price, no extra request
+
     return {
         "Name": title,
         "Short description": short_desc,
@@ -160,7 +162,8 @@ def fetch_product_data(driver):
         "Brands": brand,
         "Categories": CATEGORY_STRUCTURE.get(category_name, category_name),
         "Images": ",".join(image_urls),
-        "Regular price": "",
+        "Regular price": offer.get("price") or "",
+        "Source URL": driver.current_url,
         "Attribute 1 name": "Dieta",
         "Attribute 1 value(s)": dieta_val,
         "Attribute 1 visible": 1,
@@ -175,86 +178,111 @@ def fetch_product_data(driver):
         "Attribute 3 global": 1,
     }
 
-# --- WebDriver Setup ---
-options = webdriver.ChromeOptions()
-options.add_argument("--window-size=1920,1080")
-if HEADLESS:
-    options.add_argument("--headless")
-    options.add_argument("--disable-gpu")
-
-driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=PRODUCTS_PER_CATEGORY, help="Number of products per category")
+    parser.add_argument('--headless', action='store_true', default=HEADLESS, help="Run browser in headless mode")
+    parser.add_argument('--record', action='store_true', help="Archive every visited page under crawls/ for offline re-extraction")
+    args = parser.parse_args()
+    products_per_category = args.count
 
-results = []
+    # --- WebDriver Setup ---
+    options = webdriver.ChromeOptions()
+    options.add_argument("--window-size=1920,1080")
+    if args.headless:
+        options.add_argument("--headless")
+        options.add_argument("--disable-gpu")
 
-for category_url in CATEGORY_URLS:
-    category_name = CATEGORY_NAMES.get(category_url, "")
-    print(f"\n🔍 Scraping category: {category_name} ({category_url})")
+    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+    if args.record:
+        driver = RecordingDriver(driver, CrawlArchive(new_archive_path("strefamocy"), source="strefamocy"))
 
-    driver.get(category_url)
-    time.sleep(2)
+    results = []
 
-    try:
-        WebDriverWait(driver, 5).until(
-            EC.element_to_be_clickable((By.CSS_SELECTOR, "a.acceptAll"))).click()
-    except:
-        pass
+    for category_url in CATEGORY_URLS:
+        category_name = CATEGORY_NAMES.get(category_url, "")
+        print(f"\n🔍 Scraping category: {category_name} ({category_url})")
 
-    WebDriverWait(driver, 15).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
-    for _ in range(10):
-        driver.execute_script("window.scrollBy(0,500)")
-        time.sleep(1)
+        driver.get(category_url)
+        inc("pages_fetched_total", shop="strefamocy", kind="category")
+        time.sleep(2)
 
-    product_urls = []
-    cards = driver.find_elements(By.XPATH, "//a[contains(@class, 'product__name')]")
-    for card in cards:
         try:
-            link = card.get_attribute("href")
-            if link and link not in product_urls:
-                product_urls.append(link)
-            if len(product_urls) >= PRODUCTS_PER_CATEGORY * 2:
-                break
+            WebDriverWait(driver, 5).until(
+                EC.element_to_be_clickable((By.CSS_SELECTOR, "a.acceptAll"))).click()
         except:
-            continue
-
-    scraped_titles = set()
-    added_count = 0
-
-    for url in product_urls:
-        if added_count >= PRODUCTS_PER_CATEGORY:
-            break
-
-        driver.get(url)
-        random_sleep(3, 6)
-        data = fetch_product_data(driver)
-
-        if not data:
-            print("⚠️ Skipped due to error, retrying...")
-            time.sleep(2)
-            driver.get(url)
-            random_sleep(2, 4)
-            data = fetch_product_data(driver)
-
-        if data:
-            title = data.get("Name", "").strip()
-            if title in scraped_titles:
-                print(f"⏩ Duplicate skipped: {title}")
+            pass
+
+        WebDriverWait(driver, 15).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
+        for _ in range(10):
+            driver.execute_script("window.scrollBy(0,500)")
+            time.sleep(1)
+
+        product_urls = []
+        cards = driver.find_elements(By.XPATH, "//a[contains(@class, 'product__name')]")
+        for card in cards:
+            try:
+                link = card.get_attribute("href")
+                if link and link not in product_urls:
+                    product_urls.append(link)
+                if len(product_urls) >= products_per_category * 2:
+                    break
+            except:
                 continue
 
-            scraped_titles.add(title)
-            results.append(data)
-            added_count += 1
-            print(f"✅ Product added: {title}")
-        else:
-            print("❌ Skipped after retry")
-
-driver.quit()
-
-if results:
-    fieldnames = list(results[0].keys())
-    with open("products_sportmax.csv", "w", encoding="utf-8-sig", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(results)
-    print("📦 Scraping complete — products_sportmax.csv saved")
-else:
-    print("⚠️ No data scraped.")
+        scraped_titles = set()
+        added_count = 0
+
+        for url in product_urls:
+            if added_count >= products_per_category:
+                break
+
+            with span("product", shop="strefamocy", category=category_name, url=url) as product_span:
+                driver.get(url)
+                inc("pages_fetched_total", shop="strefamocy", kind="product")
+                random_sleep(3, 6)
+                data = fetch_product_data(driver, category_name)
+
+                if not data:
+                    print("⚠️ Skipped due to error, retrying...")
+                    inc("product_retries_total", shop="strefamocy")
+                    time.sleep(2)
+                    driver.get(url)
+                    inc("pages_fetched_total", shop="strefamocy", kind="product")
+                    random_sleep(2, 4)
+                    data = fetch_product_data(driver, category_name)
+
+                if data:
+                    title = data.get("Name", "").strip()
+                    if title in scraped_titles:
+                        print(f"⏩ Duplicate skipped: {title}")
+                        product_span.set(outcome="duplicate")
+                        inc("products_total", shop="strefamocy", outcome="duplicate")
+                        continue
+
+                    scraped_titles.add(title)
+                    results.append(data)
+                    added_count += 1
+                    print(f"✅ Product added: {title}")
+                    product_span.set(outcome="added")
+                    inc("products_total", shop="strefamocy", outcome="added")
+                else:
+                    print("❌ Skipped after retry")
+                    product_span.set(outcome="skipped")
+                    inc("products_total", shop="strefamocy", outcome="skipped")
+
+    driver.quit()
+
+    if results:
+        fieldnames = list(results[0].keys())
+        with open("products_sportmax.csv", "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(results)
+        print("📦 Scraping complete — products_sportmax.csv saved")
+    else:
+        print("⚠️ No data scraped.")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,11 +10,9 @@ import time
 import random
 import re
 import argparse
+from crawl_archive import CrawlArchive, RecordingDriver, new_archive_path
+from instrumentation import inc, span, traced
 
-parser = argparse.ArgumentParser()
-parser.add_argument('--count', type=int, default=10, help="Number of products per category")
-parser.add_argument('--headless', action='store_true', help="Run browser in headless mode")
-args = parser.parse_args()
 
 CATEGORY_URLS = [
     "https://swiatsupli.pl/odzywki-bialkowe/c146?producenci=biotechusa,olimp-sport-nutrition,optimum-nutrition,trec-nutrition",
@@ -46,8 +44,8 @@ CATEGORY_STRUCTURE = {
     "Aminokwasy BCAA": "Aminokwasy > Aminokwasy BCAA",
 }
 
-PRODUCTS_PER_CATEGORY = args.count
-HEADLESS = args.headless
+PRODUCTS_PER_CATEGORY = 10
+HEADLESS = False
 
 def random_sleep(min_s=2, max_s=5):
     time.sleep(random.uniform(min_s, max_s))
@@ -91,7 +89,8 @@ def extract_kalorii_attribute(nutrition_text):
                 return ""
     return ""
 
-def fetch_product_data(driver):
+@traced("fetch_product_data", shop="swiatsupli")
+def fetch_product_data(driver, category_name=""):
     data = {}
 
     try:
@@ -185,6 +184,7 @@ def fetch_product_data(driver):
         "Categories": CATEGORY_STRUCTURE.get(category_name, category_name),
         "Images": ",".join([main_img] + gallery_urls),
         "Regular price": price,
+        "Source URL": driver.current_url,
         "Attribute 1 name": "Dieta",
         "Attribute 1 value(s)": dieta_val,
         "Attribute 1 visible": 1,
@@ -201,95 +201,119 @@ def fetch_product_data(driver):
 
     return data
 
-# --- Setup WebDriver ---
-options = webdriver.ChromeOptions()
-options.add_argument("--window-size=1920,1080")
-if HEADLESS:
-    options.add_argument("--headless")
-    options.add_argument("--disable-gpu")  # Optional for Windows compatibility
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=PRODUCTS_PER_CATEGORY, help="Number of products per category")
+    parser.add_argument('--headless', action='store_true', default=HEADLESS, help="Run browser in headless mode")
+    parser.add_argument('--record', action='store_true', help="Archive every visited page under crawls/ for offline re-extraction")
+    args = parser.parse_args()
+    products_per_category = args.count
 
-driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+    # --- Setup WebDriver ---
+    options = webdriver.ChromeOptions()
+    options.add_argument("--window-size=1920,1080")
+    if args.headless:
+        options.add_argument("--headless")
+        options.add_argument("--disable-gpu")  # Optional for Windows compatibility
 
-results = []
+    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+    if args.record:
+        driver = RecordingDriver(driver, CrawlArchive(new_archive_path("swiatsupli"), source="swiatsupli"))
 
-for category_url in CATEGORY_URLS:
-    category_name = CATEGORY_NAMES.get(category_url, "")
-    print(f"\n🔍 Scraping category: {category_name} ({category_url})")
+    results = []
 
-    driver.get(category_url)
-    time.sleep(2)
+    for category_url in CATEGORY_URLS:
+        category_name = CATEGORY_NAMES.get(category_url, "")
+        print(f"\n🔍 Scraping category: {category_name} ({category_url})")
 
-    try:
-        cookie_button = WebDriverWait(driver, 5).until(
-            EC.element_to_be_clickable((By.ID, "submit-btn1"))
-        )
-        cookie_button.click()
-        print("✅ Cookie button clicked")
-    except:
-        print("⚠️ Cookie button not found or already accepted")
+        driver.get(category_url)
+        inc("pages_fetched_total", shop="swiatsupli", kind="category")
+        time.sleep(2)
 
-    WebDriverWait(driver, 15).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
+        try:
+            cookie_button = WebDriverWait(driver, 5).until(
+                EC.element_to_be_clickable((By.ID, "submit-btn1"))
+            )
+            cookie_button.click()
+            print("✅ Cookie button clicked")
+        except:
+            print("⚠️ Cookie button not found or already accepted")
 
-    for _ in range(10):
-        driver.execute_script("window.scrollBy(0,500)")
-        time.sleep(1)
+        WebDriverWait(driver, 15).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
 
-    product_urls = []
-    cards = driver.find_elements(By.CSS_SELECTOR, "article.product-miniature")
-    print(f"🔍 Found {len(cards)} product links")
+        for _ in range(10):
+            driver.execute_script("window.scrollBy(0,500)")
+            time.sleep(1)
 
-    for card in cards:
-        try:
-            link = card.find_element(By.CSS_SELECTOR, "h3.product-title a").get_attribute("href")
-            if link and link not in product_urls:
-                product_urls.append(link)
-            if len(product_urls) >= PRODUCTS_PER_CATEGORY * 2:
-                break
-        except:
-            continue
-
-    scraped_titles = set()
-    added_count = 0
-
-    for url in product_urls:
-        if added_count >= PRODUCTS_PER_CATEGORY:
-            break
-
-        driver.get(url)
-        random_sleep(3, 6)
-        data = fetch_product_data(driver)
-
-        if not data:
-            print("⚠️ Skipped due to error, retrying...")
-            time.sleep(2)
-            driver.get(url)
-            random_sleep(2, 4)
-            data = fetch_product_data(driver)
-
-        if data:
-            title = data.get("Title", "").strip()
-            if title in scraped_titles:
-                print(f"⏩ Duplicate skipped: {title}")
+        product_urls = []
+        cards = driver.find_elements(By.CSS_SELECTOR, "article.product-miniature")
+        print(f"🔍 Found {len(cards)} product links")
+
+        for card in cards:
+            try:
+                link = card.find_element(By.CSS_SELECTOR, "h3.product-title a").get_attribute("href")
+                if link and link not in product_urls:
+                    product_urls.append(link)
+                if len(product_urls) >= products_per_category * 2:
+                    break
+            except:
                 continue
 
-            scraped_titles.add(title)
-            added_count += 1
-            data["Categories"] = CATEGORY_STRUCTURE.get(category_name, category_name)
-            results.append(data)
-            print(f"✅ Product added: {title}")
-        else:
-            print("❌ Skipped after retry")
-
-driver.quit()
-
-# --- Save CSV ---
-if results:
-    fieldnames = list(results[0].keys())
-    with open("products_swiatsupli.csv", "w", encoding="utf-8-sig", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(results)
-    print("📦 Scraping complete — products_swiatsupli.csv saved")
-else:
-    print("⚠️ No data scraped.")
+        scraped_titles = set()
+        added_count = 0
 
+        for url in product_urls:
+            if added_count >= products_per_category:
+                break
+
+            with span("product", shop="swiatsupli", category=category_name, url=url) as product_span:
+                driver.get(url)
+                inc("pages_fetched_total", shop="swiatsupli", kind="product")
+                random_sleep(3, 6)
+                data = fetch_product_data(driver, category_name)
+
+                if not data:
+                    print("⚠️ Skipped due to error, retrying...")
+                    inc("product_retries_total", shop="swiatsupli")
+                    time.sleep(2)
+                    driver.get(url)
+                    inc("pages_fetched_total", shop="swiatsupli", kind="product")
+                    random_sleep(2, 4)
+                    data = fetch_product_data(driver, category_name)
+
+                if data:
+                    title = data.get("Title", "").strip()
+                    if title in scraped_titles:
+                        print(f"⏩ Duplicate skipped: {title}")
+                        product_span.set(outcome="duplicate")
+                        inc("products_total", shop="swiatsupli", outcome="duplicate")
+                        continue
+
+                    scraped_titles.add(title)
+                    added_count += 1
+                    data["Categories"] = CATEGORY_STRUCTURE.get(category_name, category_name)
+                    results.append(data)
+                    print(f"✅ Product added: {title}")
+                    product_span.set(outcome="added")
+                    inc("products_total", shop="swiatsupli", outcome="added")
+                else:
+                    print("❌ Skipped after retry")
+                    product_span.set(outcome="skipped")
+                    inc("products_total", shop="swiatsupli", outcome="skipped")
+
+    driver.quit()
+
+    # --- Save CSV ---
+    if results:
+        fieldnames = list(results[0].keys())
+        with open("products_swiatsupli.csv", "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(results)
+        print("📦 Scraping complete — products_swiatsupli.csv saved")
+    else:
+        print("⚠️ No data scraped.")
+
+
+if __name__ == "__main__":
+    main()
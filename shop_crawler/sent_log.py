@@ -0,0 +1,121 @@
+"""
+sent_log.py  ─────────────────────────────────────────────────────────────────────
+Per‑campaign delivery ledger in `sent_log.db`.
+
+One long‑lived connection (WAL mode) replaces a connect/commit per address:
+- `unsent()` loads the candidate list into a temp table and finds the addresses
+  not yet mailed for a campaign with a single anti‑join.
+- `record()` buffers deliveries and writes them in batched transactions
+  (`flush()` / `close()` write whatever is left).
+
+The legacy `sent_log` table (one row per address, no campaign) is imported
+once into the `default` campaign.
+"""
+
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Iterable, List
+
+SENT_LOG_DB = "sent_log.db"
+DEFAULT_CAMPAIGN = "default"
+FLUSH_EVERY = 20
+
+
+def normalise_email(email) -> str:
+    return str(email or "").strip().lower()
+
+
+class SentLog:
+    def __init__(self, path: str = SENT_LOG_DB, flush_every: int = FLUSH_EVERY):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.flush_every = flush_every
+        self._pending = []
+        self._lock = threading.Lock()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS deliveries (
+                campaign TEXT NOT NULL,
+                email TEXT NOT NULL,
+                date_sent TEXT,
+                PRIMARY KEY (campaign, email)
+            ) WITHOUT ROWID
+            """
+        )
+        self._import_legacy()
+
+    def _import_legacy(self):
+        legacy = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sent_log'"
+        ).fetchone()
+        migrated = self.conn.execute("SELECT 1 FROM deliveries LIMIT 1").fetchone()
+        if legacy and not migrated:
+            with self.conn:
+                self.conn.execute(
+                    "INSERT OR IGNORE INTO deliveries (campaign, email, date_sent) "
+                    "SELECT ?, lower(trim(email)), date_sent FROM sent_log WHERE email IS NOT NULL",
+                    (DEFAULT_CAMPAIGN,),
+                )
+
+    def unsent(self, emails: Iterable[str], campaign: str = DEFAULT_CAMPAIGN) -> List[str]:
+        """Addresses from `emails` (deduplicated, original order) not yet sent for `campaign`."""
+        self.flush()
+        with self._lock:
+            self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS candidates (pos INTEGER, email TEXT)")
+            self.conn.execute("DELETE FROM candidates")
+            self.conn.executemany(
+                "INSERT INTO candidates (pos, email) VALUES (?, ?)",
+                ((pos, normalise_email(e)) for pos, e in enumerate(emails) if normalise_email(e)),
+            )
+            rows = self.conn.execute(
+                """
+                SELECT c.email, MIN(c.pos) AS first_pos
+                FROM candidates c
+                LEFT JOIN deliveries d ON d.campaign = ? AND d.email = c.email
+                WHERE d.email IS NULL
+                GROUP BY c.email
+                ORDER BY first_pos
+                """,
+                (campaign,),
+            ).fetchall()
+            self.conn.execute("DELETE FROM candidates")
+            self.conn.commit()
+        return [email for email, _ in rows]
+
+    def was_sent(self, email: str, campaign: str = DEFAULT_CAMPAIGN) -> bool:
+        return not self.unsent([email], campaign)
+
+    def record(self, email: str, campaign: str = DEFAULT_CAMPAIGN):
+        """Buffer one delivery; written to disk every `flush_every` records."""
+        with self._lock:
+            self._pending.append((campaign, normalise_email(email), datetime.today().strftime('%Y-%m-%d')))
+            full = len(self._pending) >= self.flush_every
+        if full:
+            self.flush()
+
+    def mark_sent(self, emails: Iterable[str], campaign: str = DEFAULT_CAMPAIGN):
+        for email in emails:
+            self.record(email, campaign)
+        self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if pending:
+                with self.conn:
+                    self.conn.executemany(
+                        "INSERT OR IGNORE INTO deliveries (campaign, email, date_sent) VALUES (?, ?, ?)",
+                        pending,
+                    )
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+sheets_sync.py  ──────────────────────────────────────────────────────────────────
+Offline‑first Google Sheets reads with a local snapshot.
+
+Scripts used to authorize gspread and call `get_all_records()` on every run.
+`SheetSync` instead keeps a snapshot of each worksheet in `sheets_snapshot.db`:
+1. A snapshot younger than `max_age` is served straight from SQLite (no network).
+2. Otherwise the spreadsheet's revision (last update time) is checked first;
+   values are only downloaded when it changed, and only rows whose hash changed
+   are rewritten in the snapshot.
+3. If Sheets is unreachable, the last snapshot is served with a warning.
+
+The backend is any object with `revision(spreadsheet_id, worksheet)` and
+`fetch(spreadsheet_id, worksheet)` – `GspreadBackend` for the real thing, or a
+fake for tests.
+
+Run:
+    python sheets_sync.py <spreadsheet_id> <worksheet> [--force]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, List, Optional
+
+# ------------------------------ CONFIG --------------------------------------- #
+SNAPSHOT_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sheets_snapshot.db")
+SNAPSHOT_MAX_AGE = int(os.getenv("SHEETS_MAX_AGE", "600"))  # seconds a snapshot is trusted blindly
+SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+# ----------------------------------------------------------------------------- #
+
+
+class GspreadBackend:
+    """Real Google Sheets access through gspread (authorized lazily, on first network use)."""
+
+    def __init__(self, key_file: Optional[str] = None):
+        self.key_file = key_file or os.getenv("GOOGLE_KEY_PATH")
+        self._client = None
+        self._spreadsheets = {}
+
+    def _spreadsheet(self, spreadsheet_id: str):
+        if self._client is None:
+            import gspread
+            from oauth2client.service_account import ServiceAccountCredentials
+
+            creds = ServiceAccountCredentials.from_json_keyfile_name(self.key_file, SCOPE)
+            self._client = gspread.authorize(creds)
+        if spreadsheet_id not in self._spreadsheets:
+            self._spreadsheets[spreadsheet_id] = self._client.open_by_key(spreadsheet_id)
+        return self._spreadsheets[spreadsheet_id]
+
+    def revision(self, spreadsheet_id: str, worksheet: str) -> Optional[str]:
+        """Drive's last update time for the spreadsheet, or None if it cannot be read."""
+        try:
+            return str(self._spreadsheet(spreadsheet_id).lastUpdateTime)
+        except AttributeError:
+            return None
+
+    def fetch(self, spreadsheet_id: str, worksheet: str) -> List[List[str]]:
+        return self._spreadsheet(spreadsheet_id).worksheet(worksheet).get_all_values()
+
+
+def _row_hash(row: List[str]) -> str:
+    return hashlib.sha1(json.dumps(row, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class SheetSync:
+    def __init__(self, backend=None, path: str = SNAPSHOT_DB, max_age: int = SNAPSHOT_MAX_AGE):
+        self.backend = backend or GspreadBackend()
+        self.max_age = max_age
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS sheets (
+                sheet_key TEXT PRIMARY KEY,
+                header TEXT,
+                revision TEXT,
+                synced_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS sheet_rows (
+                sheet_key TEXT,
+                row_no INTEGER,
+                row_hash TEXT,
+                data TEXT,
+                PRIMARY KEY (sheet_key, row_no)
+            );
+            """
+        )
+
+    def close(self):
+        self.conn.close()
+
+    @staticmethod
+    def _key(spreadsheet_id: str, worksheet: str) -> str:
+        return f"{spreadsheet_id}/{worksheet}"
+
+    def _meta(self, key: str):
+        return self.conn.execute(
+            "SELECT header, revision, synced_at FROM sheets WHERE sheet_key = ?", (key,)
+        ).fetchone()
+
+    def pull(self, spreadsheet_id: str, worksheet: str, force: bool = False) -> int:
+        """Refresh the snapshot from Sheets; returns the number of rows written."""
+        key = self._key(spreadsheet_id, worksheet)
+        meta = self._meta(key)
+        revision = self.backend.revision(spreadsheet_id, worksheet)
+        if meta and not force and revision is not None and revision == meta[1]:
+            with self.conn:
+                self.conn.execute("UPDATE sheets SET synced_at = ? WHERE sheet_key = ?", (time.time(), key))
+            return 0
+
+        values = self.backend.fetch(spreadsheet_id, worksheet)
+        header, rows = (values[0], values[1:]) if values else ([], [])
+        known = dict(self.conn.execute(
+            "SELECT row_no, row_hash FROM sheet_rows WHERE sheet_key = ?", (key,)
+        ))
+        changed = []
+        for row_no, row in enumerate(rows, start=2):  # row 1 is the header
+            digest = _row_hash(row)
+            if known.get(row_no) != digest:
+                changed.append((key, row_no, digest, json.dumps(row, ensure_ascii=False)))
+
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO sheet_rows (sheet_key, row_no, row_hash, data) VALUES (?, ?, ?, ?)",
+                changed,
+            )
+            self.conn.execute(
+                "DELETE FROM sheet_rows WHERE sheet_key = ? AND row_no > ?", (key, len(rows) + 1)
+            )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sheets (sheet_key, header, revision, synced_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(header, ensure_ascii=False), revision, time.time()),
+            )
+        return len(changed)
+
+    def records(self, spreadsheet_id: str, worksheet: str, refresh: Optional[bool] = None) -> List[Dict[str, str]]:
+        """Rows as dicts keyed by the header row, like gspread's `get_all_records()`.
+
+        `refresh=None` pulls only when the snapshot is older than `max_age`;
+        True always checks Sheets, False never does.
+        """
+        key = self._key(spreadsheet_id, worksheet)
+        meta = self._meta(key)
+        stale = meta is None or (time.time() - (meta[2] or 0)) > self.max_age
+        if refresh or (refresh is None and stale):
+            try:
+                self.pull(spreadsheet_id, worksheet, force=False)
+            except Exception as e:
+                if meta is None:
+                    raise
+                print(f"⚠️ Google Sheets unavailable ({e}) — using local snapshot of {worksheet}")
+
+        meta = self._meta(key)
+        if meta is None:
+            return []
+        header = json.loads(meta[0])
+        records = []
+        for (data,) in self.conn.execute(
+            "SELECT data FROM sheet_rows WHERE sheet_key = ? ORDER BY row_no", (key,)
+        ):
+            row = json.loads(data)
+            if not any(str(v).strip() for v in row):
+                continue
+            records.append({col: (row[i] if i < len(row) else "") for i, col in enumerate(header) if col})
+        return records
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    parser = argparse.ArgumentParser(description="Refresh the local snapshot of a worksheet.")
+    parser.add_argument("spreadsheet_id")
+    parser.add_argument("worksheet")
+    parser.add_argument("--force", action="store_true", help="Download even if the revision is unchanged")
+    args = parser.parse_args()
+
+    load_dotenv()
+    sync = SheetSync()
+    written = sync.pull(args.spreadsheet_id, args.worksheet, force=args.force)
+    total = len(sync.records(args.spreadsheet_id, args.worksheet, refresh=False))
+    print(f"✅ {args.worksheet}: {written} rows updated, {total} rows in snapshot")
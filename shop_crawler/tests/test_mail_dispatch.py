@@ -0,0 +1,106 @@
+"""
+test_mail_dispatch.py  ───────────────────────────────────────────────────────────
+`MailDispatcher` against a real local SMTP server (`aiosmtpd`): every message
+is delivered, and sessions are reused instead of opened per recipient.
+
+Run:
+    pip install pytest aiosmtpd
+    python -m pytest tests/test_mail_dispatch.py
+"""
+
+import itertools
+import os
+import socket
+import sys
+import threading
+from email.message import EmailMessage
+
+import pytest
+
+controller = pytest.importorskip("aiosmtpd.controller")
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from instrumentation import REGISTRY
+from mail_dispatch import MailDispatcher
+
+
+class CountingHandler:
+    """Records every delivered message together with the SMTP session it came in on."""
+
+    def __init__(self):
+        self.delivered = []  # (session number, recipients)
+        self._numbers = itertools.count(1)
+        self._lock = threading.Lock()
+
+    async def handle_DATA(self, server, session, envelope):
+        with self._lock:
+            if not hasattr(session, "number"):  # one aiosmtpd Session per connection
+                session.number = next(self._numbers)
+            self.delivered.append((session.number, tuple(envelope.rcpt_tos)))
+        return "250 Message accepted for delivery"
+
+    def per_session(self):
+        counts = {}
+        for session, _ in self.delivered:
+            counts[session] = counts.get(session, 0) + 1
+        return counts
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    handler = CountingHandler()
+    server = controller.Controller(handler, hostname="127.0.0.1", port=_free_port())
+    server.start()
+    try:
+        yield server, handler
+    finally:
+        server.stop()
+
+
+def _messages(n: int):
+    for i in range(n):
+        msg = EmailMessage()
+        msg["From"] = "shop@noguiltmeal.pl"
+        msg["To"] = f"customer{i}@example.com"
+        msg["Subject"] = f"Test {i}"
+        msg.set_content("Hello")
+        yield msg
+
+
+def _sessions_opened() -> float:
+    return sum(REGISTRY.counters.get("smtp_sessions_total", {}).values())
+
+
+def _dispatcher(server, **kwargs) -> MailDispatcher:
+    return MailDispatcher(server.hostname, server.port, use_tls=False, per_minute=0, timeout=5, **kwargs)
+
+
+def test_single_worker_reuses_session_up_to_limit(smtp_server):
+    server, handler = smtp_server
+    before = _sessions_opened()
+
+    results = _dispatcher(server, workers=1, messages_per_session=5).send_all(_messages(12))
+
+    assert len(results) == 12 and all(r.ok for r in results)
+    assert len(handler.delivered) == 12
+    assert sorted(handler.per_session().values()) == [2, 5, 5]
+    assert _sessions_opened() - before == 3
+
+
+def test_workers_share_the_messages_over_few_sessions(smtp_server):
+    server, handler = smtp_server
+    before = _sessions_opened()
+
+    results = _dispatcher(server, workers=3, messages_per_session=100).send_all(_messages(30))
+
+    assert sum(r.ok for r in results) == 30
+    assert sorted(rcpt for _, (rcpt,) in handler.delivered) == sorted(f"customer{i}@example.com" for i in range(30))
+    sessions = handler.per_session()
+    assert 1 <= len(sessions) <= 3
+    assert _sessions_opened() - before == len(sessions)
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+build_site.py  ───────────────────────────────────────────────────────────────────
+Incremental static site build into `dist/`.
+
+1. Renders the homepage, every article from `shop_crawler/Blog/generated_articles`
+   and a landing page per product in the WooCommerce export, from the
+   `string.Template` files in `templates/` (`base.html` wraps every page).
+2. Tracks dependencies in `dist/.manifest.json`: each page records a hash of its
+   inputs (templates, source article / product row, asset fingerprints). Only
+   pages whose inputs changed are re‑rendered; pages whose source disappeared
+   are removed. Source files are re‑hashed only when their mtime/size change,
+   and the export is not even parsed when it is unchanged.
+3. Copies `styles.css` / `script.js` to `assets/` under content‑hashed names
+   (`styles.3f2a9c1b.css`) so they can be cached for a year.
+4. Writes a `.gz` (and `.br` when the `brotli` package is installed) next to
+   every text file, for servers that serve pre‑compressed files.
+
+Run:
+    python build_site.py            # incremental
+    python build_site.py --force    # rebuild everything
+    python build_site.py --no-optimize   # skip optimize_assets (minify, critical CSS, images)
+"""
+
+import argparse
+import gzip
+import hashlib
+import html
+import json
+import os
+import re
+import shutil
+import sys
+import time
+from string import Template
+from typing import Dict, List
+
+try:
+    import brotli
+except ImportError:  # .br output is optional
+    brotli = None
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(HERE)
+sys.path.append(os.path.join(REPO_ROOT, "shop_crawler", "Blog"))
+from article_registry import ArticleRegistry, slugify_filename
+
+# ------------------------------ CONFIG --------------------------------------- #
+DIST_DIR = os.path.join(HERE, "dist")
+TEMPLATES_DIR = os.path.join(HERE, "templates")
+ASSETS = ["styles.css", "script.js"]
+ARTICLES_DIR = os.path.join(REPO_ROOT, "shop_crawler", "Blog", "generated_articles")
+ARTICLES_DB = os.path.join(REPO_ROOT, "shop_crawler", "Blog", "articles.db")
+EXPORT_CSV = os.path.join(REPO_ROOT, "shop_crawler", "Existing_Products", "export_for_reference_enhanced.csv")
+SHOP_URL = "https://noguiltmeal.pl/?p={id}"
+HOMEPAGE_ARTICLES = 6
+SITE_TITLE = "NoGuiltMeal"
+HOME_TITLE = "NoGuiltMeal - Zdrowe Plany Żywieniowe"
+HOME_DESCRIPTION = "Spersonalizowane plany żywieniowe przygotowane przez dietetyków."
+PRODUCT_COLUMNS = [
+    "ID", "Name", "Published", "Short description", "Description", "Regular price", "Sale price", "Images",
+    "Enhanced Short Description", "Enhanced Long Description", "Meta: seo_title", "Meta: seo_description",
+]
+COMPRESS_EXT = {".html", ".css", ".js", ".json", ".xml", ".svg", ".txt"}
+MANIFEST = ".manifest.json"
+MANIFEST_VERSION = 1
+# ----------------------------------------------------------------------------- #
+
+# Asset transforms by extension (e.g. minifiers) – filled in by optimize_assets
+ASSET_TRANSFORMS = {}
+# Page transforms run on every rendered page before it is written
+PAGE_TRANSFORMS = []
+# Part of every page's input hash, so switching optimisation on/off rebuilds
+BUILD_FLAVOUR = "plain"
+
+
+def sha1(data) -> str:
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha1(data).hexdigest()
+
+
+def excerpt(fragment: str, words: int = 30) -> str:
+    text = re.sub(r"<[^>]+>", " ", fragment)
+    tokens = html.unescape(text).split()
+    return " ".join(tokens[:words]) + ("…" if len(tokens) > words else "")
+
+
+def title_from_slug(slug: str) -> str:
+    text = re.sub(r"_+", " ", slug).strip()
+    return text[:1].upper() + text[1:]
+
+
+def write_file(path: str, data: bytes):
+    """Atomically write `data`, plus pre‑compressed siblings for text types."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    if os.path.splitext(path)[1] in COMPRESS_EXT:
+        with open(path + ".gz", "wb") as f:
+            f.write(gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None:
+            with open(path + ".br", "wb") as f:
+                f.write(brotli.compress(data, quality=11))
+
+
+def remove_file(path: str):
+    for p in (path, path + ".gz", path + ".br"):
+        if os.path.exists(p):
+            os.remove(p)
+
+
+class SiteBuilder:
+    def __init__(self, out_dir: str = DIST_DIR, force: bool = False):
+        self.out_dir = out_dir
+        self.force = force
+        self.manifest = {"version": MANIFEST_VERSION, "files": {}, "pages": {}, "groups": {}}
+        manifest_path = os.path.join(out_dir, MANIFEST)
+        if not force and os.path.exists(manifest_path):
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                loaded = json.load(f)
+            if loaded.get("version") == MANIFEST_VERSION:
+                self.manifest = loaded
+        self.previous_pages = dict(self.manifest["pages"])
+        self.manifest["pages"] = {}
+        self.templates: Dict[str, Template] = {}
+        self.template_hashes: Dict[str, str] = {}
+        self.assets: Dict[str, str] = {}
+        self.stats = {"written": 0, "skipped": 0, "removed": 0}
+
+    # --- inputs -------------------------------------------------------------------
+    def file_hash(self, path: str) -> str:
+        """Content hash of a source file, recomputed only when mtime/size change."""
+        st = os.stat(path)
+        cached = self.manifest["files"].get(path)
+        if cached and cached[0] == st.st_mtime and cached[1] == st.st_size:
+            return cached[2]
+        with open(path, "rb") as f:
+            digest = sha1(f.read())
+        self.manifest["files"][path] = [st.st_mtime, st.st_size, digest]
+        return digest
+
+    def template(self, name: str) -> Template:
+        if name not in self.templates:
+            path = os.path.join(TEMPLATES_DIR, name)
+            with open(path, "r", encoding="utf-8") as f:
+                self.templates[name] = Template(f.read())
+            self.template_hashes[name] = self.file_hash(path)
+        return self.templates[name]
+
+    def deps_key(self, templates: List[str], data) -> str:
+        for name in templates:
+            self.template(name)
+        parts = [BUILD_FLAVOUR] + [self.template_hashes[n] for n in templates]
+        parts.append(json.dumps(self.assets, sort_keys=True))
+        parts.append(json.dumps(data, sort_keys=True, ensure_ascii=False, default=str))
+        return sha1("\n".join(parts))
+
+    # --- assets -------------------------------------------------------------------
+    def build_assets(self):
+        for name in ASSETS:
+            with open(os.path.join(HERE, name), "rb") as f:
+                data = f.read()
+            stem, ext = os.path.splitext(name)
+            transform = ASSET_TRANSFORMS.get(ext)
+            if transform:
+                data = transform(data.decode("utf-8")).encode("utf-8")
+            rel = f"assets/{stem}.{sha1(data)[:8]}{ext}"
+            target = os.path.join(self.out_dir, rel)
+            if not os.path.exists(target):
+                write_file(target, data)
+            self.assets[name] = rel
+
+    def asset_text(self, name: str) -> str:
+        with open(os.path.join(self.out_dir, self.assets[name]), "r", encoding="utf-8") as f:
+            return f.read()
+
+    # --- pages --------------------------------------------------------------------
+    def needs_build(self, rel: str, template: str, deps) -> bool:
+        """Record the page's input hash; False if the output is already up to date."""
+        key = self.deps_key(["base.html", template], deps)
+        self.manifest["pages"][rel] = key
+        if self.previous_pages.get(rel) == key and os.path.exists(os.path.join(self.out_dir, rel)):
+            self.stats["skipped"] += 1
+            return False
+        return True
+
+    def render(self, rel: str, template: str, title: str, description: str = "", **fields):
+        """Render `template` inside base.html and write it to `rel`."""
+        root = "../" * rel.count("/") or "./"
+        content = self.template(template).safe_substitute(fields, root=root)
+        page = self.template("base.html").safe_substitute(
+            title=html.escape(title),
+            description=html.escape(description),
+            stylesheets=f'  <link rel="stylesheet" href="{root}{self.assets["styles.css"]}" />',
+            script_src=root + self.assets["script.js"],
+            root=root,
+            content=content,
+        )
+        for transform in PAGE_TRANSFORMS:
+            page = transform(self, page, root)
+        write_file(os.path.join(self.out_dir, rel), page.encode("utf-8"))
+        self.stats["written"] += 1
+
+    def page(self, rel: str, template: str, deps, title: str, description: str = "", **fields):
+        if self.needs_build(rel, template, deps):
+            self.render(rel, template, title, description, **fields)
+
+    def keep_group(self, group: str, key: str) -> bool:
+        """True if a whole page group is up to date; its manifest entries are carried over."""
+        if self.force or self.manifest["groups"].get(group) != key:
+            self.manifest["groups"][group] = key
+            return False
+        carried = {rel: k for rel, k in self.previous_pages.items() if rel.startswith(group + "/")}
+        if not all(os.path.exists(os.path.join(self.out_dir, rel)) for rel in carried):
+            return False
+        self.manifest["pages"].update(carried)
+        self.stats["skipped"] += len(carried)
+        return True
+
+    # --- sources ------------------------------------------------------------------
+    def load_articles(self) -> List[dict]:
+        titles = {}
+        if os.path.exists(ARTICLES_DB):
+            registry = ArticleRegistry(ARTICLES_DB, legacy_log=None)
+            titles = {os.path.basename(r["article_file"]): r["title"]
+                      for r in registry.query(status="done") if r["article_file"]}
+            registry.close()
+        articles = []
+        if not os.path.isdir(ARTICLES_DIR):
+            return articles
+        for name in sorted(os.listdir(ARTICLES_DIR)):
+            if not name.endswith(".html"):
+                continue
+            path = os.path.join(ARTICLES_DIR, name)
+            slug = name[:-len(".html")]
+            articles.append({
+                "path": path,
+                "slug": slug,
+                "title": titles.get(name) or title_from_slug(slug),
+                "hash": self.file_hash(path),
+                "mtime": os.stat(path).st_mtime,
+            })
+        articles.sort(key=lambda a: a["mtime"], reverse=True)
+        return articles
+
+    def load_products(self) -> List[dict]:
+        sys.path.append(os.path.dirname(EXPORT_CSV))
+        from export_reader import read_export, read_header
+
+        columns = [c for c in PRODUCT_COLUMNS if c in read_header(EXPORT_CSV)]
+        df = read_export(EXPORT_CSV, columns=columns, use_cache=False)
+        records = []
+        for row in df.to_dict("records"):
+            record = {k: ("" if v is None or v != v else str(v)) for k, v in row.items()}  # NaN → ""
+            if record.get("Published", "1") in ("-1", "0") or not record.get("ID"):
+                continue
+            records.append(record)
+        return records
+
+    # --- build --------------------------------------------------------------------
+    def build_articles(self, articles: List[dict]):
+        for a in articles:
+            rel = f"blog/{a['slug']}/index.html"
+            if not self.needs_build(rel, "article.html", {"hash": a["hash"], "title": a["title"]}):
+                continue
+            with open(a["path"], "r", encoding="utf-8") as f:
+                body = f.read().strip()
+            self.render(rel, "article.html", title=f"{a['title']} | {SITE_TITLE}",
+                        description=excerpt(body, 25), heading=html.escape(a["title"]), body=body)
+
+    def build_products(self):
+        if not os.path.exists(EXPORT_CSV):
+            print(f"⚠️ {EXPORT_CSV} not found — product pages skipped")
+            return
+        key = self.deps_key(["base.html", "product.html"], self.file_hash(EXPORT_CSV))
+        if self.keep_group("produkty", key):
+            return
+        for p in self.load_products():
+            image = (p.get("Images") or "").split(",")[0].strip()
+            name = p.get("Name", "")
+            long_description = p.get("Enhanced Long Description") or p.get("Description", "")
+            short_description = p.get("Enhanced Short Description") or p.get("Short description", "")
+            price = p.get("Sale price") or p.get("Regular price")
+            self.page(
+                f"produkty/{p['ID']}-{slugify_filename(name)[:80]}/index.html", "product.html", p,
+                title=p.get("Meta: seo_title") or f"{name} | {SITE_TITLE}",
+                description=p.get("Meta: seo_description") or excerpt(short_description, 25),
+                heading=html.escape(name),
+                image=(f'<img src="{html.escape(image)}" alt="{html.escape(name)}" loading="lazy" />'
+                       if image else ""),
+                price=f"{price} zł" if price else "",
+                short_description=short_description,
+                long_description=long_description,
+                shop_url=SHOP_URL.format(id=p["ID"]),
+            )
+
+    def build_home(self, articles: List[dict]):
+        latest = articles[:HOMEPAGE_ARTICLES]
+        card = self.template("article_card.html")
+        deps = {"articles": [(a["slug"], a["title"], a["hash"]) for a in latest],
+                "card": self.template_hashes["article_card.html"]}
+        if not self.needs_build("index.html", "home.html", deps):
+            return
+        cards = []
+        for a in latest:
+            with open(a["path"], "r", encoding="utf-8") as f:
+                text = excerpt(f.read())
+            cards.append(card.safe_substitute(href=f"blog/{a['slug']}/", heading=html.escape(a["title"]),
+                                              excerpt=html.escape(text)))
+        self.render("index.html", "home.html", title=HOME_TITLE, description=HOME_DESCRIPTION,
+                    articles="\n".join(cards))
+
+    def remove_stale(self):
+        for rel in set(self.previous_pages) - set(self.manifest["pages"]):
+            remove_file(os.path.join(self.out_dir, rel))
+            try:
+                os.rmdir(os.path.dirname(os.path.join(self.out_dir, rel)))
+            except OSError:
+                pass
+            self.stats["removed"] += 1
+
+    def save_manifest(self):
+        self.manifest["files"] = {p: v for p, v in self.manifest["files"].items() if os.path.exists(p)}
+        data = json.dumps(self.manifest, ensure_ascii=False, indent=1).encode("utf-8")
+        os.makedirs(self.out_dir, exist_ok=True)
+        tmp = os.path.join(self.out_dir, MANIFEST + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, os.path.join(self.out_dir, MANIFEST))
+
+    def build(self, products: bool = True) -> Dict[str, int]:
+        if self.force and os.path.isdir(self.out_dir):
+            shutil.rmtree(self.out_dir)
+        self.build_assets()
+        articles = self.load_articles()
+        self.build_home(articles)
+        self.build_articles(articles)
+        if products:
+            self.build_products()
+        else:  # keep what was built before
+            self.manifest["pages"].update({r: k for r, k in self.previous_pages.items() if r.startswith("produkty/")})
+        self.remove_stale()
+        self.save_manifest()
+        return self.stats
+
+
+def build(out_dir: str = DIST_DIR, force: bool = False, products: bool = True) -> Dict[str, int]:
+    start = time.time()
+    stats = SiteBuilder(out_dir, force).build(products=products)
+    print(f"✅ Built {out_dir}: {stats['written']} written, {stats['skipped']} unchanged, "
+          f"{stats['removed']} removed in {time.time() - start:.2f}s")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the static site into dist/.")
+    parser.add_argument("--out", default=DIST_DIR)
+    parser.add_argument("--force", action="store_true", help="Ignore the manifest and rebuild everything")
+    parser.add_argument("--no-products", action="store_true", help="Skip product pages (no pandas needed)")
+    parser.add_argument("--no-optimize", action="store_true", help="Skip minification, critical CSS and image variants")
+    parser.add_argument("--no-images", action="store_true", help="Optimise CSS/JS but leave <img> tags alone")
+    args = parser.parse_args()
+
+    if args.no_optimize:
+        build(args.out, force=args.force, products=not args.no_products)
+    else:
+        import optimize_assets
+
+        optimize_assets.install(sys.modules[__name__], images=not args.no_images)
+        build(args.out, force=args.force, products=not args.no_products)
+        sys.exit(0 if optimize_assets.check_budgets(args.out) else 1)
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+optimize_assets.py  ──────────────────────────────────────────────────────────────
+Asset optimisation stage for `build_site.py`.
+
+1. Minifies CSS and JS before they are fingerprinted.
+2. Inlines the critical (above‑the‑fold) CSS rules – header, hero, product and
+   article headings – into every page and loads the full stylesheet without
+   blocking render.
+3. Replaces `<img>` tags pointing at product/category images with `<picture>`
+   elements offering AVIF/WebP variants in several widths (`srcset`). Variants
+   are produced locally with Pillow from a cached copy of the original; AVIF
+   is only written when the installed Pillow can encode it.
+4. Writes `dist/size-report.json` (gzip bytes of HTML + CSS + JS + images per
+   page) and fails when a page exceeds its budget or grows more than
+   `REGRESSION_TOLERANCE` over the previous report.
+
+Run:
+    python build_site.py                 # optimisation runs as part of the build
+    python optimize_assets.py --report   # budget report for an existing dist/
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+import urllib.request
+from html import unescape
+from typing import Dict, List, Optional, Tuple
+
+# ------------------------------ CONFIG --------------------------------------- #
+HERE = os.path.dirname(os.path.abspath(__file__))
+IMAGE_CACHE_DIR = os.path.join(HERE, ".image_cache")   # downloaded originals
+IMAGE_DIR = "img"                                        # variants, inside dist/
+IMAGE_WIDTHS = [320, 640, 960]
+IMAGE_SIZES = "(max-width: 768px) 100vw, 50vw"
+WEBP_QUALITY = 80
+AVIF_QUALITY = 55
+IMAGE_HOSTS = ("noguiltmeal.pl/wp-content/uploads/",)   # images worth optimising
+DOWNLOAD_TIMEOUT = 15
+
+# Rules whose selectors mention one of these are inlined as critical CSS
+CRITICAL_SELECTORS = [
+    "*", "html", "body", "a", "img", ".container", "header", ".nav", ".hero", ".btn",
+    ".product", ".product__image", ".product__info", ".product__price", ".article h1",
+]
+
+# Gzip byte budgets per page (HTML + referenced CSS/JS + first image candidate)
+BUDGETS = {"html": 60_000, "css": 15_000, "js": 5_000, "images": 250_000, "total": 300_000}
+REGRESSION_TOLERANCE = 0.10      # fail if a page grows more than 10 % vs the last report
+REPORT_FILE = "size-report.json"
+OPTIMIZER_VERSION = "1"          # bump to force pages to re-render after changes here
+# ----------------------------------------------------------------------------- #
+
+try:
+    from PIL import Image, features
+except ImportError:  # image variants are skipped without Pillow
+    Image = None
+
+
+# --- minification -----------------------------------------------------------------
+def minify_css(css: str) -> str:
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    css = re.sub(r":\s+", ":", css)  # "a :hover" must keep its space
+    css = css.replace(";}", "}")
+    return css.strip()
+
+
+def minify_js(js: str) -> str:
+    """Conservative: drops single-line comments on their own line, indentation and blank lines.
+
+    Lines inside template literals are kept verbatim; a file whose backticks do
+    not pair up is returned untouched.
+    """
+    if len(re.findall(r"(?<!\\)`", js)) % 2:
+        return js
+    lines, in_template = [], False
+    for line in js.splitlines():
+        stripped = line.strip()
+        if in_template:
+            lines.append(line)
+        elif stripped and not stripped.startswith("//") and not re.fullmatch(r"/\*(?:(?!\*/).)*\*/", stripped):
+            lines.append(stripped)
+        in_template ^= len(re.findall(r"(?<!\\)`", line)) % 2 == 1
+    return "\n".join(lines)
+
+
+# --- critical CSS -----------------------------------------------------------------
+def split_rules(css: str) -> List[Tuple[str, str]]:
+    """Top-level (prelude, block) pairs of minified CSS; @media blocks stay whole."""
+    rules, depth, start, prelude_end = [], 0, 0, None
+    for i, ch in enumerate(css):
+        if ch == "{":
+            if depth == 0:
+                prelude_end = i
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                rules.append((css[start:prelude_end].strip(), css[prelude_end + 1:i]))
+                start = i + 1
+    return rules
+
+
+def _is_critical(selectors: str) -> bool:
+    """A selector is critical when it starts with a CRITICAL_SELECTORS entry (BEM children included)."""
+    for selector in selectors.split(","):
+        if any(re.match(rf"{re.escape(c)}($|[\s>+~:.\[_])", selector.strip()) for c in CRITICAL_SELECTORS):
+            return True
+    return False
+
+
+def critical_css(css: str) -> str:
+    out = []
+    for prelude, block in split_rules(css):
+        if prelude.startswith("@media"):
+            inner = critical_css(block)
+            if inner:
+                out.append(f"{prelude}{{{inner}}}")
+        elif not prelude.startswith("@") and _is_critical(prelude):
+            out.append(f"{prelude}{{{block}}}")
+    return "".join(out)
+
+
+def inline_critical_css(builder, page: str, root: str) -> str:
+    href = f"{root}{builder.assets['styles.css']}"
+    if not hasattr(builder, "_critical_css"):
+        builder._critical_css = critical_css(builder.asset_text("styles.css"))
+    link = f'  <link rel="stylesheet" href="{href}" />'
+    deferred = (
+        f"  <style>{builder._critical_css}</style>\n"
+        f'  <link rel="preload" href="{href}" as="style" onload="this.onload=null;this.rel=\'stylesheet\'" />\n'
+        f'  <noscript><link rel="stylesheet" href="{href}" /></noscript>'
+    )
+    return page.replace(link, deferred, 1)
+
+
+# --- responsive images ------------------------------------------------------------
+_IMG_TAG = re.compile(r"<img\b[^>]*>", re.I)
+_ATTR = re.compile(r'([\w-]+)\s*=\s*"([^"]*)"')
+_variants: Dict[str, Optional[dict]] = {}
+
+
+def avif_supported() -> bool:
+    if Image is None:
+        return False
+    try:
+        return bool(features.check("avif"))
+    except Exception:  # older Pillow without the avif feature flag
+        return False
+
+
+def fetch_original(url: str) -> Optional[str]:
+    """Local copy of an image (downloaded once into IMAGE_CACHE_DIR)."""
+    os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+    ext = os.path.splitext(url.split("?")[0])[1] or ".img"
+    path = os.path.join(IMAGE_CACHE_DIR, hashlib.sha1(url.encode("utf-8")).hexdigest() + ext)
+    if os.path.exists(path):
+        return path
+    try:
+        with urllib.request.urlopen(url, timeout=DOWNLOAD_TIMEOUT) as resp:
+            data = resp.read()
+    except Exception as e:
+        print(f"⚠️ Could not fetch {url}: {e}")
+        return None
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def make_variants(url: str, out_dir: str) -> Optional[dict]:
+    """{"width", "height", "webp": [(rel, w)], "avif": [(rel, w)]} for one source image."""
+    if url in _variants:
+        return _variants[url]
+    result = None
+    source = fetch_original(url) if Image is not None else None
+    if source:
+        try:
+            with Image.open(source) as img:
+                img.load()
+                width, height = img.size
+                digest = hashlib.sha1(url.encode("utf-8")).hexdigest()[:12]
+                formats = [("webp", "WEBP", WEBP_QUALITY)]
+                if avif_supported():
+                    formats.append(("avif", "AVIF", AVIF_QUALITY))
+                result = {"width": width, "height": height}
+                widths = [w for w in IMAGE_WIDTHS if w < width] + [min(width, IMAGE_WIDTHS[-1])]
+                base = img.convert("RGBA" if img.mode in ("RGBA", "LA", "P") else "RGB")
+                for key, fmt, quality in formats:
+                    result[key] = []
+                    for w in sorted(set(widths)):
+                        rel = f"{IMAGE_DIR}/{digest}-{w}.{key}"
+                        target = os.path.join(out_dir, rel)
+                        if not os.path.exists(target):
+                            os.makedirs(os.path.dirname(target), exist_ok=True)
+                            resized = base.resize((w, round(height * w / width)), Image.LANCZOS)
+                            resized.save(target, fmt, quality=quality)
+                        result[key].append((rel, w))
+        except Exception as e:
+            print(f"⚠️ Could not convert {url}: {e}")
+            result = None
+    _variants[url] = result
+    return result
+
+
+def responsive_images(builder, page: str, root: str) -> str:
+    def replace(match):
+        tag = match.group(0)
+        attrs = dict(_ATTR.findall(tag))
+        src = unescape(attrs.get("src", ""))
+        if not any(host in src for host in IMAGE_HOSTS):
+            return tag
+        variants = make_variants(src, builder.out_dir)
+        if not variants:
+            return tag
+        sources = []
+        for key in ("avif", "webp"):
+            if variants.get(key):
+                srcset = ", ".join(f"{root}{rel} {w}w" for rel, w in variants[key])
+                sources.append(f'<source type="image/{key}" srcset="{srcset}" sizes="{IMAGE_SIZES}" />')
+        size_attrs = "" if "width" in attrs else f' width="{variants["width"]}" height="{variants["height"]}"'
+        extra = "" if "decoding" in attrs else ' decoding="async"'
+        img = tag[:-2].rstrip() + f"{size_attrs}{extra} />" if tag.endswith("/>") else tag[:-1] + f"{size_attrs}{extra}>"
+        return f"<picture>{''.join(sources)}{img}</picture>"
+
+    return _IMG_TAG.sub(replace, page)
+
+
+# --- size budgets -----------------------------------------------------------------
+def _gz_size(path: str) -> int:
+    if os.path.exists(path + ".gz"):
+        return os.path.getsize(path + ".gz")
+    with open(path, "rb") as f:
+        data = f.read()
+    if path.endswith((".webp", ".avif", ".jpg", ".jpeg", ".png")):
+        return len(data)
+    return len(gzip.compress(data, compresslevel=9))
+
+
+_REF = re.compile(r'(?:href|src|srcset)="([^"]+)"')
+
+
+def page_weights(out_dir: str) -> Dict[str, Dict[str, int]]:
+    """Gzip bytes per page: its HTML, plus the CSS/JS and first image candidates it references."""
+    report = {}
+    for dirpath, _, files in os.walk(out_dir):
+        for name in files:
+            if not name.endswith(".html"):
+                continue
+            path = os.path.join(dirpath, name)
+            rel = os.path.relpath(path, out_dir).replace(os.sep, "/")
+            with open(path, "r", encoding="utf-8") as f:
+                page = f.read()
+            weights = {"html": _gz_size(path), "css": 0, "js": 0, "images": 0}
+            seen = set()
+            for ref in _REF.findall(page):
+                ref = ref.split(",")[0].split()[0]  # first srcset candidate
+                if "://" in ref or ref.startswith("#") or ref in seen:
+                    continue
+                seen.add(ref)
+                target = os.path.normpath(os.path.join(dirpath, ref))
+                if not os.path.isfile(target):
+                    continue
+                kind = {".css": "css", ".js": "js"}.get(os.path.splitext(target)[1], "images")
+                if kind == "images" and not target.endswith((".webp", ".avif", ".jpg", ".jpeg", ".png")):
+                    continue
+                weights[kind] += _gz_size(target)
+            weights["total"] = sum(weights.values())
+            report[rel] = weights
+    return report
+
+
+def check_budgets(out_dir: str, budgets: Dict[str, int] = BUDGETS,
+                  tolerance: float = REGRESSION_TOLERANCE) -> bool:
+    """Print the size report, save it, and return False on any budget/regression failure."""
+    report_path = os.path.join(out_dir, REPORT_FILE)
+    previous = {}
+    if os.path.exists(report_path):
+        with open(report_path, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+    report = page_weights(out_dir)
+
+    failures = []
+    for rel, weights in sorted(report.items()):
+        for kind, limit in budgets.items():
+            if weights.get(kind, 0) > limit:
+                failures.append(f"{rel}: {kind} {weights[kind]:,} B > budget {limit:,} B")
+        before = previous.get(rel, {}).get("total")
+        if before and weights["total"] > before * (1 + tolerance):
+            failures.append(f"{rel}: total grew {before:,} → {weights['total']:,} B")
+
+    heaviest = sorted(report.items(), key=lambda kv: kv[1]["total"], reverse=True)[:10]
+    print(f"\n{'page':60s} {'html':>8s} {'css':>7s} {'js':>6s} {'images':>8s} {'total':>8s}")
+    for rel, w in heaviest:
+        print(f"{rel[:60]:60s} {w['html']:8,d} {w['css']:7,d} {w['js']:6,d} {w['images']:8,d} {w['total']:8,d}")
+    print(f"📦 {len(report)} pages, heaviest shown (gzip bytes)")
+
+    if failures:
+        for line in failures:
+            print(f"❌ {line}")
+        return False  # keep the old report as the baseline
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1, sort_keys=True)
+    print("✅ All pages within size budget")
+    return True
+
+
+# --- build hook -------------------------------------------------------------------
+def install(build_site_module, images: bool = True):
+    """Register the minifiers and page transforms with build_site."""
+    build_site_module.ASSET_TRANSFORMS.update({".css": minify_css, ".js": minify_js})
+    build_site_module.PAGE_TRANSFORMS[:] = [inline_critical_css] + ([responsive_images] if images else [])
+    build_site_module.BUILD_FLAVOUR = f"optimized-{OPTIMIZER_VERSION}-{'img' if images else 'noimg'}"
+
+
+if __name__ == "__main__":
+    import build_site
+
+    parser = argparse.ArgumentParser(description="Size-budget report for a built site.")
+    parser.add_argument("--report", action="store_true", help="Only check budgets of an existing build")
+    parser.add_argument("--out", default=build_site.DIST_DIR)
+    args = parser.parse_args()
+    if not args.report:
+        install(build_site)
+        build_site.build(args.out)
+    sys.exit(0 if check_budgets(args.out) else 1)